@@ -0,0 +1,65 @@
+"""
+ASGI config for app project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+Django 2.1 cannot run views as coroutines, so the WSGI application is wrapped:
+the event loop accepts connections, buffers request bodies (such as image
+uploads from slow clients) and sends responses, while views and their ORM
+calls run on a bounded pool of ``ASGI_THREADS`` threads.
+
+Serve it with e.g. ``uvicorn app.asgi:application``.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.wsgi import WsgiToAsgi
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+
+class ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    """Run a WSGI application for ASGI servers on a bounded thread pool"""
+
+    def __init__(self, wsgi_application, max_threads):
+        super().__init__(wsgi_application)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_threads,
+            thread_name_prefix='asgi'
+        )
+        self._loop = None
+
+    def use_executor(self):
+        """Make the pool the default executor of the running loop"""
+        loop = asyncio.get_event_loop()
+        if self._loop is not loop:
+            loop.set_default_executor(self.executor)
+            self._loop = loop
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.use_executor()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        self.use_executor()
+        await super().__call__(scope, receive, send)
+
+
+application = ThreadPoolWsgiToAsgi(
+    get_wsgi_application(),
+    max_threads=settings.ASGI_THREADS
+)
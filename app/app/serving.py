@@ -0,0 +1,106 @@
+"""
+Worker sizing for the production WSGI server, used by gunicorn.conf.py.
+
+Nothing here imports Django, since gunicorn reads its configuration before
+loading the application. Limits set by the container (cgroup v1 or v2) take
+precedence over what the host reports.
+"""
+import math
+import os
+
+# resident memory of one worker after serving some traffic, in MiB
+WORKER_MEMORY_MB = 120
+# share of the memory limit left for the master process and page cache
+MEMORY_HEADROOM = 0.2
+# requests in flight per core that keep the CPU busy while others wait on
+# the database or disk
+CONCURRENCY_PER_CPU = 4
+MAX_THREADS = 8
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_quota(root=CGROUP_ROOT):
+    """Return the CPU quota of the container in cores, None if unlimited"""
+    cpu_max = _read(os.path.join(root, 'cpu.max'))
+    if cpu_max:
+        quota, period = cpu_max.split()
+        if quota == 'max':
+            return None
+        return int(quota) / int(period)
+
+    quota = _read(os.path.join(root, 'cpu', 'cpu.cfs_quota_us'))
+    period = _read(os.path.join(root, 'cpu', 'cpu.cfs_period_us'))
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def cgroup_memory_limit_mb(root=CGROUP_ROOT):
+    """Return the memory limit of the container in MiB, None if unlimited"""
+    limit = _read(os.path.join(root, 'memory.max'))
+    if limit is None:
+        limit = _read(os.path.join(root, 'memory', 'memory.limit_in_bytes'))
+    if not limit or limit == 'max':
+        return None
+    limit_mb = int(limit) // (1024 * 1024)
+    # cgroup v1 reports "unlimited" as a number close to 2**63
+    if limit_mb >= 2 ** 40:
+        return None
+    return limit_mb
+
+
+def cpu_count(root=CGROUP_ROOT):
+    """Return the number of CPUs this process may use"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_quota(root)
+    if quota:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+def memory_limit_mb(root=CGROUP_ROOT):
+    """Return the memory available to this process in MiB"""
+    limit = cgroup_memory_limit_mb(root)
+    if limit is None:
+        try:
+            pages = os.sysconf('SC_PHYS_PAGES')
+            page_size = os.sysconf('SC_PAGE_SIZE')
+        except (AttributeError, ValueError, OSError):
+            return None
+        limit = pages * page_size // (1024 * 1024)
+    return limit
+
+
+def worker_count(cpus, memory_mb, worker_memory_mb=WORKER_MEMORY_MB):
+    """
+    Return (2 x cpus) + 1 workers, lowered to as many as fit in memory.
+    """
+    workers = 2 * cpus + 1
+    if memory_mb:
+        usable_mb = memory_mb * (1 - MEMORY_HEADROOM)
+        workers = min(workers, int(usable_mb // worker_memory_mb))
+    return max(workers, 1)
+
+
+def thread_count(cpus, workers, max_connections=None):
+    """
+    Return threads per worker so that all workers together serve about
+    CONCURRENCY_PER_CPU requests per core, without opening more database
+    connections than max_connections
+    """
+    threads = math.ceil(cpus * CONCURRENCY_PER_CPU / workers)
+    if max_connections:
+        threads = min(threads, max_connections // workers)
+    return min(max(threads, 1), MAX_THREADS)
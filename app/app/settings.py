@@ -30,8 +30,11 @@ ALLOWED_HOSTS = []
 
 # Application definition
 
+# API-only processes can leave the admin out, its autodiscovery and URLs are
+# then skipped
+ADMIN_ENABLED = os.environ.get('ADMIN_ENABLED', '1') != '0'
+
 INSTALLED_APPS = [
-    'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -43,6 +46,8 @@ INSTALLED_APPS = [
     'user',
     'recipe'
 ]
+if ADMIN_ENABLED:
+    INSTALLED_APPS.insert(0, 'django.contrib.admin')
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -52,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -74,6 +80,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+# size of the thread pool running views when served through app.asgi
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 16))
+
 
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
@@ -84,9 +93,35 @@ DATABASES = {
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
+        'PASSWORD': os.environ.get('DB_PASS'),
+    }
+}
+# cancel queries before the WSGI server kills the worker. Only set for the
+# server (see gunicorn.conf.py), migrations and commands run unbounded
+if os.environ.get('DB_STATEMENT_TIMEOUT_MS'):
+    DATABASES['default']['OPTIONS'] = {
+        'options': '-c statement_timeout=%s' % os.environ[
+            'DB_STATEMENT_TIMEOUT_MS'
+        ],
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.1/ref/settings/#caches
+
+# the default cache lives in each process unless MEMCACHED_LOCATION is set.
+# The token concurrency limits and facet invalidation only hold across
+# processes with the shared one, so production sets it
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+if os.environ.get('MEMCACHED_LOCATION'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': os.environ['MEMCACHED_LOCATION'],
+    }
 
 
 # Password validation
@@ -108,6 +143,74 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/2.1/topics/auth/passwords/
+# Argon2 is preferred; users with an older hash are rehashed on login
+
+PASSWORD_HASHERS = [
+    'core.hashers.TunedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+# memory cost in KiB, the defaults follow the OWASP recommendation
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', 2))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', 19456))
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', 1))
+
+# maximum number of token requests in flight per client address and email,
+# in each process unless the default cache is shared, see CACHES
+TOKEN_CONCURRENCY_PER_IP = 8
+TOKEN_CONCURRENCY_PER_EMAIL = 2
+
+
+# token buckets of the API, per client: scope -> (burst, tokens per second),
+# scopes left out aren't throttled, THROTTLE_ENABLED=0 leaves them all out
+# for load tests. See core/throttling.py
+THROTTLE_RATES = {
+    'recipes': (300, 10),
+    'recipe-attrs': (300, 10),
+    'recipe-upload': (10, 0.2),
+    'user': (60, 1),
+    'user-create': (10, 0.05),
+    'user-token': (20, 0.2),
+    'jobs': (30, 0.5),
+} if os.environ.get('THROTTLE_ENABLED', '1') != '0' else {}
+# requests cost a token, plus one per this many rows returned or bytes sent
+THROTTLE_ROWS_PER_TOKEN = 50
+THROTTLE_BYTES_PER_TOKEN = 256 * 1024
+# core.throttling.LocalBucketStore keeps buckets per process,
+# core.throttling.CacheBucketStore shares them through THROTTLE_CACHE
+THROTTLE_STORE = os.environ.get(
+    'THROTTLE_STORE', 'core.throttling.LocalBucketStore'
+)
+THROTTLE_CACHE = os.environ.get('THROTTLE_CACHE', 'default')
+
+
+# background jobs, see core/jobs.py: seconds between polls of an idle
+# worker, before a running job is taken as abandoned, and between retries,
+# doubling from JOB_RETRY_BACKOFF up to JOB_RETRY_BACKOFF_MAX
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1))
+JOB_LOCK_TIMEOUT = int(os.environ.get('JOB_LOCK_TIMEOUT', 60 * 60))
+JOB_RETRY_BACKOFF = 10
+JOB_RETRY_BACKOFF_MAX = 60 * 60
+
+
+# lifetime of API tokens in seconds
+AUTH_TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', 60 * 60 * 24 * 7))
+
+
+# serialized recipe details kept per process, and for how many seconds
+RECIPE_CACHE_SIZE = int(os.environ.get('RECIPE_CACHE_SIZE', 1000))
+RECIPE_CACHE_LOCAL_TIMEOUT = int(
+    os.environ.get('RECIPE_CACHE_LOCAL_TIMEOUT', 30)
+)
+# alias in CACHES of a cache shared by all processes, empty to disable
+RECIPE_CACHE_BACKEND = os.environ.get('RECIPE_CACHE_BACKEND', '')
+RECIPE_CACHE_TIMEOUT = int(os.environ.get('RECIPE_CACHE_TIMEOUT', 600))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/2.1/topics/i18n/
 
@@ -133,5 +236,22 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# where core.profiling stores profiled requests, and for how many seconds a
+# token from the profile_token command is accepted
+PROFILING_DIR = os.environ.get('PROFILING_DIR', '/vol/web/profiles')
+PROFILING_TOKEN_MAX_AGE = int(
+    os.environ.get('PROFILING_TOKEN_MAX_AGE', 60 * 60)
+)
+# stored profiles are deleted after this many seconds, and beyond this many
+PROFILING_MAX_AGE = int(
+    os.environ.get('PROFILING_MAX_AGE', 60 * 60 * 24 * 7)
+)
+PROFILING_MAX_PROFILES = int(os.environ.get('PROFILING_MAX_PROFILES', 200))
+
+# seconds a new process may take to set up Django, build its middleware
+# and load the URLconf, checked by profile_startup --check and by
+# core/tests/test_startup.py with CHECK_STARTUP_BUDGET=1
+STARTUP_BUDGET = float(os.environ.get('STARTUP_BUDGET', 2))
+
 # modify user model with custom model
 AUTH_USER_MODEL = 'core.User'
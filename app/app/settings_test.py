@@ -0,0 +1,30 @@
+"""
+Settings for running the tests, used by ``manage.py test`` by default.
+"""
+import tempfile
+
+from app.settings import *  # noqa: F401,F403
+from app.settings import PASSWORD_HASHERS
+
+
+# the production hashers are slow on purpose, keep them for tests of
+# hashing and upgrades
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+] + PASSWORD_HASHERS
+
+DEFAULT_FILE_STORAGE = 'core.storage.InMemoryStorage'
+# for code writing files directly, each parallel worker uses a subdirectory
+MEDIA_ROOT = tempfile.mkdtemp(prefix='recipe-app-media-')
+
+TEST_RUNNER = 'core.tests.runner.TimedTestRunner'
+
+# tests of throttling set their own rates
+THROTTLE_RATES = {}
+
+# each test process keeps its own cache, even with MEMCACHED_LOCATION set
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
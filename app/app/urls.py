@@ -13,14 +13,33 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
 
-urlpatterns = [
-    path('admin/', admin.site.urls),
+urlpatterns = []
+if settings.ADMIN_ENABLED:
+    # imported here so that processes without the admin never load it
+    from django.contrib import admin
+    from core.admin import profile_artifact, profile_index
+
+    urlpatterns += [
+        path(
+            'admin/profiles/',
+            admin.site.admin_view(profile_index),
+            name='profile-index'
+        ),
+        path(
+            'admin/profiles/<str:name>.<str:extension>',
+            admin.site.admin_view(profile_artifact),
+            name='profile-artifact'
+        ),
+        path('admin/', admin.site.urls),
+    ]
+
+urlpatterns += [
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
+    path('api/', include('core.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,10 +1,102 @@
+import os
+
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections, models as django_models
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
+from django.utils.functional import cached_property
+from django.utils.text import capfirst
 from django.utils.translation import gettext as _
-from core import models
+from core import deletion, models, profiling
+
+
+class BulkDeleteAdminMixin:
+    """Delete through core.deletion instead of Django's collector"""
+
+    def delete_model(self, request, obj):
+        deletion.bulk_delete(self.model._base_manager.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        deletion.bulk_delete(queryset)
+
+    def get_deleted_objects(self, objs, request):
+        """
+        Summarise what will be deleted with one COUNT per related table
+        rather than listing every cascaded object
+        """
+        objs = list(objs)
+        opts = self.model._meta
+        to_delete = [f'{capfirst(opts.verbose_name)}: {obj}' for obj in objs]
+        model_count = {opts.verbose_name_plural: len(objs)}
+        for rel in deletion.reverse_relations(self.model):
+            if rel.many_to_many or rel.on_delete is not django_models.CASCADE:
+                continue
+            count = rel.related_model._base_manager.filter(
+                **{f'{rel.field.name}__in': objs}
+            ).count()
+            if count:
+                model_count[rel.related_model._meta.verbose_name_plural] = \
+                    count
+
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(opts.verbose_name)
+
+        return to_delete, model_count, perms_needed, []
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Take the row count of unfiltered lists of large tables from the
+    PostgreSQL planner statistics instead of running COUNT(*)
+    """
+    # below this many rows an exact count is cheap and preferred
+    estimate_threshold = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.estimate_threshold:
+                return int(row[0])
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Admin for per-user tables with millions of rows: no full counts, no
+    select boxes listing a whole table, and only indexed searches and
+    orderings
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    # exact lookups use the unique index on email, then the user indexes
+    search_fields = ('user__email__exact',)
+    # newest first through the primary key, the only index over all users
+    ordering = ('-id',)
+    sortable_by = ('id',)
+
+    def get_readonly_fields(self, request, obj=None):
+        # rows stay with their owner, core.deletion relies on it for recipes
+        readonly_fields = super().get_readonly_fields(request, obj)
+        if obj is not None:
+            readonly_fields = tuple(readonly_fields) + ('user',)
+        return readonly_fields
 
 
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(BulkDeleteAdminMixin, BaseUserAdmin):
     ordering = ['id']
     list_display = ['email', 'name']
     # sections that we can edit for a specific user
@@ -25,7 +117,51 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class RecipeAdmin(BulkDeleteAdminMixin, LargeTableAdmin):
+    list_display = ['id', 'title', 'user']
+    raw_id_fields = ('user', 'tags', 'ingredients')
+    readonly_fields = ('version',)
+
+
+class RecipeAttrAdmin(LargeTableAdmin):
+    list_display = ['id', 'name', 'user', 'recipe_count']
+    readonly_fields = ('recipe_count',)
+
+
+class JobAdmin(LargeTableAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'run_at', 'user']
+    list_filter = ('status',)
+    readonly_fields = (
+        'attempts', 'locked_by', 'locked_at', 'created', 'finished'
+    )
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
-admin.site.register(models.Recipe)
\ No newline at end of file
+admin.site.register(models.Tag, RecipeAttrAdmin)
+admin.site.register(models.Ingredient, RecipeAttrAdmin)
+admin.site.register(models.Recipe, RecipeAdmin)
+admin.site.register(models.Job, JobAdmin)
+
+
+def profile_index(request):
+    """List the requests profiled by core.profiling"""
+    context = dict(
+        admin.site.each_context(request),
+        title=_('Request profiles'),
+        profiles=profiling.list_profiles(),
+    )
+    return TemplateResponse(request, 'admin/profiles.html', context)
+
+
+def profile_artifact(request, name, extension):
+    """Return the text report or the cProfile stats of a profile"""
+    if extension not in ('txt', 'prof') or os.sep in name:
+        raise Http404
+    path = os.path.join(settings.PROFILING_DIR, f'{name}.{extension}')
+    if not os.path.isfile(path):
+        raise Http404
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=extension == 'prof',
+        content_type='text/plain; charset=utf-8'
+    )
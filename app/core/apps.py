@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # connect the signal receivers keeping derived data up to date
+        from core import changelog, counters, similarity  # noqa: F401
+        # register the background tasks
+        from core import tasks  # noqa: F401
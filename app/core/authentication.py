@@ -0,0 +1,33 @@
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from core.models import AuthToken
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    """
+    Authenticate "Authorization: Token <key>" headers against AuthToken,
+    looking the key up by its hash and ignoring expired tokens
+    """
+    model = AuthToken
+
+    def authenticate_credentials(self, key):
+        try:
+            token = AuthToken.objects.select_related('user').get(
+                key_hash=AuthToken.hash_key(key),
+                expires__gt=timezone.now()
+            )
+        except AuthToken.DoesNotExist:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid or expired token.')
+            )
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+
+        return (token.user, token)
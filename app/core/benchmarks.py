@@ -0,0 +1,21 @@
+"""Helpers shared by the benchmark and load test commands"""
+import math
+
+
+def percentile(values, pct):
+    """Return the pct percentile of values using the nearest-rank method"""
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def format_report(latencies, statuses, elapsed, concurrency):
+    """Return the lines summarising a run of timed requests"""
+    lines = [
+        f'requests: {len(latencies)}, concurrency: {concurrency}, '
+        f'throughput: {len(latencies) / elapsed:.1f} req/s'
+    ]
+    for pct in (50, 95, 99):
+        lines.append(f'p{pct}: {percentile(latencies, pct) * 1000:.1f} ms')
+    lines.append(f'statuses: {dict(sorted(statuses.items(), key=str))}')
+    return lines
@@ -0,0 +1,221 @@
+"""
+Per-user change log of recipes, tags and ingredients, read by the sync
+endpoint so offline clients only download what changed since their last
+sync. Entries are recorded from model signals, including many-to-many
+edits, set-based deletes from core.deletion and copies from core.copying.
+
+Entries are numbered per user from ChangeLogSequence, whose row stays
+locked by the UPDATE that advances it until the transaction commits. A
+user's writes thus get their numbers in commit order, and a client syncing
+from a number never misses entries committed after it read, which ids
+assigned at INSERT time could not guarantee.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Max
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from core.models import (
+    ChangeLogEntry, ChangeLogSequence, Recipe, Tag, Ingredient
+)
+from core.signals import post_bulk_create, pre_bulk_delete
+
+
+TRACKED_MODELS = {
+    'recipe': Recipe,
+    'tag': Tag,
+    'ingredient': Ingredient,
+}
+MODEL_NAMES = {model: name for name, model in TRACKED_MODELS.items()}
+
+
+def allocate(user_id, count):
+    """
+    Reserve count sequence numbers for the user and return the first one.
+    Must run in the transaction writing the entries, which holds the lock
+    on the user's sequence until it ends
+    """
+    sequences = ChangeLogSequence.objects.filter(user_id=user_id)
+    if not sequences.update(last=F('last') + count):
+        try:
+            with transaction.atomic():
+                ChangeLogSequence.objects.create(user_id=user_id, last=count)
+        except IntegrityError:
+            # another transaction created it first
+            sequences.update(last=F('last') + count)
+    return sequences.values_list('last', flat=True).get() - count + 1
+
+
+def append(entries):
+    """Number the unsaved entries per user and insert them"""
+    by_user = {}
+    for entry in entries:
+        by_user.setdefault(entry.user_id, []).append(entry)
+    if not by_user:
+        return
+    with transaction.atomic():
+        # lock the sequences in a fixed order to avoid deadlocks
+        for user_id in sorted(by_user):
+            seq = allocate(user_id, len(by_user[user_id]))
+            for offset, entry in enumerate(by_user[user_id]):
+                entry.seq = seq + offset
+        ChangeLogEntry.objects.bulk_create(entries)
+
+
+def record(user_id, model_name, object_ids, action):
+    """Append one entry per object to the user's change log"""
+    append([
+        ChangeLogEntry(
+            user_id=user_id,
+            model=model_name,
+            object_id=object_id,
+            action=action
+        )
+        for object_id in object_ids
+    ])
+
+
+def record_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    action = ChangeLogEntry.CREATED if created else ChangeLogEntry.UPDATED
+    record(instance.user_id, MODEL_NAMES[sender], [instance.pk], action)
+
+
+def record_delete(sender, instance, **kwargs):
+    record(
+        instance.user_id,
+        MODEL_NAMES[sender],
+        [instance.pk],
+        ChangeLogEntry.DELETED
+    )
+
+
+@receiver(pre_bulk_delete)
+def record_bulk_delete(sender, queryset, origin, **kwargs):
+    # the log of a deleted user goes away together with the user
+    if sender not in MODEL_NAMES or origin not in MODEL_NAMES:
+        return
+    append([
+        ChangeLogEntry(
+            user_id=user_id,
+            model=MODEL_NAMES[sender],
+            object_id=object_id,
+            action=ChangeLogEntry.DELETED
+        )
+        for user_id, object_id in queryset.values_list('user_id', 'pk')
+    ])
+
+
+@receiver(post_bulk_create)
+def record_bulk_create(sender, queryset, **kwargs):
+    if sender not in MODEL_NAMES:
+        return
+    append([
+        ChangeLogEntry(
+            user_id=user_id,
+            model=MODEL_NAMES[sender],
+            object_id=object_id,
+            action=ChangeLogEntry.CREATED
+        )
+        for user_id, object_id in queryset.values_list('user_id', 'pk')
+    ])
+
+
+def record_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """A changed link shows up as an update of the recipe"""
+    if reverse:
+        # instance is a tag or ingredient, pk_set holds recipe ids
+        if action == 'pre_clear':
+            pk_set = sender.objects.filter(
+                **{MODEL_NAMES[type(instance)]: instance.pk}
+            ).values_list('recipe_id', flat=True)
+        elif action not in ('post_add', 'post_remove'):
+            return
+        record(instance.user_id, 'recipe', pk_set, ChangeLogEntry.UPDATED)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        record(instance.user_id, 'recipe', [instance.pk],
+               ChangeLogEntry.UPDATED)
+
+
+for model in TRACKED_MODELS.values():
+    post_save.connect(record_save, sender=model)
+    post_delete.connect(record_delete, sender=model)
+for through in (Recipe.tags.through, Recipe.ingredients.through):
+    m2m_changed.connect(record_m2m_change, sender=through)
+
+
+def changes_since(user, since, limit):
+    """
+    Return the user's changes after sequence number since, reading at most
+    limit log entries, as (seq, more, changed, deleted): seq is the number
+    to sync from next time, changed maps model names to querysets of the
+    objects to send and deleted maps them to ids of deleted objects.
+    Syncing from 0 returns every object, including those created before
+    the log existed
+    """
+    if not since:
+        changed = {
+            name: model.objects.filter(user=user)
+            for name, model in TRACKED_MODELS.items()
+        }
+        deleted = {name: [] for name in TRACKED_MODELS}
+        return latest_seq(user), False, changed, deleted
+
+    entries = list(
+        ChangeLogEntry.objects
+        .filter(user=user, seq__gt=since)
+        .order_by('seq')
+        .values_list('seq', 'model', 'object_id')[:limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+    seq = entries[-1][0] if entries else since
+
+    ids = {name: set() for name in TRACKED_MODELS}
+    for _, model_name, object_id in entries:
+        ids[model_name].add(object_id)
+
+    changed = {}
+    deleted = {}
+    for name, model in TRACKED_MODELS.items():
+        changed[name] = model.objects.filter(user=user, pk__in=ids[name])
+        existing = set(changed[name].values_list('pk', flat=True))
+        deleted[name] = sorted(ids[name] - existing)
+    return seq, more, changed, deleted
+
+
+def latest_seq(user):
+    """Return the sequence number of the user's latest change"""
+    return ChangeLogEntry.objects.filter(user=user).aggregate(
+        seq=Max('seq')
+    )['seq'] or 0
+
+
+def compact(batch_size):
+    """
+    Delete entries superseded by a later entry for the same object, which
+    carry no information for clients, scanning batch_size ids at a time.
+    Return the number of entries deleted
+    """
+    newer = ChangeLogEntry.objects.filter(
+        user=OuterRef('user'),
+        model=OuterRef('model'),
+        object_id=OuterRef('object_id'),
+        seq__gt=OuterRef('seq')
+    )
+    last_id = ChangeLogEntry.objects.aggregate(last=Max('id'))['last'] or 0
+    deleted = 0
+    for start in range(0, last_id, batch_size):
+        superseded = list(
+            ChangeLogEntry.objects
+            .filter(id__gt=start, id__lte=start + batch_size)
+            .annotate(superseded=Exists(newer))
+            .filter(superseded=True)
+            .values_list('id', flat=True)
+        )
+        if superseded:
+            deleted += ChangeLogEntry.objects.filter(
+                id__in=superseded
+            )._raw_delete(ChangeLogEntry.objects.db)
+    return deleted
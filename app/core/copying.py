@@ -0,0 +1,106 @@
+"""
+Set-based copying of recipes together with their tag and ingredient links.
+
+The copies are inserted with bulk_create, which maps each new id to its
+source, and their links with one ``INSERT ... SELECT`` per link table that
+reads the links of the sources inside the database, all in a single
+transaction. A copy references the image file of its source instead of
+duplicating it, core.deletion only removes files that no row references
+any more. No post_save or m2m_changed signals are sent for the copies,
+receivers that need to know about them listen to
+``core.signals.post_bulk_create`` instead.
+"""
+from django.db import connections, models, router, transaction
+
+from core.models import Recipe
+from core.signals import post_bulk_create
+
+
+# (source, copy) pairs per INSERT ... SELECT, each pair is a SELECT of the
+# UNION ALL, which SQLite limits to 500
+BATCH_SIZE = 400
+
+# columns the copies don't take from their source
+RESET_FIELDS = ('id', 'version')
+
+
+def _insert(objs, using):
+    """Insert the unsaved objs, setting their primary keys"""
+    manager = Recipe._base_manager.db_manager(using)
+    if connections[using].features.can_return_ids_from_bulk_insert:
+        manager.bulk_create(objs)
+        return
+    # databases not returning the ids of a bulk insert get one per row
+    fields = [
+        field for field in Recipe._meta.concrete_fields
+        if not isinstance(field, models.AutoField)
+    ]
+    for obj in objs:
+        obj.pk = manager._insert(
+            [obj], fields=fields, return_id=True, using=using
+        )
+
+
+def _copy_links(field, pairs, using):
+    """
+    Give every copy in the (source id, copy id) pairs the links of the
+    many-to-many field its source has
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    table = quote(field.remote_field.through._meta.db_table)
+    recipe_column = quote(field.m2m_column_name())
+    target_column = quote(field.m2m_reverse_name())
+    with connection.cursor() as cursor:
+        for start in range(0, len(pairs), BATCH_SIZE):
+            batch = pairs[start:start + BATCH_SIZE]
+            selects = ' UNION ALL '.join(
+                ['SELECT %s AS source_id, %s AS copy_id'] * len(batch)
+            )
+            cursor.execute(
+                f'INSERT INTO {table} ({recipe_column}, {target_column}) '
+                f'SELECT pairs.copy_id, links.{target_column} '
+                f'FROM {table} links INNER JOIN ({selects}) pairs '
+                f'ON links.{recipe_column} = pairs.source_id',
+                [value for pair in batch for value in pair]
+            )
+
+
+def copy_recipes(queryset, copies=1):
+    """
+    Copy every recipe in queryset copies times, with its tags, ingredients
+    and image, in one transaction. Return {recipe id: [ids of its copies]}
+    """
+    using = router.db_for_write(Recipe)
+    fields = [
+        field.attname for field in Recipe._meta.concrete_fields
+        if field.attname not in RESET_FIELDS
+    ]
+    with transaction.atomic(using=using):
+        sources = queryset.using(using).order_by('pk').values_list(
+            'pk', *fields
+        )
+        pairs = [
+            (source[0], Recipe(**dict(zip(fields, source[1:]))))
+            for source in sources
+            for _ in range(copies)
+        ]
+        if not pairs:
+            return {}
+        _insert([copy for _, copy in pairs], using)
+
+        pairs = [(source_id, copy.pk) for source_id, copy in pairs]
+        for field in Recipe._meta.many_to_many:
+            _copy_links(field, pairs, using)
+        post_bulk_create.send(
+            sender=Recipe,
+            queryset=Recipe._base_manager.using(using).filter(
+                pk__in=[copy_id for _, copy_id in pairs]
+            ),
+            using=using
+        )
+
+    copied = {}
+    for source_id, copy_id in pairs:
+        copied.setdefault(source_id, []).append(copy_id)
+    return copied
@@ -0,0 +1,130 @@
+"""
+Maintained ``recipe_count`` columns on Tag and Ingredient, so lists can be
+sorted by popularity without counting links on every request. Counts are
+updated inside the transaction that changes the links and can be rebuilt
+with the reconcile_counters command.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, pre_delete
+from django.dispatch import receiver
+
+from core.models import Recipe, Tag, Ingredient
+from core.signals import post_bulk_create, pre_bulk_delete
+
+
+# through model of each counted model's link to recipes, and the name of
+# the field pointing at the counted model on it
+COUNTED = {
+    Tag: (Recipe.tags.through, 'tag'),
+    Ingredient: (Recipe.ingredients.through, 'ingredient'),
+}
+THROUGH = {through: (model, field) for model, (through, field)
+           in COUNTED.items()}
+
+
+def adjust(model, pks, delta):
+    """Add delta to the recipe_count of the given objects"""
+    if pks:
+        model.objects.filter(pk__in=pks).update(
+            recipe_count=F('recipe_count') + delta
+        )
+
+
+def _linked(through, field, recipe_ids, pks=None):
+    """Return ids of the field objects linked to the given recipes"""
+    links = through.objects.filter(recipe_id__in=recipe_ids)
+    if pks is not None:
+        links = links.filter(**{f'{field}_id__in': pks})
+    return list(links.values_list(f'{field}_id', flat=True))
+
+
+def link_count_subquery(through, field, **filters):
+    """Return a subquery counting links to the outer object's pk"""
+    links = through.objects.filter(
+        **{field: OuterRef('pk')}, **filters
+    ).order_by().values(field).annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(links, output_field=IntegerField()), 0)
+
+
+def update_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    model, field = THROUGH[sender]
+    if reverse:
+        # instance is a tag or ingredient, pk_set holds recipe ids
+        if action == 'post_add':
+            adjust(model, [instance.pk], len(pk_set))
+        elif action == 'pre_remove':
+            removed = sender.objects.filter(
+                **{field: instance.pk}, recipe_id__in=pk_set
+            ).count()
+            adjust(model, [instance.pk], -removed)
+        elif action == 'pre_clear':
+            model.objects.filter(pk=instance.pk).update(recipe_count=0)
+    elif action == 'post_add':
+        adjust(model, pk_set, 1)
+    elif action == 'pre_remove':
+        adjust(model, _linked(sender, field, [instance.pk], pk_set), -1)
+    elif action == 'pre_clear':
+        adjust(model, _linked(sender, field, [instance.pk]), -1)
+
+
+for through in THROUGH:
+    m2m_changed.connect(update_counts, sender=through)
+
+
+@receiver(pre_delete, sender=Recipe)
+def release_counts(sender, instance, **kwargs):
+    # the collector removes links without sending m2m_changed
+    for model, (through, field) in COUNTED.items():
+        adjust(model, _linked(through, field, [instance.pk]), -1)
+
+
+@receiver(pre_bulk_delete, sender=Recipe)
+def release_bulk_counts(sender, queryset, origin, **kwargs):
+    # tags and ingredients of deleted users are deleted as well
+    if issubclass(origin, get_user_model()):
+        return
+    for model, (through, field) in COUNTED.items():
+        links = through.objects.filter(recipe__in=queryset)
+        model.objects.filter(
+            pk__in=links.values(f'{field}_id')
+        ).update(
+            recipe_count=F('recipe_count') - link_count_subquery(
+                through, field, recipe__in=queryset
+            )
+        )
+
+
+@receiver(post_bulk_create, sender=Recipe)
+def add_bulk_counts(sender, queryset, **kwargs):
+    # copies are inserted with their links, without m2m_changed
+    for model, (through, field) in COUNTED.items():
+        links = through.objects.filter(recipe__in=queryset)
+        model.objects.filter(
+            pk__in=links.values(f'{field}_id')
+        ).update(
+            recipe_count=F('recipe_count') + link_count_subquery(
+                through, field, recipe__in=queryset
+            )
+        )
+
+
+def reconcile(model, batch_size):
+    """
+    Recompute recipe_count of every object of model from the links,
+    batch_size objects per query. Return the number of objects scanned
+    """
+    through, field = COUNTED[model]
+    pks = model.objects.order_by('pk').values_list('pk', flat=True)
+    last_pk = 0
+    scanned = 0
+    while True:
+        batch = list(pks.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return scanned
+        model.objects.filter(pk__in=batch).update(
+            recipe_count=link_count_subquery(through, field)
+        )
+        last_pk = batch[-1]
+        scanned += len(batch)
@@ -0,0 +1,227 @@
+"""
+Set-based deletion of users, recipes and everything hanging off them.
+
+Django's ``Collector`` loads every related object into memory before
+deleting it, which is far too slow for users with large catalogs. The
+helpers below walk the model graph instead and issue one ``DELETE`` per
+table, children first, in chunked transactions. No ``pre_delete`` or
+``post_delete`` signals are sent for the deleted rows, receivers that need
+to know about them listen to ``core.signals.pre_bulk_delete`` instead.
+Files are removed once no remaining row references them, as copies from
+core.copying share the image of their source. Copies belong to the owner
+of their source, so for models with a user only that user's rows are
+looked at. This relies on rows never changing owner, which is why the
+admin shows the user of an existing row read-only.
+"""
+import logging
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files.storage import default_storage
+from django.db import models, router, transaction
+from django.db.models.deletion import ProtectedError
+
+from core import jobs
+from core.models import Recipe, Tag, Ingredient
+from core.signals import pre_bulk_delete
+
+
+DEFAULT_CHUNK_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+def remove_files(names, storage=default_storage):
+    """Delete the given files from storage, skipping missing ones"""
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.warning('Could not remove file %s', name, exc_info=True)
+
+
+def schedule_file_removal(names):
+    """Queue a job removing the files, so callers don't wait on disk I/O"""
+    job, _ = jobs.enqueue('core.remove_files', names=list(names))
+    return job
+
+
+def _file_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+
+
+def _file_names(model, queryset):
+    """Return the stored file names referenced by rows of the queryset"""
+    names = []
+    for field in _file_fields(model):
+        names.extend(
+            queryset.exclude(**{field.attname: ''})
+            .exclude(**{f'{field.attname}__isnull': True})
+            .values_list(field.attname, flat=True)
+        )
+    return names
+
+
+def _owners(model, queryset):
+    """Return the ids of the users owning rows of the queryset, if any"""
+    try:
+        model._meta.get_field('user')
+    except FieldDoesNotExist:
+        return None
+    return set(queryset.order_by().values_list('user_id', flat=True))
+
+
+def _unreferenced(model, names, using, owners=None):
+    """
+    Return the names of files no row of model references, only looking at
+    the rows of the owners when given
+    """
+    rows = model._base_manager.using(using)
+    if owners is not None:
+        rows = rows.filter(user_id__in=owners)
+    referenced = set()
+    for field in _file_fields(model):
+        referenced.update(
+            rows.filter(**{f'{field.attname}__in': set(names)})
+            .values_list(field.attname, flat=True)
+        )
+    return [name for name in dict.fromkeys(names) if name not in referenced]
+
+
+def reverse_relations(model):
+    """
+    Return the relations pointing at model, including hidden ones such as
+    foreign keys with related_name='+'
+    """
+    return [
+        field for field in model._meta.get_fields(include_hidden=True)
+        if field.auto_created and not field.concrete
+        # rows of auto-created through models go with the many-to-many links
+        and not (field.one_to_many and field.related_model._meta.auto_created)
+    ]
+
+
+def _cascade_delete(model, queryset, using, origin):
+    """
+    Delete the rows in queryset and every row depending on them, running
+    one statement per table and deleting dependents first.
+    Return the names of the files only the deleted rows referenced.
+    """
+    opts = model._meta
+    own_files = _file_names(model, queryset)
+    owners = _owners(model, queryset) if own_files else None
+    files = []
+    pre_bulk_delete.send(
+        sender=model, queryset=queryset, origin=origin, using=using
+    )
+
+    # link rows of many-to-many fields declared on this model
+    for field in opts.many_to_many:
+        through = field.remote_field.through
+        through._base_manager.using(using).filter(
+            **{f'{field.m2m_field_name()}__in': queryset}
+        )._raw_delete(using)
+
+    for rel in reverse_relations(model):
+        related_model = rel.related_model
+        if rel.many_to_many:
+            # link rows of many-to-many fields pointing at this model
+            through = rel.field.remote_field.through
+            through._base_manager.using(using).filter(
+                **{f'{rel.field.m2m_reverse_field_name()}__in': queryset}
+            )._raw_delete(using)
+            continue
+
+        related = related_model._base_manager.using(using).filter(
+            **{f'{rel.field.name}__in': queryset}
+        )
+        if rel.on_delete is models.CASCADE:
+            files.extend(
+                _cascade_delete(related_model, related, using, origin)
+            )
+        elif rel.on_delete is models.SET_NULL:
+            related.update(**{rel.field.name: None})
+        elif rel.on_delete is models.SET_DEFAULT:
+            related.update(**{rel.field.name: rel.field.get_default()})
+        elif rel.on_delete is models.PROTECT:
+            if related.exists():
+                raise ProtectedError(
+                    f'Cannot delete {opts.verbose_name_plural}: referenced '
+                    f'through protected foreign key {rel.field}',
+                    related
+                )
+        elif rel.on_delete is not models.DO_NOTHING:
+            raise ValueError(
+                f'Unsupported on_delete handler on {rel.field} for bulk delete'
+            )
+
+    queryset._raw_delete(using)
+    if own_files:
+        files.extend(_unreferenced(model, own_files, using, owners))
+    return files
+
+
+def _delete_in_chunks(queryset, chunk_size, origin=None):
+    """Delete queryset rows chunk_size at a time, one transaction each"""
+    model = queryset.model
+    origin = origin or model
+    using = router.db_for_write(model)
+    deleted = 0
+    while True:
+        pks = list(
+            queryset.order_by().values_list('pk', flat=True)[:chunk_size]
+        )
+        if not pks:
+            return deleted
+        with transaction.atomic(using=using):
+            files = _cascade_delete(
+                model,
+                model._base_manager.using(using).filter(pk__in=pks),
+                using,
+                origin
+            )
+            if files:
+                transaction.on_commit(
+                    partial(schedule_file_removal, files),
+                    using=using
+                )
+        deleted += len(pks)
+
+
+def delete_recipes(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Delete recipes and their tag/ingredient links, return the count"""
+    return _delete_in_chunks(queryset, chunk_size)
+
+
+def delete_users(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Delete users together with their recipes, tags, ingredients and any
+    other rows cascading from them, return the number of users deleted
+    """
+    user_model = get_user_model()
+    user_ids = list(queryset.order_by().values_list('pk', flat=True))
+    for start in range(0, len(user_ids), chunk_size):
+        ids = user_ids[start:start + chunk_size]
+        # the heaviest dependents go first so that no transaction gets huge
+        for model in (Recipe, Tag, Ingredient):
+            _delete_in_chunks(
+                model._base_manager.filter(user_id__in=ids),
+                chunk_size,
+                origin=user_model
+            )
+        _delete_in_chunks(
+            user_model._base_manager.filter(pk__in=ids),
+            chunk_size
+        )
+    return len(user_ids)
+
+
+def bulk_delete(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Delete any queryset set-based, return the number of rows deleted"""
+    if issubclass(queryset.model, get_user_model()):
+        return delete_users(queryset, chunk_size)
+    return _delete_in_chunks(queryset, chunk_size)
@@ -0,0 +1,105 @@
+"""
+Migration operations that build indexes without blocking writes.
+
+A plain ``CREATE INDEX`` locks the table against writes until the index is
+built, which takes minutes on large tables. On PostgreSQL the operations
+below use ``CONCURRENTLY`` instead; other databases fall back to the
+regular statements. Migrations using them must set ``atomic = False``,
+since concurrent index builds can't run inside a transaction.
+"""
+from django.db.migrations.operations import AddIndex
+from django.db.migrations.operations.base import Operation
+
+
+class AddIndexConcurrently(AddIndex):
+    """Add an index, concurrently on PostgreSQL"""
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            sql = str(self.index.create_sql(model, schema_editor))
+            schema_editor.execute(
+                sql.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1)
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.execute(
+                'DROP INDEX CONCURRENTLY IF EXISTS %s'
+                % schema_editor.quote_name(self.index.name)
+            )
+
+    def describe(self):
+        return 'Concurrently create index %s on field(s) %s of model %s' % (
+            self.index.name,
+            ', '.join(self.index.fields),
+            self.model_name,
+        )
+
+
+class DropIndexConcurrently(Operation):
+    """
+    Drop the index called name on the column of a field, concurrently on
+    PostgreSQL. Only the database is changed, so that dropping the index
+    of a foreign key doesn't go through AlterField, which re-creates its
+    constraint and checks every row while blocking writes. Pair it with
+    the AlterField in migrations.SeparateDatabaseAndState.
+    """
+    reversible = True
+
+    def __init__(self, model_name, field_name, name):
+        self.model_name = model_name
+        self.field_name = field_name
+        self.name = name
+
+    def deconstruct(self):
+        return (self.__class__.__name__, [], {
+            'model_name': self.model_name,
+            'field_name': self.field_name,
+            'name': self.name,
+        })
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def _concurrently(self, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            return ' CONCURRENTLY'
+        return ''
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.execute('DROP INDEX%s IF EXISTS %s' % (
+                self._concurrently(schema_editor),
+                schema_editor.quote_name(self.name),
+            ))
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            column = model._meta.get_field(self.field_name).column
+            schema_editor.execute('CREATE INDEX%s %s ON %s (%s)' % (
+                self._concurrently(schema_editor),
+                schema_editor.quote_name(self.name),
+                schema_editor.quote_name(model._meta.db_table),
+                schema_editor.quote_name(column),
+            ))
+
+    def describe(self):
+        return 'Concurrently drop index %s on field %s of model %s' % (
+            self.name, self.field_name, self.model_name
+        )
@@ -0,0 +1,279 @@
+"""
+Background jobs queued in the database.
+
+Tasks are functions registered with @task under a name. enqueue() stores
+a Job, and the run_jobs command runs due jobs in worker threads, or in
+several processes each with its threads, so the database is the only
+broker. A failing job is retried with exponential backoff until it has
+run max_attempts times. A job still running after JOB_LOCK_TIMEOUT is
+taken to belong to a worker that died and is queued again, so tasks must
+be safe to run twice.
+"""
+import json
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import traceback
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (
+    DatabaseError, IntegrityError, connection, connections, transaction
+)
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+# due jobs a worker tries to claim per query
+CLAIM_BATCH = 10
+
+TaskSpec = namedtuple('TaskSpec', 'func max_attempts user_facing')
+
+# task name -> TaskSpec
+tasks = {}
+
+
+def task(name, max_attempts=5, user_facing=False):
+    """
+    Register the decorated function as the task called name. Users can
+    queue user_facing tasks through the API, which get the user's id as
+    their user_id argument
+    """
+    def decorator(func):
+        tasks[name] = TaskSpec(func, max_attempts, user_facing)
+        return func
+    return decorator
+
+
+def enqueue(name, user=None, idempotency_key=None, run_at=None, **arguments):
+    """
+    Queue the task called name with JSON serializable keyword arguments,
+    return (job, created). A job queued earlier with the same
+    idempotency_key is returned instead of queueing another
+    """
+    if name not in tasks:
+        raise LookupError(f'Unknown task {name!r}')
+    fields = {
+        'name': name,
+        'arguments': json.dumps(arguments),
+        'user': user,
+        'max_attempts': tasks[name].max_attempts,
+        'run_at': run_at or timezone.now(),
+    }
+    if idempotency_key is None:
+        return Job.objects.create(**fields), True
+    try:
+        with transaction.atomic():
+            return Job.objects.create(
+                idempotency_key=idempotency_key, **fields
+            ), True
+    except IntegrityError:
+        return Job.objects.get(idempotency_key=idempotency_key), False
+
+
+def claim(worker):
+    """Mark the next due job as run by worker and return it, or None"""
+    now = timezone.now()
+    due = Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=now
+    ).order_by('run_at', 'id').values_list('id', flat=True)
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        # without row locks, workers racing for a job settle it here
+        for pk in due[:CLAIM_BATCH]:
+            claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+                status=Job.RUNNING,
+                locked_by=worker,
+                locked_at=now,
+                attempts=F('attempts') + 1
+            )
+            if claimed:
+                return Job.objects.get(pk=pk)
+    return None
+
+
+def backoff(attempts):
+    """Return the delay before retrying a job that failed attempts times"""
+    delay = min(
+        settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1),
+        settings.JOB_RETRY_BACKOFF_MAX
+    )
+    # jitter keeps jobs failing together from retrying together
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def run(job):
+    """Run a claimed job and record its outcome"""
+    finished = Job.objects.filter(pk=job.pk, locked_by=job.locked_by)
+    try:
+        if job.name not in tasks:
+            raise LookupError(f'Unknown task {job.name!r}')
+        result = json.dumps(
+            tasks[job.name].func(**json.loads(job.arguments))
+        )
+    except Exception:
+        logger.exception('Job %s (%s) failed', job.pk, job.name)
+        now = timezone.now()
+        outcome = {'error': traceback.format_exc()}
+        if job.attempts < job.max_attempts:
+            outcome.update(
+                status=Job.QUEUED, run_at=now + backoff(job.attempts)
+            )
+        else:
+            outcome.update(status=Job.FAILED, finished=now)
+        finished.update(locked_by='', locked_at=None, **outcome)
+        return False
+
+    finished.update(
+        status=Job.SUCCEEDED,
+        result=result,
+        error='',
+        locked_by='',
+        locked_at=None,
+        finished=timezone.now()
+    )
+    return True
+
+
+def requeue_stale():
+    """
+    Queue the jobs left running past JOB_LOCK_TIMEOUT again, or fail them
+    when they used up their attempts. Return how many were found
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    )
+    reset = {'locked_by': '', 'locked_at': None}
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished=now,
+        error='Abandoned by its worker', **reset
+    )
+    return failed + stale.update(status=Job.QUEUED, **reset)
+
+
+class Worker:
+    """
+    Run due jobs in concurrency threads until stop() is called, after
+    which each thread finishes its current job and exits. In burst mode
+    threads exit once no job is due
+    """
+
+    def __init__(self, concurrency=1, poll_interval=None, burst=False):
+        self.concurrency = concurrency
+        self.poll_interval = (
+            settings.JOB_POLL_INTERVAL if poll_interval is None
+            else poll_interval
+        )
+        self.burst = burst
+        self.stopping = threading.Event()
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+
+    def stop(self):
+        self.stopping.set()
+
+    def run(self):
+        """Work until stopped, in the calling thread for concurrency 1"""
+        if self.concurrency == 1:
+            return self.work(f'{self.name}:0')
+        threads = [
+            threading.Thread(
+                target=self._thread_main,
+                args=(f'{self.name}:{number}',),
+                name=f'job-worker-{number}'
+            )
+            for number in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _thread_main(self, name):
+        try:
+            self.work(name)
+        finally:
+            connection.close()
+
+    def work(self, name):
+        """Claim and run jobs as name until stopped, return the count run"""
+        ran = 0
+        while not self.stopping.is_set():
+            try:
+                job = claim(name)
+            except DatabaseError:
+                # the database restarting or a lock conflict, try again
+                logger.warning('Could not claim a job', exc_info=True)
+                connection.close()
+                self.stopping.wait(self.poll_interval)
+                continue
+            if job is None:
+                if self.burst:
+                    break
+                requeue_stale()
+                self.stopping.wait(self.poll_interval)
+                continue
+            run(job)
+            ran += 1
+        return ran
+
+
+def _process_main(concurrency, poll_interval, burst):
+    worker = Worker(concurrency, poll_interval, burst)
+
+    def stop(signum, frame):
+        logger.info('Stopping after the current jobs')
+        worker.stop()
+    previous = {
+        signum: signal.signal(signum, stop)
+        for signum in (signal.SIGTERM, signal.SIGINT)
+    }
+    try:
+        worker.run()
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+
+def run_workers(processes=1, threads=1, poll_interval=None, burst=False):
+    """
+    Work in this process, or in processes forked children relaying
+    SIGTERM and SIGINT to them, until stopped by one of those signals
+    """
+    if processes == 1:
+        return _process_main(threads, poll_interval, burst)
+
+    # imported here, web processes importing the tasks never fork
+    import multiprocessing
+
+    # children must not share the parent's database connections
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    children = [
+        context.Process(
+            target=_process_main, args=(threads, poll_interval, burst),
+            name=f'job-worker-process-{number}'
+        )
+        for number in range(processes)
+    ]
+    for child in children:
+        child.start()
+
+    def relay(signum, frame):
+        for child in children:
+            if child.is_alive():
+                os.kill(child.pid, signum)
+    signal.signal(signal.SIGTERM, relay)
+    signal.signal(signal.SIGINT, relay)
+    for child in children:
+        child.join()
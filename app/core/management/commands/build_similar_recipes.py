@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core import similarity
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    """Django command to precompute similar recipes"""
+    help = 'Rebuild the similar recipes of every recipe, user by user'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email', action='append', default=[],
+            help='Only rebuild for this user, may be repeated'
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.filter(
+            pk__in=Recipe.objects.values('user_id')
+        ).order_by('pk')
+        if options['email']:
+            users = users.filter(email__in=options['email'])
+
+        recipes = 0
+        for user in users.iterator():
+            recipes += similarity.rebuild(user)
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Rebuilt {user.email}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt similar recipes of {recipes} recipes'
+        ))
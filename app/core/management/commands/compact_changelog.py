@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core import changelog
+
+
+class Command(BaseCommand):
+    """Django command to drop superseded change log entries"""
+    help = 'Compact the sync change log, keeping the latest entry per object'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Log entries scanned per query'
+        )
+
+    def handle(self, *args, **options):
+        deleted = changelog.compact(options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Deleted {deleted} superseded entries')
+        )
@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import deletion
+
+
+class Command(BaseCommand):
+    """Django command to delete users and all their data set-based"""
+    help = 'Delete users, their recipes, tags and ingredients in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('emails', nargs='*', help='Emails of the users')
+        parser.add_argument(
+            '--id', dest='ids', type=int, action='append', default=[],
+            help='Id of a user to delete, can be repeated'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=deletion.DEFAULT_CHUNK_SIZE,
+            help='Rows deleted per transaction'
+        )
+
+    def handle(self, *args, **options):
+        if not options['emails'] and not options['ids']:
+            raise CommandError('Give at least one email or --id')
+
+        users = get_user_model().objects.filter(
+            email__in=options['emails']
+        ) | get_user_model().objects.filter(pk__in=options['ids'])
+        deleted = deletion.delete_users(users, options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} user(s)'))
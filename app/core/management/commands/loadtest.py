@@ -0,0 +1,110 @@
+import socket
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import format_report, percentile
+from core.models import AuthToken
+
+
+class Command(BaseCommand):
+    """Django command to load test a running server over HTTP"""
+    help = 'Send concurrent GET requests to URLs and report latencies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='URLs requested in turn')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--token', help='API token to send')
+        parser.add_argument(
+            '--email',
+            help='Issue a token for this user for the length of the run'
+        )
+        parser.add_argument(
+            '--max-p99-ms', type=float,
+            help='Fail when the 99th percentile latency is above this'
+        )
+        parser.add_argument(
+            '--max-error-rate', type=float, default=None,
+            help='Fail when a larger share of responses is not a 2xx'
+        )
+
+    def handle(self, *args, **options):
+        token = None
+        headers = {}
+        if options['email']:
+            try:
+                user = get_user_model().objects.get(email=options['email'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'No user with email {options["email"]}')
+            token, key = AuthToken.objects.issue(user)
+            headers['Authorization'] = f'Token {key}'
+        elif options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+
+        try:
+            latencies, statuses, elapsed = self.run_requests(
+                options['urls'],
+                headers,
+                options['requests'],
+                options['concurrency'],
+                options['timeout']
+            )
+        finally:
+            if token is not None:
+                token.delete()
+
+        for line in format_report(
+            latencies, statuses, elapsed, options['concurrency']
+        ):
+            self.stdout.write(line)
+
+        p99_ms = percentile(latencies, 99) * 1000
+        if options['max_p99_ms'] is not None and \
+                p99_ms > options['max_p99_ms']:
+            raise CommandError(
+                f'p99 latency {p99_ms:.1f} ms is over the '
+                f'{options["max_p99_ms"]} ms budget'
+            )
+        errors = sum(
+            count for status, count in statuses.items()
+            if status == 'error' or not 200 <= status < 300
+        )
+        error_rate = errors / len(latencies)
+        if options['max_error_rate'] is not None and \
+                error_rate > options['max_error_rate']:
+            raise CommandError(
+                f'{error_rate:.1%} of requests failed, over the '
+                f'{options["max_error_rate"]:.1%} budget'
+            )
+
+    def run_requests(self, urls, headers, total, concurrency, timeout):
+        """Send total requests from concurrency threads"""
+
+        def fetch(i):
+            request = Request(urls[i % len(urls)], headers=headers)
+            start = time.perf_counter()
+            try:
+                with urlopen(request, timeout=timeout) as response:
+                    response.read()
+                    status = response.status
+            except HTTPError as error:
+                status = error.code
+            except (URLError, socket.timeout, ConnectionError):
+                status = 'error'
+            return time.perf_counter() - start, status
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(fetch, range(total)))
+        elapsed = time.perf_counter() - start
+
+        latencies = [latency for latency, _ in results]
+        statuses = Counter(status for _, status in results)
+        return latencies, statuses, elapsed
@@ -0,0 +1,32 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+class Command(BaseCommand):
+    """Django command to migrate only when migrations are pending"""
+    help = (
+        'Run migrate when the database has unapplied migrations, skipping '
+        'its checks and post-migrate handlers otherwise'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database to migrate'
+        )
+
+    def handle(self, *args, **options):
+        database = options['database']
+        executor = MigrationExecutor(connections[database])
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if not plan:
+            self.stdout.write('No migrations to apply')
+            return
+
+        self.stdout.write(f'{len(plan)} migration(s) to apply')
+        call_command(
+            'migrate', database=database, verbosity=options['verbosity'],
+            stdout=self.stdout, stderr=self.stderr
+        )
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import startup
+
+
+class Command(BaseCommand):
+    """Django command to profile the cold start of a worker"""
+    help = (
+        'Start the app in a new process and report the time of each phase '
+        'of the start, of each app\'s ready() and of the slowest imports'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=20,
+            help='Imports and packages listed'
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Exit with an error when over STARTUP_BUDGET'
+        )
+
+    def handle(self, *args, **options):
+        result = startup.measure()
+        top = options['top']
+
+        self.stdout.write(
+            f'Cold start: {result.total * 1000:.1f} ms '
+            f'(budget {settings.STARTUP_BUDGET * 1000:.0f} ms)'
+        )
+        for phase in startup.PHASES:
+            self.stdout.write(
+                f'  {phase:<30} {result.phases[phase] * 1000:8.1f} ms'
+            )
+
+        self.stdout.write('App ready():')
+        for label, seconds in sorted(
+                result.ready.items(), key=lambda item: -item[1]):
+            self.stdout.write(f'  {label:<30} {seconds * 1000:8.1f} ms')
+
+        self.stdout.write('Imports by package, own time:')
+        for package, seconds in startup.by_package(
+                result.imports).most_common(top):
+            self.stdout.write(f'  {package:<30} {seconds * 1000:8.1f} ms')
+
+        self.stdout.write('Slowest imports, including their imports:')
+        slowest = sorted(
+            (entry for entry in result.imports if entry.depth == 0),
+            key=lambda entry: -entry.cumulative
+        )
+        for entry in slowest[:top]:
+            self.stdout.write(
+                f'  {entry.module:<30} {entry.cumulative * 1000:8.1f} ms'
+            )
+
+        if options['check'] and result.total > settings.STARTUP_BUDGET:
+            raise CommandError(
+                f'Cold start took {result.total:.3f} s, over the budget of '
+                f'{settings.STARTUP_BUDGET} s'
+            )
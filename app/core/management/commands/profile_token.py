@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import profiling
+
+
+class Command(BaseCommand):
+    """Django command to allow profiling requests with a header"""
+    help = 'Print an X-Profile header value that profiles the request'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'X-Profile: {profiling.make_token()}')
+        self.stderr.write(
+            f'Valid for {settings.PROFILING_TOKEN_MAX_AGE} seconds, '
+            f'profiles are stored in {settings.PROFILING_DIR}'
+        )
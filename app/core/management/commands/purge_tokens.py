@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import deletion
+from core.models import AuthToken
+
+
+class Command(BaseCommand):
+    """Django command to delete expired API tokens"""
+    help = 'Delete expired auth tokens in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=deletion.DEFAULT_CHUNK_SIZE,
+            help='Tokens deleted per transaction'
+        )
+
+    def handle(self, *args, **options):
+        expired = AuthToken.objects.filter(expires__lte=timezone.now())
+        deleted = deletion.bulk_delete(expired, options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Deleted {deleted} expired token(s)')
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core import counters
+from core.models import Tag, Ingredient
+
+
+class Command(BaseCommand):
+    """Django command to recompute the recipe counters"""
+    help = 'Recompute recipe_count of tags and ingredients from their links'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Objects updated per query'
+        )
+
+    def handle(self, *args, **options):
+        for model in (Tag, Ingredient):
+            scanned = counters.reconcile(model, options['batch_size'])
+            self.stdout.write(
+                f'Reconciled {scanned} {model._meta.verbose_name_plural}'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Counters reconciled'))
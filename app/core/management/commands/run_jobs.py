@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    """Django command to run queued background jobs"""
+    help = (
+        'Run background jobs until SIGTERM or SIGINT, which let the jobs '
+        'being run finish first'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=1,
+            help='Jobs run at once per process'
+        )
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Worker processes, forked from this one'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            help='Seconds between polls of an idle worker'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once no job is due'
+        )
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['processes'] < 1:
+            raise CommandError('--threads and --processes must be positive')
+
+        self.stdout.write(
+            f'Running jobs in {options["processes"]} process(es) with '
+            f'{options["threads"]} thread(s) each'
+        )
+        jobs.run_workers(
+            options['processes'], options['threads'],
+            options['poll_interval'], options['burst']
+        )
+        self.stdout.write(self.style.SUCCESS('Workers stopped'))
@@ -0,0 +1,49 @@
+# Generated by Django 2.1.15 on 2026-10-19 10:51
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_recipes(apps, schema_editor):
+    """Fill recipe_count for the existing tags and ingredients"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field in (('Tag', 'tag'), ('Ingredient', 'ingredient')):
+        through = getattr(Recipe, f'{field}s').through
+        links = through.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(n=Count('*')).values('n')
+        apps.get_model('core', model_name).objects.update(
+            recipe_count=Coalesce(
+                Subquery(links, output_field=IntegerField()), 0
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_changelogentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_recipes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'recipe_count', 'name'], name='core_ingred_user_id_634995_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'recipe_count', 'name'], name='core_tag_user_id_adfed4_idx'),
+        ),
+    ]
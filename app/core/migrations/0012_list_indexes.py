@@ -0,0 +1,70 @@
+# Generated by Django 2.1.15 on 2026-10-19 10:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from core.indexes import AddIndexConcurrently, DropIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # concurrent index builds can't run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0011_recipe_version'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'name', 'id'], name='core_ingred_user_id_bc8c66_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'title', 'id'], name='core_recipe_user_id_6248a0_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='tag',
+            index=models.Index(fields=['user', 'name', 'id'], name='core_tag_user_id_4ceac3_idx'),
+        ),
+        # the single column user indexes are prefixes of the ones above.
+        # AlterField would re-create the foreign key constraints, so only
+        # the indexes are dropped from the database
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                DropIndexConcurrently(model_name='ingredient', field_name='user', name='core_ingredient_user_id_73e97fe3'),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='ingredient',
+                    name='user',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                DropIndexConcurrently(model_name='recipe', field_name='user', name='core_recipe_user_id_04234149'),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='user',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                DropIndexConcurrently(model_name='tag', field_name='user', name='core_tag_user_id_1b670500'),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='tag',
+                    name='user',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+    ]
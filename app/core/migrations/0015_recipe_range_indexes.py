@@ -0,0 +1,25 @@
+# Generated by Django 2.1.15 on 2026-10-19 11:15
+
+from django.db import migrations, models
+
+from core.indexes import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # concurrent index builds can't run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0014_similarrecipe'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'price', '-title', '-id'], name='core_recipe_user_id_ff92ec_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'time_minutes', '-title', '-id'], name='core_recipe_user_id_b6c3a9_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+
+BATCH_SIZE = 500
+
+
+def import_tokens(apps, schema_editor):
+    """
+    Replace the plain rest_framework.authtoken keys with hashed, expiring
+    core.AuthToken rows, so clients holding one stay logged in
+    """
+    Token = apps.get_model('authtoken', 'Token')
+    AuthToken = apps.get_model('core', 'AuthToken')
+    expires = timezone.now() + timedelta(seconds=settings.AUTH_TOKEN_TTL)
+    tokens = list(Token.objects.values_list('key', 'user_id'))
+    for start in range(0, len(tokens), BATCH_SIZE):
+        batch = tokens[start:start + BATCH_SIZE]
+        AuthToken.objects.bulk_create([
+            AuthToken(
+                key_hash=hashlib.sha256(key.encode()).hexdigest(),
+                user_id=user_id,
+                expires=expires
+            )
+            for key, user_id in batch
+        ])
+        Token.objects.filter(key__in=[key for key, _ in batch]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authtoken', '0002_auto_20160226_1747'),
+        ('core', '0016_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(import_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 2.1.15 on 2026-10-19 11:54
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Max
+import django.db.models.deletion
+
+
+def number_entries(apps, schema_editor):
+    """Number the existing entries by id and start the sequences there"""
+    ChangeLogEntry = apps.get_model('core', 'ChangeLogEntry')
+    ChangeLogSequence = apps.get_model('core', 'ChangeLogSequence')
+    ChangeLogEntry.objects.update(seq=F('id'))
+    ChangeLogSequence.objects.bulk_create([
+        ChangeLogSequence(user_id=user_id, last=last)
+        for user_id, last in ChangeLogEntry.objects.order_by().values(
+            'user'
+        ).annotate(last=Max('seq')).values_list('user', 'last')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_import_authtoken_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogSequence',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('last', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='changelogentry',
+            name='seq',
+            field=models.BigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(number_entries, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='changelogentry',
+            unique_together={('user', 'seq')},
+        ),
+        migrations.RemoveIndex(
+            model_name='changelogentry',
+            name='core_change_user_id_ce4e15_idx',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.15 on 2026-10-19 11:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_changelog_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='recipe_attrs_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
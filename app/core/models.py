@@ -1,11 +1,15 @@
+import hashlib
+import secrets
 import uuid
 import os
+from datetime import timedelta
 
 from django.db import models
 from django.contrib.auth.models import (
     AbstractBaseUser, BaseUserManager, PermissionsMixin
  )
 from django.conf import settings
+from django.utils import timezone
 
 
 def recipe_image_file_path(instance, filename):
@@ -45,10 +49,32 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # bumped whenever the profile or password changes, see save()
+    profile_version = models.PositiveIntegerField(default=1)
+    # bumped whenever the user's tags, ingredients or recipe links change,
+    # outdating cached recipe details, see recipe.cache
+    recipe_attrs_version = models.PositiveIntegerField(default=1)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
+    # fields whose changes invalidate cached profiles
+    PROFILE_FIELDS = {'email', 'name', 'password'}
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        bump = not self._state.adding and (
+            update_fields is None
+            or self.PROFILE_FIELDS.intersection(update_fields)
+        )
+        if bump:
+            # incremented in the UPDATE, so concurrent saves both count
+            self.profile_version = models.F('profile_version') + 1
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'profile_version'}
+        super().save(*args, **kwargs)
+        if bump:
+            self.refresh_from_db(fields=['profile_version'])
 
 
 class Tag(models.Model):
@@ -58,8 +84,18 @@ class Tag(models.Model):
     # recommended way to point to user
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        # covered by the indexes below, which all start with user
+        db_index=False
     )
+    # number of recipes using it, maintained by core.counters
+    recipe_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'recipe_count', 'name']),
+            models.Index(fields=['user', 'name', 'id']),
+        ]
 
     def __str__(self):
         return self.name
@@ -70,8 +106,16 @@ class Ingredient(models.Model):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
+    recipe_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'recipe_count', 'name']),
+            models.Index(fields=['user', 'name', 'id']),
+        ]
 
     def __str__(self):
         return self.name
@@ -85,12 +129,208 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
     tags = models.ManyToManyField("Tag", related_name="recipes")
     ingredients = models.ManyToManyField("Ingredient", related_name="recipes")
+    # bumped on every edit, see RecipeSerializer.update
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'title', 'id']),
+            # ranges and orderings of ?price_min= and ?time_min= & co.
+            models.Index(fields=['user', 'price', '-title', '-id']),
+            models.Index(fields=['user', 'time_minutes', '-title', '-id']),
+        ]
 
     def __str__(self):
         return self.title
-    
+
+
+class AuthTokenManager(models.Manager):
+
+    def issue(self, user):
+        """
+        Creates a token for user and returns it together with its key,
+        which is not stored and cannot be recovered afterwards
+        """
+        key = secrets.token_hex(20)
+        token = self.create(
+            key_hash=AuthToken.hash_key(key),
+            user=user,
+            expires=timezone.now() + timedelta(seconds=settings.AUTH_TOKEN_TTL)
+        )
+        return token, key
+
+    def issue_many(self, users):
+        """
+        Like issue() for each of users with a single INSERT, returns a
+        list of (token, key) in the order of users
+        """
+        expires = timezone.now() + timedelta(seconds=settings.AUTH_TOKEN_TTL)
+        keys = [secrets.token_hex(20) for _ in users]
+        tokens = self.bulk_create([
+            AuthToken(key_hash=AuthToken.hash_key(key), user=user,
+                      expires=expires)
+            for user, key in zip(users, keys)
+        ])
+        return list(zip(tokens, keys))
+
+
+class AuthToken(models.Model):
+    """Expiring API token, only a hash of its key is stored"""
+    key_hash = models.CharField(max_length=64, primary_key=True)
+    # a user may hold several tokens, e.g. one per device
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='auth_tokens'
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    expires = models.DateTimeField(db_index=True)
+
+    objects = AuthTokenManager()
+
+    @staticmethod
+    def hash_key(key):
+        """Return the digest a token key is stored and looked up by"""
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def __str__(self):
+        return f'Token for {self.user} expiring {self.expires}'
+
+
+class ChangeLogSequence(models.Model):
+    """Last change sequence number handed out for a user"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+'
+    )
+    last = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user_id}: {self.last}'
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Change to a user's recipe, tag or ingredient. A user's entries are
+    numbered by seq in the order their transactions commit
+    """
+    CREATED = 'c'
+    UPDATED = 'u'
+    DELETED = 'd'
+    ACTION_CHOICES = (
+        (CREATED, 'created'),
+        (UPDATED, 'updated'),
+        (DELETED, 'deleted'),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    # the change sequence number clients sync from, see core.changelog
+    seq = models.BigIntegerField()
+    model = models.CharField(max_length=16)
+    object_id = models.PositiveIntegerField()
+    action = models.CharField(max_length=1, choices=ACTION_CHOICES)
+
+    class Meta:
+        unique_together = (('user', 'seq'),)
+        indexes = [
+            models.Index(fields=['model', 'object_id']),
+        ]
+
+    def __str__(self):
+        return f'{self.seq}: {self.model} {self.object_id} {self.action}'
+
+
+class SimilarRecipe(models.Model):
+    """
+    One of the recipes most similar to a recipe by shared tags and
+    ingredients, precomputed by core.similarity
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbours',
+        # covered by the unique and score indexes
+        db_index=False
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    # Jaccard index of the two recipes' tags and ingredients
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('recipe', 'similar')
+        indexes = [models.Index(fields=['recipe', '-score'])]
+
+    def __str__(self):
+        return f'{self.recipe_id} ~ {self.similar_id}: {self.score:.3f}'
+
+
+class Job(models.Model):
+    """Background job run by the run_jobs command, see core.jobs"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'queued'),
+        (RUNNING, 'running'),
+        (SUCCEEDED, 'succeeded'),
+        (FAILED, 'failed'),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=100)
+    # JSON encoded keyword arguments and return value of the task
+    arguments = models.TextField(default='{}')
+    result = models.TextField(blank=True)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=QUEUED
+    )
+    # user the job runs for, who can see its status
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        # covered by the (user, -id) index
+        db_index=False
+    )
+    # enqueueing again with the same key returns the existing job
+    idempotency_key = models.CharField(
+        max_length=255, unique=True, null=True, blank=True
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    error = models.TextField(blank=True)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the queue, polled by workers
+            models.Index(fields=['status', 'run_at']),
+            models.Index(fields=['user', '-id']),
+        ]
+
+    def __str__(self):
+        return f'{self.id}: {self.name} {self.status}'
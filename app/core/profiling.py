@@ -0,0 +1,244 @@
+"""
+On-demand profiling of single requests in production.
+
+A request is profiled when it carries an ``X-Profile`` header holding a
+token from the profile_token command, or when a staff user logged into the
+admin adds ``?_profile=1``. Its cProfile stats, the SQL it ran and the
+query plans of that SQL are written to PROFILING_DIR and listed in the
+admin. Requests without the header or flag only pay for two dict lookups.
+
+Query parameters are only written as their types and quoted literals in
+the SQL and plans as '?', since they hold emails, password hashes and
+other user data. Profiles older than PROFILING_MAX_AGE, or beyond the
+newest PROFILING_MAX_PROFILES, are deleted whenever a new one is saved.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core import signing
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+
+HEADER = 'HTTP_X_PROFILE'
+QUERY_FLAG = '_profile'
+SIGNING_SALT = 'core.profiling'
+# functions listed in the text report, by cumulative time
+REPORT_FUNCTIONS = 40
+_QUOTED = re.compile(r"'(?:[^']|'')*'")
+
+
+def make_token():
+    """Return a value for the X-Profile header"""
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign('profile')
+
+
+def should_profile(request):
+    token = request.META.get(HEADER)
+    if token is not None:
+        try:
+            signing.TimestampSigner(salt=SIGNING_SALT).unsign(
+                token, max_age=settings.PROFILING_TOKEN_MAX_AGE
+            )
+        except signing.BadSignature:
+            return False
+        return True
+    if QUERY_FLAG in request.GET:
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_staff
+    return False
+
+
+class QueryRecorder:
+    """execute_wrapper keeping the SQL run on a connection"""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': self.alias,
+                'sql': sql,
+                # the parameter sets of executemany may be a used up iterator
+                'params': None if many else params,
+                'many': many,
+                'duration_ms': (time.perf_counter() - start) * 1000,
+            })
+
+
+def redact(text):
+    """Replace the quoted literals in SQL or a query plan with '?'"""
+    return _QUOTED.sub("'?'", text)
+
+
+def param_types(params):
+    """Return the type names of query parameters, written instead of them"""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+def explain(query):
+    """
+    Return the plan of a recorded query. Plain reads are run again under
+    EXPLAIN ANALYZE where supported, writes and locking reads are only
+    planned so that explaining them changes nothing
+    """
+    sql = query['sql']
+    if query['many']:
+        return None
+    connection = connections[query['alias']]
+    options = {}
+    if (connection.vendor == 'postgresql'
+            and sql.lstrip().upper().startswith('SELECT')
+            and 'FOR UPDATE' not in sql.upper()):
+        options['analyze'] = True
+    try:
+        prefix = connection.ops.explain_query_prefix(**options)
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', query['params'])
+            rows = cursor.fetchall()
+    except DatabaseError as e:
+        return f'EXPLAIN failed: {e}'
+    return '\n'.join(' '.join(str(column) for column in row) for row in rows)
+
+
+def _artifact_name(request):
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-') or 'root'
+    stamp = timezone.now().strftime('%Y%m%dT%H%M%S%f')
+    return f'{stamp}-{request.method.lower()}-{slug[:80]}'
+
+
+def save(request, response, profiler, queries, duration_ms):
+    """Write the artifacts of a profiled request, return their base name"""
+    name = _artifact_name(request)
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    base = os.path.join(settings.PROFILING_DIR, name)
+    profiler.dump_stats(f'{base}.prof')
+
+    report = io.StringIO()
+    report.write(
+        f'{request.method} {request.path} -> '
+        f'{response.status_code} in {duration_ms:.1f} ms, '
+        f'{len(queries)} queries\n\n'
+    )
+    stats = pstats.Stats(profiler, stream=report)
+    stats.sort_stats('cumulative').print_stats(REPORT_FUNCTIONS)
+    for number, query in enumerate(queries, 1):
+        report.write(
+            f'\n-- query {number}, {query["duration_ms"]:.2f} ms\n'
+            f'{redact(query["sql"])}\n{param_types(query["params"])}\n'
+        )
+        plan = explain(query)
+        if plan:
+            report.write(f'{redact(plan)}\n')
+    with open(f'{base}.txt', 'w') as f:
+        f.write(report.getvalue())
+
+    with open(f'{base}.json', 'w') as f:
+        json.dump({
+            'name': name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 1),
+            'queries': len(queries),
+            'query_ms': round(sum(q['duration_ms'] for q in queries), 1),
+            'created': timezone.now().isoformat(),
+        }, f)
+    prune()
+    return name
+
+
+def prune():
+    """
+    Delete the profiles older than PROFILING_MAX_AGE seconds and those
+    beyond the newest PROFILING_MAX_PROFILES, return how many were deleted
+    """
+    try:
+        names = os.listdir(settings.PROFILING_DIR)
+    except FileNotFoundError:
+        return 0
+    artifacts = {}
+    for name in names:
+        artifacts.setdefault(name.split('.', 1)[0], []).append(
+            os.path.join(settings.PROFILING_DIR, name)
+        )
+
+    cutoff = time.time() - settings.PROFILING_MAX_AGE
+    deleted = 0
+    # names start with their creation time
+    for number, base in enumerate(sorted(artifacts, reverse=True)):
+        try:
+            expired = min(map(os.path.getmtime, artifacts[base])) < cutoff
+        except FileNotFoundError:
+            # pruned by another process meanwhile
+            continue
+        if number < settings.PROFILING_MAX_PROFILES and not expired:
+            continue
+        for path in artifacts[base]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        deleted += 1
+    return deleted
+
+
+def list_profiles():
+    """Return the metadata of the stored profiles, newest first"""
+    try:
+        names = os.listdir(settings.PROFILING_DIR)
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in sorted(names, reverse=True):
+        if name.endswith('.json'):
+            with open(os.path.join(settings.PROFILING_DIR, name)) as f:
+                profiles.append(json.load(f))
+    return profiles
+
+
+class ProfilingMiddleware:
+    """Profile the requests asking for it, see the module docstring"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not should_profile(request):
+            return self.get_response(request)
+
+        recorders = [QueryRecorder(alias) for alias in connections]
+        profiler = cProfile.Profile()
+        with ExitStack() as stack:
+            for recorder in recorders:
+                stack.enter_context(
+                    connections[recorder.alias].execute_wrapper(recorder)
+                )
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            duration_ms = (time.perf_counter() - start) * 1000
+
+        queries = [q for recorder in recorders for q in recorder.queries]
+        name = save(request, response, profiler, queries, duration_ms)
+        response['X-Profile-Id'] = name
+        return response
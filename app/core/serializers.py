@@ -0,0 +1,33 @@
+import json
+
+from django.utils.translation import ugettext_lazy as _
+
+from rest_framework import serializers
+
+from core import jobs
+from core.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for background jobs"""
+    result = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = (
+            "id", "name", "status", "attempts", "max_attempts", "result",
+            "error", "run_at", "created", "finished"
+        )
+        read_only_fields = (
+            "id", "status", "attempts", "max_attempts", "error", "run_at",
+            "created", "finished"
+        )
+
+    def get_result(self, job):
+        return json.loads(job.result) if job.result else None
+
+    def validate_name(self, name):
+        task = jobs.tasks.get(name)
+        if task is None or not task.user_facing:
+            raise serializers.ValidationError(_("Unknown task"))
+        return name
@@ -0,0 +1,16 @@
+from django.dispatch import Signal
+
+
+# sent by core.deletion before rows of sender are deleted with raw SQL, as
+# no pre_delete/post_delete signals are sent for them; origin is the model
+# whose deletion caused the cascade
+pre_bulk_delete = Signal(providing_args=['queryset', 'origin', 'using'])
+
+# sent by core.throttling when a request is refused, with the scope of the
+# bucket that ran out and the seconds until it allows a request again
+throttled = Signal(providing_args=['request', 'scope', 'wait'])
+
+# sent by core.copying once rows of sender and their many-to-many links
+# were inserted set-based, as no post_save/m2m_changed signals are sent for
+# them; queryset holds the inserted rows
+post_bulk_create = Signal(providing_args=['queryset', 'using'])
@@ -0,0 +1,214 @@
+"""
+Precomputed "similar recipes": for every recipe, the TOP_K recipes of the
+same user with the highest Jaccard index over their tags and ingredients,
+stored in SimilarRecipe so that reading them is a single indexed query.
+
+Scores come from an inverted index from each tag and ingredient to the
+recipes using it, which amounts to multiplying the sparse recipe x item
+incidence matrix by its transpose without ever touching recipes that share
+nothing. The build_similar_recipes command rebuilds everything; link
+changes queue a job refreshing the affected recipes, in the transaction
+making them, and copies from core.copying queue a rebuild of their owner's
+lists. Refreshes and rebuilds hold a lock on the owner while they read and
+write, so concurrent ones for the same user can't insert a pair twice.
+"""
+import heapq
+from collections import Counter, defaultdict
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed
+
+from core import jobs
+from core.models import Recipe, SimilarRecipe
+from core.signals import post_bulk_create
+
+
+TOP_K = 20
+# rows written or deleted per statement
+BATCH_SIZE = 500
+
+# through model of each linked model and the name of its field on it
+LINKS = (
+    (Recipe.tags.through, 'tag'),
+    (Recipe.ingredients.through, 'ingredient'),
+)
+
+
+def item_sets(recipes):
+    """
+    Return {recipe id: set of (field, id) items} for the recipes in the
+    given queryset or id list, with one query per link table
+    """
+    items = defaultdict(set)
+    for through, field in LINKS:
+        links = through.objects.filter(recipe__in=recipes).values_list(
+            'recipe_id', f'{field}_id'
+        )
+        for recipe_id, item_id in links:
+            items[recipe_id].add((field, item_id))
+    return items
+
+
+def inverted_index(items):
+    """Return {item: list of recipe ids} for {recipe id: items}"""
+    index = defaultdict(list)
+    for recipe_id, recipe_items in items.items():
+        for item in recipe_items:
+            index[item].append(recipe_id)
+    return index
+
+
+def neighbours(recipe_id, recipe_items, index, sizes, k=None):
+    """
+    Return the k (score, recipe id) pairs most similar to the recipe with
+    recipe_items, best first, from an inverted index and item counts. k
+    defaults to TOP_K
+    """
+    if k is None:
+        k = TOP_K
+    shared = Counter()
+    for item in recipe_items:
+        shared.update(index.get(item, ()))
+    shared.pop(recipe_id, None)
+    size = len(recipe_items)
+    return heapq.nlargest(k, (
+        (common / (size + sizes[other] - common), other)
+        for other, common in shared.items()
+    ))
+
+
+def _rows(recipe_id, scored):
+    return [
+        SimilarRecipe(recipe_id=recipe_id, similar_id=other, score=score)
+        for score, other in scored
+    ]
+
+
+def _lock(user_id):
+    """Wait for other refreshes of the user's lists, inside a transaction"""
+    list(get_user_model().objects.select_for_update().filter(
+        pk=user_id
+    ).values_list('pk', flat=True))
+
+
+def rebuild(user):
+    """Recompute the similar recipes of all the user's recipes"""
+    with transaction.atomic():
+        _lock(getattr(user, 'pk', user))
+        recipes = Recipe.objects.filter(user=user)
+        items = item_sets(recipes)
+        index = inverted_index(items)
+        sizes = {recipe_id: len(s) for recipe_id, s in items.items()}
+        rows = []
+        for recipe_id, recipe_items in items.items():
+            rows.extend(_rows(
+                recipe_id, neighbours(recipe_id, recipe_items, index, sizes)
+            ))
+        SimilarRecipe.objects.filter(recipe__user=user).delete()
+        SimilarRecipe.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(items)
+
+
+def refresh(recipe_ids):
+    """
+    Recompute the similar recipes of the given recipes, and put them into
+    the lists of the recipes they now share items with. A list the recipe
+    drops out of isn't refilled from other recipes, so lists can be
+    shorter than an exact rebuild would make them until the next one
+    """
+    existing = Recipe.objects.filter(pk__in=recipe_ids)
+    for recipe_id, user_id in existing.values_list('pk', 'user_id'):
+        with transaction.atomic():
+            _lock(user_id)
+            _refresh_one(recipe_id, user_id)
+
+
+def _refresh_one(recipe_id, user_id):
+    """Refresh one recipe, holding the lock on its owner"""
+    recipe_items = item_sets([recipe_id]).get(recipe_id, set())
+    # recipes of the user sharing at least one item
+    sharing = Q()
+    for through, field in LINKS:
+        sharing |= Q(pk__in=through.objects.filter(**{
+            f'{field}_id__in': [
+                item_id for name, item_id in recipe_items if name == field
+            ]
+        }).values('recipe_id'))
+    candidates = Recipe.objects.filter(sharing, user_id=user_id)
+    items = item_sets(candidates)
+    items[recipe_id] = recipe_items
+    sizes = {pk: len(s) for pk, s in items.items()}
+    # the similarity is symmetric, so this is also the recipe's score in
+    # the list of every candidate
+    scored = neighbours(
+        recipe_id, recipe_items, inverted_index(items), sizes, k=len(items)
+    )
+
+    lists = defaultdict(dict)
+    for row_id, other, similar_id, score in SimilarRecipe.objects.filter(
+        recipe__in=candidates
+    ).exclude(similar_id=recipe_id).values_list(
+        'id', 'recipe_id', 'similar_id', 'score'
+    ):
+        lists[other][similar_id] = (score, row_id)
+    new_rows = _rows(recipe_id, scored[:TOP_K])
+    evicted = []
+    for score, other in scored:
+        current = lists[other]
+        if len(current) >= TOP_K:
+            worst = min(current, key=current.get)
+            if score <= current[worst][0]:
+                continue
+            evicted.append(current.pop(worst)[1])
+        new_rows.append(SimilarRecipe(
+            recipe_id=other, similar_id=recipe_id, score=score
+        ))
+
+    SimilarRecipe.objects.filter(
+        Q(recipe_id=recipe_id) | Q(similar_id=recipe_id)
+    ).delete()
+    for start in range(0, len(evicted), BATCH_SIZE):
+        SimilarRecipe.objects.filter(
+            pk__in=evicted[start:start + BATCH_SIZE]
+        ).delete()
+    SimilarRecipe.objects.bulk_create(new_rows, batch_size=BATCH_SIZE)
+
+
+def schedule_refresh(recipe_ids):
+    """
+    Queue a refresh of the recipes, which only becomes due if the current
+    transaction commits. Refreshing reads every recipe sharing an item, so
+    it is kept off the request
+    """
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        jobs.enqueue('core.refresh_similar_recipes', recipe_ids=recipe_ids)
+
+
+def links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            schedule_refresh([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        schedule_refresh(pk_set)
+    elif action == 'pre_clear':
+        field = dict((through, field) for through, field in LINKS)[sender]
+        schedule_refresh(sender.objects.filter(
+            **{field: instance.pk}
+        ).values_list('recipe_id', flat=True))
+
+
+def recipes_bulk_created(sender, queryset, **kwargs):
+    # refreshing every copy one by one would repeat the same work for each
+    for user_id in set(queryset.values_list('user_id', flat=True)):
+        transaction.on_commit(partial(
+            jobs.enqueue, 'core.rebuild_similar_recipes', user_id=user_id
+        ))
+
+
+for through, _ in LINKS:
+    m2m_changed.connect(links_changed, sender=through)
+post_bulk_create.connect(recipes_bulk_created, sender=Recipe)
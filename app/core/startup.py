@@ -0,0 +1,147 @@
+"""
+Measurement of the cold start of a process serving the app.
+
+measure() starts a fresh interpreter with ``python -X importtime`` that
+does what a worker does before its first request: it loads the settings,
+sets the apps up (running their ready()), builds the WSGI handler with its
+middleware and loads the URLconf, which imports the views. The seconds of
+each phase, of each app's ready() and of each import are returned.
+
+Modules imported with importlib.import_module(), like the apps and the
+URLconfs, are not reported by -X importtime themselves, only their own
+imports are. Startup.modules lists everything the process imported.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import Counter, namedtuple
+
+
+PHASES = ('settings', 'apps', 'middleware', 'urls')
+
+ImportTime = namedtuple('ImportTime', 'module self cumulative depth')
+
+_IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$')
+
+
+class Startup(namedtuple('Startup', 'phases ready imports modules')):
+    """
+    Seconds per phase and per app's ready(), ImportTimes and names of the
+    modules imported by a start
+    """
+
+    @property
+    def total(self):
+        return sum(self.phases.values())
+
+
+def parse_importtime(output):
+    """Return the ImportTimes in the stderr of ``python -X importtime``"""
+    imports = []
+    for line in output.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            imports.append(ImportTime(
+                module, int(own) / 1e6, int(cumulative) / 1e6,
+                (len(indent) - 1) // 2
+            ))
+    return imports
+
+
+def by_package(imports):
+    """Return the seconds spent importing each top level package"""
+    totals = Counter()
+    for entry in imports:
+        totals[entry.module.partition('.')[0]] += entry.self
+    return totals
+
+
+def measure(env=None):
+    """
+    Start the app in a new process with the current settings module and
+    the environment updated with env, return its Startup
+    """
+    from django.conf import settings
+
+    child_env = dict(os.environ)
+    child_env['PYTHONPATH'] = os.pathsep.join(filter(None, sys.path))
+    child_env.update(env or {})
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-m', 'core.startup'],
+        cwd=settings.BASE_DIR, env=child_env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True
+    )
+    if process.returncode:
+        errors = [
+            line for line in process.stderr.splitlines()
+            if not line.startswith('import time:')
+        ]
+        raise RuntimeError(
+            'Starting the app failed:\n' + '\n'.join(errors[-20:])
+        )
+    times = json.loads(process.stdout.splitlines()[-1])
+    return Startup(
+        times['phases'], times['ready'], parse_importtime(process.stderr),
+        set(times['modules'])
+    )
+
+
+def _start():
+    """Start the app as a worker would, return the seconds of each step"""
+    phases = {}
+    ready = {}
+    start = time.perf_counter()
+
+    def lap(phase):
+        nonlocal start
+        now = time.perf_counter()
+        phases[phase] = now - start
+        start = now
+
+    import django
+    from django.apps import AppConfig
+    from django.conf import settings
+    settings.INSTALLED_APPS
+    lap('settings')
+
+    def timed(config):
+        method = config.ready
+
+        def ready_method():
+            began = time.perf_counter()
+            try:
+                return method()
+            finally:
+                ready[config.label] = time.perf_counter() - began
+        return ready_method
+
+    create = AppConfig.create.__func__
+
+    def timed_create(cls, entry):
+        config = create(cls, entry)
+        config.ready = timed(config)
+        return config
+    AppConfig.create = classmethod(timed_create)
+    try:
+        django.setup(set_prefix=False)
+    finally:
+        AppConfig.create = classmethod(create)
+    lap('apps')
+
+    from django.core.wsgi import get_wsgi_application
+    get_wsgi_application()
+    lap('middleware')
+
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    lap('urls')
+    return {'phases': phases, 'ready': ready, 'modules': list(sys.modules)}
+
+
+if __name__ == '__main__':
+    print(json.dumps(_start()))
@@ -0,0 +1,64 @@
+"""
+File storage keeping files in memory, used by the test settings so that
+tests don't write uploads to disk or share them between processes.
+"""
+import threading
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.utils.deconstruct import deconstructible
+from django.utils.encoding import filepath_to_uri
+
+
+@deconstructible
+class InMemoryStorage(Storage):
+    """Storage holding file contents in a dict, per process"""
+
+    def __init__(self, base_url=None):
+        self.base_url = base_url
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def _open(self, name, mode='rb'):
+        with self._lock:
+            try:
+                return ContentFile(self._files[name], name=name)
+            except KeyError:
+                raise FileNotFoundError(name)
+
+    def _save(self, name, content):
+        content.seek(0)
+        data = content.read()
+        if isinstance(data, str):
+            data = data.encode()
+        with self._lock:
+            self._files[name] = data
+        return name
+
+    def delete(self, name):
+        with self._lock:
+            self._files.pop(name, None)
+
+    def exists(self, name):
+        return name in self._files
+
+    def listdir(self, path):
+        prefix = f'{path.rstrip("/")}/' if path else ''
+        directories, files = set(), []
+        for name in list(self._files):
+            if not name.startswith(prefix):
+                continue
+            head, sep, tail = name[len(prefix):].partition('/')
+            if sep:
+                directories.add(head)
+            else:
+                files.append(head)
+        return sorted(directories), sorted(files)
+
+    def size(self, name):
+        return len(self._files[name])
+
+    def url(self, name):
+        base_url = self.base_url or settings.MEDIA_URL
+        return base_url + filepath_to_uri(name)
@@ -0,0 +1,39 @@
+"""
+Background tasks of the core app, queued with core.jobs.enqueue and run by
+the run_jobs command.
+"""
+from django.contrib.auth import get_user_model
+
+from core import counters, deletion, similarity
+from core.jobs import task
+from core.models import Tag, Ingredient
+
+
+@task('core.remove_files')
+def remove_files(names):
+    deletion.remove_files(names)
+
+
+@task('core.delete_users', max_attempts=3)
+def delete_users(user_ids):
+    return deletion.delete_users(
+        get_user_model().objects.filter(pk__in=user_ids)
+    )
+
+
+@task('core.reconcile_counters')
+def reconcile_counters(batch_size=1000):
+    return {
+        model._meta.model_name: counters.reconcile(model, batch_size)
+        for model in (Tag, Ingredient)
+    }
+
+
+@task('core.rebuild_similar_recipes', user_facing=True)
+def rebuild_similar_recipes(user_id):
+    return similarity.rebuild(user_id)
+
+
+@task('core.refresh_similar_recipes')
+def refresh_similar_recipes(recipe_ids):
+    similarity.refresh(recipe_ids)
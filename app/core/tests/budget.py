@@ -0,0 +1,118 @@
+"""
+Query budgets guarding views against N+1 queries and changed SQL.
+
+Tests mixing in QueryBudgetMixin wrap requests in assertQueryBudget(name),
+or decorate a whole test with query_budget(name). Either fails when the
+block runs more queries than BUDGET_FILE allows for the name, or when the
+shapes of its SQL (with literals replaced by ?) differ from the baseline
+recorded there for the database in use. Databases without a baseline
+fail too, so a baseline recorded on another database can't hide changes.
+
+Run the tests with UPDATE_QUERY_BUDGETS=1, and without --parallel, to
+write the current counts and shapes to the file, so that the changes show
+up in its diff.
+"""
+import difflib
+import json
+import os
+import re
+from contextlib import contextmanager
+from functools import wraps
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+BUDGET_FILE = os.path.join(os.path.dirname(__file__), 'query_budgets.json')
+UPDATE_ENV = 'UPDATE_QUERY_BUDGETS'
+
+# applied in order, so that lists of placeholders collapse last
+_LITERALS = (
+    # savepoint names, which include the thread id
+    (re.compile(r'\bs\d+_x\d+\b'), 's?'),
+    # server-side cursor names, which do too
+    (re.compile(r'\b_django_curs_\d+_\d+\b'), '_django_curs_?'),
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\?(?:, \?)*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def sql_shape(sql):
+    """Return the SQL with its literal values replaced by placeholders"""
+    for pattern, replacement in _LITERALS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def load_budgets(path=BUDGET_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def record_budget(name, vendor, shapes, path=BUDGET_FILE):
+    """Store the count and SQL shapes of the named block"""
+    budgets = load_budgets(path)
+    budget = budgets.setdefault(name, {'sql': {}})
+    budget['sql'][vendor] = shapes
+    budget['max_queries'] = max(map(len, budget['sql'].values()))
+    with open(path, 'w') as f:
+        json.dump(budgets, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+class QueryBudgetMixin:
+    """TestCase mixin checking blocks of code against query budgets"""
+    budget_file = BUDGET_FILE
+
+    @contextmanager
+    def assertQueryBudget(self, name, using='default'):
+        connection = connections[using]
+        with CaptureQueriesContext(connection) as captured:
+            yield
+        shapes = [sql_shape(query['sql']) for query in captured]
+        if os.environ.get(UPDATE_ENV):
+            record_budget(name, connection.vendor, shapes, self.budget_file)
+            return
+
+        budget = load_budgets(self.budget_file).get(name)
+        if budget is None:
+            self.fail(
+                f'No query budget for {name!r}, run the tests with '
+                f'{UPDATE_ENV}=1 to record one'
+            )
+        if len(shapes) > budget['max_queries']:
+            self.fail(
+                f'{name!r} ran {len(shapes)} queries, its budget is '
+                f'{budget["max_queries"]}:\n' + '\n'.join(shapes)
+            )
+        baseline = budget['sql'].get(connection.vendor)
+        if baseline is None:
+            self.fail(
+                f'No {connection.vendor} baseline for {name!r}, run the '
+                f'tests on {connection.vendor} with {UPDATE_ENV}=1 to '
+                f'record one'
+            )
+        if shapes != baseline:
+            diff = difflib.unified_diff(
+                baseline, shapes, 'baseline', 'recorded', lineterm=''
+            )
+            self.fail(
+                f'The SQL of {name!r} changed, run the tests with '
+                f'{UPDATE_ENV}=1 if that is intended:\n' + '\n'.join(diff)
+            )
+
+
+def query_budget(name, using='default'):
+    """Decorate a QueryBudgetMixin test to check all its queries"""
+    def decorator(test):
+        @wraps(test)
+        def wrapper(self, *args, **kwargs):
+            with self.assertQueryBudget(name, using):
+                return test(self, *args, **kwargs)
+        return wrapper
+    return decorator
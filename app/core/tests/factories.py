@@ -0,0 +1,79 @@
+"""
+Shared test fixtures. The bulk helpers create rows with one INSERT per
+call and skip model signals, so link recipes to tags and ingredients with
+the related managers when counters or the change log matter.
+"""
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+
+from core.models import Recipe, Tag, Ingredient
+
+
+DEFAULT_PASSWORD = 'testpass'
+
+_sequence = count(1)
+
+
+def _unique_email():
+    return f'user{next(_sequence)}@londonappdev.com'
+
+
+def make_user(email=None, password=DEFAULT_PASSWORD, **fields):
+    """Create and return a user"""
+    return get_user_model().objects.create_user(
+        email or _unique_email(), password, **fields
+    )
+
+
+def make_users(number, password=DEFAULT_PASSWORD, **fields):
+    """Create number users sharing one password hash, return them"""
+    user_model = get_user_model()
+    password_hash = make_password(password)
+    emails = [_unique_email() for _ in range(number)]
+    user_model.objects.bulk_create([
+        user_model(email=email, password=password_hash, **fields)
+        for email in emails
+    ])
+    return list(user_model.objects.filter(email__in=emails).order_by('id'))
+
+
+def make_recipe(user, **fields):
+    """Create and return a recipe"""
+    defaults = {'title': 'Sample recipe', 'time_minutes': 10, 'price': 5}
+    defaults.update(fields)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def make_recipes(user, number, **fields):
+    """Create number recipes for user, return them by id"""
+    defaults = {'time_minutes': 10, 'price': 5}
+    defaults.update(fields)
+    Recipe.objects.bulk_create([
+        Recipe(user=user, **{'title': f'Recipe {next(_sequence)}',
+                             **defaults})
+        for _ in range(number)
+    ])
+    return _latest(Recipe, user, number)
+
+
+def make_tags(user, names):
+    """Create a tag for user per name, return them by id"""
+    return _make_named(Tag, user, names)
+
+
+def make_ingredients(user, names):
+    """Create an ingredient for user per name, return them by id"""
+    return _make_named(Ingredient, user, names)
+
+
+def _make_named(model, user, names):
+    model.objects.bulk_create([model(user=user, name=name) for name in names])
+    return _latest(model, user, len(names))
+
+
+def _latest(model, user, number):
+    # bulk_create doesn't set primary keys on every database
+    latest = model.objects.filter(user=user).order_by('-id')[:number]
+    return list(reversed(latest))
@@ -0,0 +1,98 @@
+"""
+Test runner reporting the slowest tests, also under --parallel, where it
+gives every worker process its own MEDIA_ROOT.
+"""
+import os
+import time
+import unittest
+
+from django.conf import settings
+from django.test import runner
+from django.test.utils import override_settings
+
+
+class TimedTextTestResult(unittest.TextTestResult):
+    """Text result recording how long each test took"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.durations = {}
+        self._started = None
+
+    def startTest(self, test):
+        self._started = time.perf_counter()
+        super().startTest(test)
+
+    def addDuration(self, test, elapsed):
+        """Record a duration measured in a worker process"""
+        self.durations[test.id()] = elapsed
+
+    def stopTest(self, test):
+        super().stopTest(test)
+        # replayed results of parallel runs have their duration already
+        self.durations.setdefault(
+            test.id(), time.perf_counter() - self._started
+        )
+
+
+class TimedRemoteTestResult(runner.RemoteTestResult):
+
+    def startTest(self, test):
+        self._started = time.perf_counter()
+        super().startTest(test)
+
+    def stopTest(self, test):
+        self.events.append(
+            ('addDuration', self.test_index,
+             time.perf_counter() - self._started)
+        )
+        super().stopTest(test)
+
+
+class TimedRemoteTestRunner(runner.RemoteTestRunner):
+    resultclass = TimedRemoteTestResult
+
+
+def _init_worker(counter):
+    runner._init_worker(counter)
+    # media of tests running at the same time must not collide
+    override_settings(MEDIA_ROOT=os.path.join(
+        settings.MEDIA_ROOT, f'worker-{runner._worker_id}'
+    )).enable()
+
+
+class IsolatedParallelTestSuite(runner.ParallelTestSuite):
+    init_worker = _init_worker
+    runner_class = TimedRemoteTestRunner
+
+
+class TimedTestRunner(runner.DiscoverRunner):
+    """Discover runner printing the slowest tests after the run"""
+    parallel_test_suite = IsolatedParallelTestSuite
+
+    def __init__(self, slowest=10, **kwargs):
+        super().__init__(**kwargs)
+        self.slowest = slowest
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--slowest', type=int, default=10,
+            help='Number of slowest tests to report, 0 to disable'
+        )
+
+    def get_resultclass(self):
+        return super().get_resultclass() or TimedTextTestResult
+
+    def run_suite(self, suite, **kwargs):
+        result = super().run_suite(suite, **kwargs)
+        durations = getattr(result, 'durations', {})
+        if self.slowest and durations:
+            slowest = sorted(
+                durations.items(), key=lambda item: item[1], reverse=True
+            )[:self.slowest]
+            result.stream.writeln(f'\nSlowest {len(slowest)} tests:')
+            for test_id, elapsed in slowest:
+                result.stream.writeln(f'{elapsed:8.3f}s  {test_id}')
+        return result
@@ -2,6 +2,9 @@ from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from core.admin import EstimatedCountPaginator
+from core.models import Recipe, Tag
+
 
 class AdminSiteTest(TestCase):
 
@@ -44,3 +47,52 @@ class AdminSiteTest(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+    def test_recipes_listed(self):
+        """Test that recipes are listed with their owner"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Pie', time_minutes=5, price=1
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        url = reverse('admin:core_recipe_changelist')
+
+        res = self.client.get(url)
+
+        self.assertContains(res, recipe.title)
+        self.assertContains(res, self.user.email)
+
+    def test_recipe_search_by_owner_email(self):
+        """Test that recipes are searched by the exact owner email"""
+        Recipe.objects.create(
+            user=self.user, title='Pie', time_minutes=5, price=1
+        )
+        Recipe.objects.create(
+            user=self.admin_user, title='Cake', time_minutes=5, price=1
+        )
+        url = reverse('admin:core_recipe_changelist')
+
+        res = self.client.get(url, {'q': self.user.email})
+
+        self.assertContains(res, 'Pie')
+        self.assertNotContains(res, 'Cake')
+
+    def test_recipe_change_page(self):
+        """Test that the recipe edit page renders relations as raw ids"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Pie', time_minutes=5, price=1
+        )
+        url = reverse('admin:core_recipe_change', args=[recipe.id])
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, 'vManyToManyRawIdAdminField')
+        self.assertNotContains(res, 'name="user"')
+
+    def test_paginator_counts_exactly_without_statistics(self):
+        """Test that the paginator counts rows when it can't estimate"""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        paginator = EstimatedCountPaginator(Tag.objects.order_by('id'), 10)
+
+        self.assertEqual(paginator.count, 1)
@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+
+from core.models import Tag
+from core.tests import budget, factories
+
+
+class QueryBudgetTests(budget.QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.budget_file = os.path.join(directory, 'budgets.json')
+        self.user = factories.make_user()
+
+    def write_budget(self, max_queries, shapes=None):
+        entry = {'max_queries': max_queries, 'sql': {}}
+        if shapes is not None:
+            entry['sql'][connection.vendor] = shapes
+        with open(self.budget_file, 'w') as f:
+            json.dump({'tags': entry}, f)
+
+    def list_tags(self):
+        list(Tag.objects.filter(user=self.user, name__in=['a', 'b']))
+
+    def test_sql_shape(self):
+        """Test that literal values are replaced by placeholders"""
+        self.assertEqual(
+            budget.sql_shape(
+                "SELECT \"t\".\"id\" FROM \"core_tag\" T2\n"
+                "WHERE \"t\".\"name\" = 'it''s' AND \"t\".\"id\" IN (1, 2, 3)"
+                " LIMIT 21"
+            ),
+            'SELECT "t"."id" FROM "core_tag" T2 WHERE "t"."name" = ? '
+            'AND "t"."id" IN (...) LIMIT ?'
+        )
+        self.assertEqual(
+            budget.sql_shape('RELEASE SAVEPOINT "s140272479980416_x3"'),
+            'RELEASE SAVEPOINT "s?"'
+        )
+        self.assertEqual(
+            budget.sql_shape('DECLARE "_django_curs_140123372600192_16"'),
+            'DECLARE "_django_curs_?"'
+        )
+
+    def test_within_budget(self):
+        """Test that a block matching its budget passes"""
+        with patch.dict(os.environ, {budget.UPDATE_ENV: '1'}):
+            with self.assertQueryBudget('tags'):
+                self.list_tags()
+
+        with self.assertQueryBudget('tags'):
+            self.list_tags()
+
+    def test_over_budget(self):
+        """Test that running more queries than budgeted fails"""
+        self.write_budget(1)
+
+        with self.assertRaisesMessage(AssertionError, 'ran 2 queries'):
+            with self.assertQueryBudget('tags'):
+                self.list_tags()
+                self.list_tags()
+
+    def test_changed_sql(self):
+        """Test that SQL differing from the baseline fails with a diff"""
+        self.write_budget(1, ['SELECT ?'])
+
+        with self.assertRaisesMessage(AssertionError, '-SELECT ?'):
+            with self.assertQueryBudget('tags'):
+                self.list_tags()
+
+    def test_missing_baseline(self):
+        """Test that a budget without a baseline for the database fails"""
+        self.write_budget(1)
+
+        message = f'No {connection.vendor} baseline'
+        with self.assertRaisesMessage(AssertionError, message):
+            with self.assertQueryBudget('tags'):
+                self.list_tags()
+
+    def test_missing_budget(self):
+        """Test that blocks without a budget fail"""
+        with self.assertRaisesMessage(AssertionError, 'No query budget'):
+            with self.assertQueryBudget('tags'):
+                self.list_tags()
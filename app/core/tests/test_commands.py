@@ -1,7 +1,12 @@
+from io import StringIO
 from unittest.mock import patch
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
 from django.db.utils import OperationalError
 from django.test import TestCase
+from django.utils import timezone
+
+from core.models import AuthToken, ChangeLogEntry, Tag
 
 
 class CommandTests(TestCase):
@@ -21,3 +26,61 @@ class CommandTests(TestCase):
             gi.side_effect = [OperationalError] * 5 + [True]
             call_command('wait_for_db')
             self.assertEqual(gi.call_count, 6)
+
+    def test_purge_tokens(self):
+        """Test that only expired tokens are purged"""
+        user = get_user_model().objects.create_user(
+            'test@montero.es', 'test1234'
+        )
+        AuthToken.objects.issue(user)
+        expired, _ = AuthToken.objects.issue(user)
+        AuthToken.objects.filter(pk=expired.pk).update(
+            expires=timezone.now()
+        )
+
+        call_command('purge_tokens', '--batch-size', '1', stdout=StringIO())
+
+        self.assertEqual(AuthToken.objects.count(), 1)
+        self.assertFalse(AuthToken.objects.filter(pk=expired.pk).exists())
+
+    def test_compact_changelog(self):
+        """Test that only the latest entry per object is kept"""
+        user = get_user_model().objects.create_user(
+            'test@montero.es', 'test1234'
+        )
+        tag = Tag.objects.create(user=user, name='Vegan')
+        tag.name = 'Vegetarian'
+        tag.save()
+        other_tag = Tag.objects.create(user=user, name='Meaty')
+
+        call_command(
+            'compact_changelog', '--batch-size', '1', stdout=StringIO()
+        )
+
+        entries = ChangeLogEntry.objects.order_by('id')
+        self.assertEqual(
+            [(e.object_id, e.action) for e in entries],
+            [(tag.id, ChangeLogEntry.UPDATED),
+             (other_tag.id, ChangeLogEntry.CREATED)]
+        )
+
+    @patch('core.management.commands.migrate_if_needed.call_command')
+    def test_migrate_if_needed_up_to_date(self, migrate):
+        """Test that migrate is skipped without pending migrations"""
+        out = StringIO()
+        call_command('migrate_if_needed', stdout=out)
+
+        migrate.assert_not_called()
+        self.assertIn('No migrations to apply', out.getvalue())
+
+    @patch('core.management.commands.migrate_if_needed.call_command')
+    def test_migrate_if_needed_pending(self, migrate):
+        """Test that pending migrations are applied"""
+        with patch(
+            'django.db.migrations.executor.MigrationExecutor.migration_plan',
+            return_value=[('migration', False)]
+        ):
+            call_command('migrate_if_needed', stdout=StringIO())
+
+        migrate.assert_called_once()
+        self.assertEqual(migrate.call_args[0], ('migrate',))
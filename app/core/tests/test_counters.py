@@ -0,0 +1,89 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from core import deletion
+from core.models import Recipe, Tag, Ingredient
+
+
+class RecipeCounterTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@montero.es', 'test1234'
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.other_tag = Tag.objects.create(user=self.user, name='Quick')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Rice'
+        )
+        self.recipe = self.sample_recipe()
+
+    def sample_recipe(self, title='Costillas con tomate'):
+        return Recipe.objects.create(
+            user=self.user, title=title, time_minutes=40, price=4.00
+        )
+
+    def assertCounts(self, tag, other_tag, ingredient):
+        for obj, expected in ((self.tag, tag), (self.other_tag, other_tag),
+                              (self.ingredient, ingredient)):
+            obj.refresh_from_db()
+            self.assertEqual(obj.recipe_count, expected, obj.name)
+
+    def test_add_and_remove_links(self):
+        """Test that adding and removing links updates the counters"""
+        second = self.sample_recipe('Roasted fish')
+        self.recipe.tags.add(self.tag, self.other_tag)
+        self.recipe.tags.add(self.tag)
+        second.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+        self.assertCounts(2, 1, 1)
+
+        self.recipe.tags.remove(self.tag, self.tag)
+        second.tags.remove(self.other_tag)
+        self.assertCounts(1, 1, 1)
+
+        self.recipe.tags.set([self.tag])
+        self.assertCounts(2, 0, 1)
+
+        self.recipe.ingredients.clear()
+        self.assertCounts(2, 0, 0)
+
+    def test_reverse_links(self):
+        """Test that editing links from the tag side updates its counter"""
+        second = self.sample_recipe('Roasted fish')
+        self.tag.recipes.add(self.recipe, second)
+        self.assertCounts(2, 0, 0)
+
+        self.tag.recipes.remove(second, second)
+        self.assertCounts(1, 0, 0)
+
+        self.tag.recipes.clear()
+        self.assertCounts(0, 0, 0)
+
+    def test_recipe_deletion(self):
+        """Test that deleting recipes releases their counts"""
+        second = self.sample_recipe('Roasted fish')
+        for recipe in (self.recipe, second):
+            recipe.tags.add(self.tag)
+            recipe.ingredients.add(self.ingredient)
+
+        self.recipe.delete()
+        self.assertCounts(1, 0, 1)
+
+        deletion.delete_recipes(Recipe.objects.filter(pk=second.pk))
+        self.assertCounts(0, 0, 0)
+
+    def test_reconcile_counters(self):
+        """Test that the reconcile command recomputes drifted counters"""
+        self.recipe.tags.add(self.tag)
+        Tag.objects.update(recipe_count=7)
+        Ingredient.objects.update(recipe_count=3)
+
+        call_command(
+            'reconcile_counters', '--batch-size', '1', stdout=StringIO()
+        )
+
+        self.assertCounts(1, 0, 0)
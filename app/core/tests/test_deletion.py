@@ -0,0 +1,203 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core import deletion
+from core.models import (
+    ChangeLogEntry, Ingredient, Job, Recipe, SimilarRecipe, Tag
+)
+
+
+def sample_user(email='test@montero.es', password='test1234'):
+    """Create a sample user"""
+    return get_user_model().objects.create_user(email, password)
+
+
+def file_removals(mock_on_commit):
+    """Return the file removals scheduled through a mocked on_commit"""
+    return [
+        call[0][0] for call in mock_on_commit.call_args_list
+        if getattr(call[0][0], 'func', None) is deletion.schedule_file_removal
+    ]
+
+
+def sample_recipe(user, title='Costillas con tomate'):
+    """Create a sample recipe with one tag and one ingredient"""
+    recipe = Recipe.objects.create(
+        user=user, title=title, time_minutes=40, price=4.00
+    )
+    recipe.tags.add(Tag.objects.create(user=user, name='Meaty'))
+    recipe.ingredients.add(Ingredient.objects.create(user=user, name='Pork'))
+    return recipe
+
+
+class BulkDeletionTests(TestCase):
+
+    def setUp(self):
+        self.user = sample_user()
+        self.other_user = sample_user(email='other@montero.es')
+
+    def test_delete_users_removes_all_related_rows(self):
+        """Test that deleting a user removes everything hanging off them"""
+        sample_recipe(self.user)
+        sample_recipe(self.user, title='Roasted fish')
+        Token.objects.create(user=self.user)
+        other_recipe = sample_recipe(self.other_user)
+
+        deleted = deletion.delete_users(
+            get_user_model().objects.filter(pk=self.user.pk),
+            chunk_size=1
+        )
+
+        self.assertEqual(deleted, 1)
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists()
+        )
+        for model in (Recipe, Tag, Ingredient, Token):
+            self.assertFalse(model.objects.filter(user=self.user.pk).exists())
+        self.assertEqual(Recipe.tags.through.objects.count(), 1)
+        self.assertEqual(Recipe.ingredients.through.objects.count(), 1)
+        self.assertTrue(Recipe.objects.filter(pk=other_recipe.pk).exists())
+
+    def test_delete_follows_hidden_relations(self):
+        """Test that rows pointing back with related_name='+' are deleted"""
+        recipe = sample_recipe(self.user)
+        other_recipe = sample_recipe(self.other_user)
+        SimilarRecipe.objects.create(
+            recipe=other_recipe, similar=recipe, score=0.5
+        )
+        Job.objects.create(name='core.remove_files', user=self.user)
+
+        deletion.delete_users(get_user_model().objects.filter(pk=self.user.pk))
+
+        for model in (ChangeLogEntry, Job):
+            self.assertFalse(model.objects.filter(user=self.user.pk).exists())
+        self.assertFalse(SimilarRecipe.objects.exists())
+
+    def test_delete_recipes_keeps_tags_and_ingredients(self):
+        """Test that deleting recipes only removes their links"""
+        recipe = sample_recipe(self.user)
+
+        deleted = deletion.delete_recipes(Recipe.objects.filter(pk=recipe.pk))
+
+        self.assertEqual(deleted, 1)
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Recipe.tags.through.objects.exists())
+        self.assertFalse(Recipe.ingredients.through.objects.exists())
+        self.assertEqual(Tag.objects.count(), 1)
+        self.assertEqual(Ingredient.objects.count(), 1)
+
+    def test_image_removal_is_deferred(self):
+        """Test that image files are only queued for removal"""
+        recipe = sample_recipe(self.user)
+        Recipe.objects.filter(pk=recipe.pk).update(image='uploads/a.jpg')
+
+        with patch('core.deletion.transaction.on_commit') as mock_on_commit:
+            deletion.delete_recipes(Recipe.objects.all())
+
+        callback, = file_removals(mock_on_commit)
+        self.assertEqual(callback.args, (['uploads/a.jpg'],))
+
+    def test_shared_image_is_kept(self):
+        """Test that files still referenced by other recipes are kept"""
+        recipe = sample_recipe(self.user)
+        copy = sample_recipe(self.user, title='Costillas al horno')
+        Recipe.objects.update(image='uploads/a.jpg')
+
+        with patch('core.deletion.transaction.on_commit') as mock_on_commit:
+            deletion.delete_recipes(Recipe.objects.filter(pk=recipe.pk))
+        self.assertEqual(file_removals(mock_on_commit), [])
+
+        with patch('core.deletion.transaction.on_commit') as mock_on_commit:
+            deletion.delete_recipes(Recipe.objects.filter(pk=copy.pk))
+        callback, = file_removals(mock_on_commit)
+        self.assertEqual(callback.args, (['uploads/a.jpg'],))
+
+    def test_image_check_limited_to_owners(self):
+        """Test that only the owners' recipes are checked for the file"""
+        recipe = sample_recipe(self.user)
+        sample_recipe(self.other_user)
+        Recipe.objects.update(image='uploads/a.jpg')
+
+        with patch('core.deletion.transaction.on_commit') as mock_on_commit, \
+                patch('core.deletion._unreferenced',
+                      wraps=deletion._unreferenced) as mock_unreferenced:
+            deletion.delete_recipes(Recipe.objects.filter(pk=recipe.pk))
+
+        self.assertEqual(mock_unreferenced.call_args[0][3], {self.user.pk})
+        callback, = file_removals(mock_on_commit)
+        self.assertEqual(callback.args, (['uploads/a.jpg'],))
+
+    def test_remove_files(self):
+        """Test that stored files are removed and missing ones skipped"""
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, True)
+        storage = FileSystemStorage(location=location)
+        name = storage.save('image.jpg', ContentFile(b'data'))
+
+        deletion.remove_files([name, 'missing.jpg'], storage=storage)
+
+        self.assertFalse(storage.exists(name))
+
+    def test_delete_users_command(self):
+        """Test deleting users by email and id from the command line"""
+        sample_recipe(self.user)
+
+        call_command(
+            'delete_users', self.user.email, '--id', str(self.other_user.pk),
+            stdout=StringIO()
+        )
+
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertFalse(Recipe.objects.exists())
+
+
+class BulkDeletionAdminTests(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@montero.es',
+            password='password1234'
+        )
+        self.client.force_login(self.admin_user)
+        self.user = sample_user()
+        sample_recipe(self.user)
+
+    def test_delete_selected_users(self):
+        """Test that the admin delete action uses the bulk service"""
+        url = reverse('admin:core_user_changelist')
+        payload = {
+            'action': 'delete_selected',
+            '_selected_action': [self.user.pk],
+            'post': 'yes',
+        }
+        with patch(
+            'core.deletion.delete_users', wraps=deletion.delete_users
+        ) as mock_delete:
+            res = self.client.post(url, payload)
+
+        self.assertEqual(res.status_code, 302)
+        self.assertEqual(mock_delete.call_count, 1)
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists()
+        )
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_delete_confirmation_summary(self):
+        """Test that the confirmation page lists the selected user"""
+        url = reverse('admin:core_user_delete', args=[self.user.pk])
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, self.user.email)
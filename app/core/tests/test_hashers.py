@@ -0,0 +1,29 @@
+from django.contrib.auth.hashers import get_hasher
+from django.test import TestCase, override_settings
+
+
+class HasherTests(TestCase):
+
+    @override_settings(
+        ARGON2_TIME_COST=3,
+        ARGON2_MEMORY_COST=1024,
+        ARGON2_PARALLELISM=2
+    )
+    def test_argon2_parameters_from_settings(self):
+        """Test that the Argon2 cost parameters are read from settings"""
+        hasher = get_hasher('argon2')
+        summary = hasher.safe_summary(hasher.encode('secret', hasher.salt()))
+
+        self.assertEqual(hasher.time_cost, 3)
+        self.assertEqual(hasher.memory_cost, 1024)
+        self.assertEqual(hasher.parallelism, 2)
+        self.assertEqual(summary['memory cost'], 1024)
+
+    def test_outdated_argon2_hash_must_update(self):
+        """Test that hashes made with other parameters get upgraded"""
+        hasher = get_hasher('argon2')
+        with override_settings(ARGON2_TIME_COST=hasher.time_cost + 1):
+            stronger = get_hasher('argon2')
+            encoded = stronger.encode('secret', stronger.salt())
+
+        self.assertTrue(hasher.must_update(encoded))
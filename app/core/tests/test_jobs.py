@@ -0,0 +1,226 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import deletion, jobs
+from core.models import Job, Recipe, SimilarRecipe
+from core.tests import factories
+
+
+JOBS_URL = reverse('core:job-list')
+
+calls = []
+
+
+@jobs.task('tests.record')
+def record(value):
+    calls.append(value)
+    return {'value': value}
+
+
+@jobs.task('tests.fail', max_attempts=2)
+def fail():
+    raise RuntimeError('broken')
+
+
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_run_job(self):
+        """Test that a queued job runs once with its arguments"""
+        job, created = jobs.enqueue('tests.record', value=3)
+
+        self.assertTrue(created)
+        self.assertEqual(jobs.Worker(burst=True).work('test'), 1)
+        job.refresh_from_db()
+        self.assertEqual(calls, [3])
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result, '{"value": 3}')
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.finished)
+
+    def test_due_jobs_only(self):
+        """Test that jobs run in order once they are due"""
+        jobs.enqueue('tests.record', value=1,
+                     run_at=timezone.now() + timedelta(hours=1))
+        jobs.enqueue('tests.record', value=2)
+        jobs.enqueue('tests.record', value=3)
+
+        jobs.Worker(burst=True).work('test')
+
+        self.assertEqual(calls, [2, 3])
+
+    def test_idempotency_key(self):
+        """Test that a key queues a single job"""
+        first, created = jobs.enqueue('tests.record', value=1,
+                                      idempotency_key='once')
+        second, created_again = jobs.enqueue('tests.record', value=2,
+                                             idempotency_key='once')
+
+        self.assertEqual(first, second)
+        self.assertFalse(created_again)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_unknown_task(self):
+        """Test that only registered tasks can be queued"""
+        with self.assertRaises(LookupError):
+            jobs.enqueue('tests.missing')
+
+    @override_settings(JOB_RETRY_BACKOFF=10, JOB_RETRY_BACKOFF_MAX=60)
+    def test_retry_with_backoff(self):
+        """Test that failing jobs are retried later, then fail"""
+        job, _ = jobs.enqueue('tests.fail')
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.Worker(burst=True).work('test')
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('RuntimeError: broken', job.error)
+        delay = job.run_at - timezone.now()
+        self.assertGreater(delay, timedelta(seconds=4))
+        self.assertLessEqual(delay, timedelta(seconds=10))
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.Worker(burst=True).work('test')
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_backoff_is_capped(self):
+        """Test that retry delays double up to the maximum"""
+        with patch('core.jobs.random.uniform', return_value=1):
+            delays = [jobs.backoff(attempts).total_seconds()
+                      for attempts in (1, 2, 3, 20)]
+
+        self.assertEqual(delays, [10, 20, 40, 3600])
+
+    @override_settings(JOB_LOCK_TIMEOUT=60)
+    def test_requeue_stale(self):
+        """Test that jobs of dead workers are queued again"""
+        job, _ = jobs.enqueue('tests.record', value=1)
+        jobs.claim('dead')
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - timedelta(minutes=2)
+        )
+
+        self.assertEqual(jobs.requeue_stale(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.locked_by, '')
+
+    def test_stopped_worker_exits(self):
+        """Test that a stopped worker claims no more jobs"""
+        jobs.enqueue('tests.record', value=1)
+        worker = jobs.Worker()
+        worker.stop()
+
+        self.assertEqual(worker.work('test'), 0)
+
+    def test_run_jobs_command(self):
+        """Test running the queued jobs with the command"""
+        jobs.enqueue('tests.record', value=1)
+
+        call_command('run_jobs', '--burst', stdout=StringIO())
+
+        self.assertEqual(calls, [1])
+
+
+class JobApiTests(TestCase):
+
+    def setUp(self):
+        self.user = factories.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_queue_user_facing_task(self):
+        """Test that users can queue tasks for themselves"""
+        recipes = factories.make_recipes(self.user, 2)
+        tags = factories.make_tags(self.user, ['Vegan'])
+        for recipe in recipes:
+            recipe.tags.set(tags)
+        SimilarRecipe.objects.all().delete()
+
+        res = self.client.post(
+            JOBS_URL, {'name': 'core.rebuild_similar_recipes'},
+            HTTP_IDEMPOTENCY_KEY='abc'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['status'], Job.QUEUED)
+        jobs.Worker(burst=True).work('test')
+        url = reverse('core:job-detail', args=[res.data['id']])
+        res = self.client.get(url)
+        self.assertEqual(res.data['status'], Job.SUCCEEDED)
+        self.assertEqual(res.data['result'], 2)
+        self.assertEqual(
+            SimilarRecipe.objects.filter(recipe__in=recipes).count(), 2
+        )
+
+        res = self.client.post(
+            JOBS_URL, {'name': 'core.rebuild_similar_recipes'},
+            HTTP_IDEMPOTENCY_KEY='abc'
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            Job.objects.filter(name='core.rebuild_similar_recipes').count(), 1
+        )
+
+    def test_long_idempotency_key_rejected(self):
+        """Test that an Idempotency-Key too long to store is a 400"""
+        res = self.client.post(
+            JOBS_URL, {'name': 'core.rebuild_similar_recipes'},
+            HTTP_IDEMPOTENCY_KEY='k' * 201
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('idempotency_key', res.data)
+        self.assertFalse(Job.objects.exists())
+
+    def test_internal_tasks_rejected(self):
+        """Test that only user facing tasks can be queued"""
+        res = self.client.post(JOBS_URL, {'name': 'core.delete_users'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Job.objects.exists())
+
+    def test_jobs_limited_to_user(self):
+        """Test that users only see their own jobs"""
+        other, _ = jobs.enqueue('tests.record', value=1,
+                                user=factories.make_user())
+        mine, _ = jobs.enqueue('tests.record', value=2, user=self.user)
+
+        res = self.client.get(JOBS_URL)
+
+        self.assertEqual([job['id'] for job in res.data], [mine.id])
+        res = self.client.get(reverse('core:job-detail', args=[other.id]))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class FileRemovalJobTests(TestCase):
+
+    def test_removal_is_queued(self):
+        """Test that deleted recipes' images are removed by a job"""
+        user = factories.make_user()
+        recipe = factories.make_recipe(user)
+        Recipe.objects.filter(pk=recipe.pk).update(image='uploads/a.jpg')
+
+        with patch('core.deletion.transaction.on_commit',
+                   side_effect=lambda func, using=None: func()), \
+                patch('core.deletion.remove_files') as remove_files:
+            deletion.delete_recipes(Recipe.objects.all())
+            jobs.Worker(burst=True).work('test')
+
+        remove_files.assert_called_once_with(['uploads/a.jpg'])
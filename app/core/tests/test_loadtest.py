@@ -0,0 +1,39 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import LiveServerTestCase
+from django.urls import reverse
+
+from core.models import AuthToken
+
+
+class LoadTestCommandTests(LiveServerTestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@montero.es', 'test1234'
+        )
+        self.url = self.live_server_url + reverse('recipe:tag-list')
+
+    def test_authenticated_load_test(self):
+        """Test that a load test runs with a temporary token"""
+        out = StringIO()
+        call_command(
+            'loadtest', self.url, '--email', self.user.email,
+            '--requests', '6', '--concurrency', '2',
+            '--max-error-rate', '0', stdout=out
+        )
+
+        self.assertIn('requests: 6', out.getvalue())
+        self.assertIn('statuses: {200: 6}', out.getvalue())
+        self.assertFalse(AuthToken.objects.exists())
+
+    def test_error_budget_exceeded(self):
+        """Test that the run fails when too many requests fail"""
+        with self.assertRaises(CommandError):
+            call_command(
+                'loadtest', self.url, '--requests', '2',
+                '--max-error-rate', '0', stdout=StringIO()
+            )
@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import profiling
+
+
+TAGS_URL = reverse('recipe:tag-list')
+TOKEN_URL = reverse('user:token')
+
+
+class ProfilingTests(TestCase):
+
+    def setUp(self):
+        self.profiles_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profiles_dir)
+        settings_override = override_settings(
+            PROFILING_DIR=self.profiles_dir
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_untriggered_request_not_profiled(self):
+        """Test that requests are not profiled unless asked to"""
+        res = self.client.get(TAGS_URL, {'_profile': 1})
+
+        self.assertNotIn('X-Profile-Id', res)
+        self.assertEqual(os.listdir(self.profiles_dir), [])
+
+    def test_bad_token_ignored(self):
+        """Test that a header with a forged token profiles nothing"""
+        res = self.client.get(TAGS_URL, HTTP_X_PROFILE='profile:forged')
+
+        self.assertNotIn('X-Profile-Id', res)
+
+    def test_signed_header_profiles_request(self):
+        """Test that a valid token stores the profile and query plans"""
+        res = self.client.get(
+            TAGS_URL, HTTP_X_PROFILE=profiling.make_token()
+        )
+
+        name = res['X-Profile-Id']
+        self.assertEqual(
+            sorted(os.listdir(self.profiles_dir)),
+            [f'{name}.json', f'{name}.prof', f'{name}.txt']
+        )
+        with open(os.path.join(self.profiles_dir, f'{name}.txt')) as f:
+            report = f.read()
+        self.assertIn('core_tag', report)
+        # the plan, SEARCH on sqlite and Index or Seq Scan on Postgres
+        self.assertRegex(report, r'SEARCH|Scan')
+        profile, = profiling.list_profiles()
+        self.assertEqual(profile['status'], 200)
+
+    def test_user_data_redacted(self):
+        """Test that query parameters and literals aren't stored"""
+        res = self.client.post(
+            TOKEN_URL,
+            {'email': self.user.email, 'password': 'testpass'},
+            HTTP_X_PROFILE=profiling.make_token()
+        )
+
+        with open(os.path.join(
+                self.profiles_dir, f'{res["X-Profile-Id"]}.txt')) as f:
+            report = f.read()
+        self.assertIn('core_user', report)
+        self.assertIn("['str']", report)
+        self.assertNotIn(self.user.email, report)
+        self.assertNotIn(self.user.password, report)
+        self.assertEqual(
+            profiling.redact("email = 'a@b.es' AND name = 'O''Neil'"),
+            "email = '?' AND name = '?'"
+        )
+
+    @override_settings(PROFILING_MAX_PROFILES=2, PROFILING_MAX_AGE=3600)
+    def test_old_profiles_pruned(self):
+        """Test that only recent profiles are kept, up to the maximum"""
+        names = [f'20260101T00000{i}000000-get-tags' for i in range(4)]
+        for name in names:
+            for extension in ('json', 'prof', 'txt'):
+                open(os.path.join(
+                    self.profiles_dir, f'{name}.{extension}'), 'w').close()
+        old = time.time() - 7200
+        os.utime(os.path.join(self.profiles_dir, f'{names[3]}.prof'),
+                 (old, old))
+
+        self.assertEqual(profiling.prune(), 3)
+        self.assertEqual(
+            sorted(os.listdir(self.profiles_dir)),
+            [f'{names[2]}.json', f'{names[2]}.prof', f'{names[2]}.txt']
+        )
+
+    def test_staff_flag_and_admin_index(self):
+        """Test that staff profile with the flag and see the results"""
+        admin = get_user_model().objects.create_superuser(
+            'admin@londonappdev.com', 'testpass'
+        )
+        self.client.force_login(admin)
+
+        res = self.client.get(reverse('admin:index'), {'_profile': 1})
+        name = res['X-Profile-Id']
+        index = self.client.get(reverse('profile-index'))
+        report = self.client.get(
+            reverse('profile-artifact', args=[name, 'txt'])
+        )
+
+        self.assertContains(index, name)
+        self.assertEqual(report.status_code, 200)
+        self.assertEqual(
+            self.client.get(
+                reverse('profile-artifact', args=[name, 'json'])
+            ).status_code,
+            404
+        )
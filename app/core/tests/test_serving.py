@@ -0,0 +1,138 @@
+import asyncio
+import os
+import runpy
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.test import SimpleTestCase
+
+from app import serving
+from app.asgi import ThreadPoolWsgiToAsgi
+
+
+def run_asgi(application, scope, messages):
+    """Run an ASGI application feeding it messages, return what it sent"""
+    incoming = list(messages)
+    sent = []
+
+    async def receive():
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(application(scope, receive, send))
+    finally:
+        loop.close()
+    return sent
+
+
+class AsgiApplicationTests(SimpleTestCase):
+
+    def setUp(self):
+        self.application = ThreadPoolWsgiToAsgi(
+            get_wsgi_application(),
+            max_threads=2
+        )
+
+    def test_http_request(self):
+        """Test that requests are served through the thread pool"""
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': '/api/recipe/tags/',
+            'query_string': b'',
+            'http_version': '1.1',
+            'server': ('testserver', 80),
+            'headers': [(b'host', b'testserver')],
+        }
+
+        sent = run_asgi(
+            self.application,
+            scope,
+            [{'type': 'http.request', 'body': b''}]
+        )
+
+        self.assertEqual(sent[0]['type'], 'http.response.start')
+        self.assertEqual(sent[0]['status'], 401)
+        self.assertEqual(self.application.executor._max_workers, 2)
+
+    def test_lifespan(self):
+        """Test that startup and shutdown are acknowledged"""
+        sent = run_asgi(
+            self.application,
+            {'type': 'lifespan'},
+            [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        )
+
+        self.assertEqual(
+            [message['type'] for message in sent],
+            ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+        )
+
+
+class WorkerSizingTests(SimpleTestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def write(self, name, content):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def test_cgroup_v2_limits(self):
+        """Test reading CPU and memory limits from cgroup v2 files"""
+        self.write('cpu.max', '150000 100000\n')
+        self.write('memory.max', str(512 * 1024 * 1024))
+
+        self.assertEqual(serving.cgroup_cpu_quota(self.root), 1.5)
+        self.assertEqual(serving.cgroup_memory_limit_mb(self.root), 512)
+
+    def test_cgroup_v1_limits(self):
+        """Test reading CPU and memory limits from cgroup v1 files"""
+        self.write('cpu/cpu.cfs_quota_us', '200000')
+        self.write('cpu/cpu.cfs_period_us', '100000')
+        self.write('memory/memory.limit_in_bytes', str(2 ** 63 - 4096))
+
+        self.assertEqual(serving.cgroup_cpu_quota(self.root), 2)
+        self.assertIsNone(serving.cgroup_memory_limit_mb(self.root))
+
+    def test_unlimited_cgroup(self):
+        """Test that missing or unlimited cgroup files mean no limit"""
+        self.write('cpu.max', 'max 100000')
+
+        self.assertIsNone(serving.cgroup_cpu_quota(self.root))
+        self.assertIsNone(serving.cgroup_memory_limit_mb(self.root))
+
+    def test_worker_count(self):
+        """Test that workers follow CPUs unless memory is short"""
+        self.assertEqual(serving.worker_count(2, None), 5)
+        self.assertEqual(serving.worker_count(2, 4096), 5)
+        self.assertEqual(serving.worker_count(4, 512, 100), 4)
+        self.assertEqual(serving.worker_count(4, 64, 100), 1)
+
+    def test_thread_count(self):
+        """Test that threads fill the CPUs within the connection limit"""
+        self.assertEqual(serving.thread_count(2, 5), 2)
+        self.assertEqual(serving.thread_count(4, 1), serving.MAX_THREADS)
+        self.assertEqual(serving.thread_count(8, 17, max_connections=20), 1)
+
+    def test_gunicorn_config(self):
+        """Test that the gunicorn config module loads with overrides"""
+        config_path = os.path.join(settings.BASE_DIR, 'gunicorn.conf.py')
+        env = {'GUNICORN_WORKERS': '3', 'GUNICORN_THREADS': '2'}
+        with patch.dict(os.environ, env):
+            config = runpy.run_path(config_path)
+
+        self.assertEqual(config['workers'], 3)
+        self.assertEqual(config['threads'], 2)
+        self.assertTrue(config['preload_app'])
+        self.assertEqual(config['max_requests_jitter'], 100)
@@ -0,0 +1,129 @@
+import json
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core import copying, jobs, similarity
+from core.models import Job, Recipe, SimilarRecipe
+from core.tests import factories
+
+
+def run_on_commit(func):
+    func()
+
+
+def run_jobs():
+    """Run the queued jobs like a worker would"""
+    job = jobs.claim('test')
+    while job is not None:
+        jobs.run(job)
+        job = jobs.claim('test')
+
+
+class SimilarityTests(TestCase):
+
+    def setUp(self):
+        self.user = factories.make_user()
+        self.tags = factories.make_tags(self.user, ['Vegan', 'Quick', 'Hot'])
+        self.rice, self.beans = factories.make_ingredients(
+            self.user, ['Rice', 'Beans']
+        )
+        self.recipe, self.close, self.far, self.unrelated = \
+            factories.make_recipes(self.user, 4)
+        self.recipe.tags.set(self.tags[:2])
+        self.recipe.ingredients.set([self.rice])
+        # shares all three items with recipe and adds one
+        self.close.tags.set(self.tags[:2])
+        self.close.ingredients.set([self.rice, self.beans])
+        # shares one of its two items
+        self.far.tags.set(self.tags[1:])
+        self.unrelated.ingredients.set([self.beans])
+
+    def neighbours(self, recipe):
+        return list(
+            recipe.neighbours.order_by('-score')
+            .values_list('similar_id', 'score')
+        )
+
+    def test_neighbours_jaccard(self):
+        """Test that neighbours are ranked by their Jaccard index"""
+        items = similarity.item_sets([
+            self.recipe.pk, self.close.pk, self.far.pk, self.unrelated.pk
+        ])
+        sizes = {pk: len(s) for pk, s in items.items()}
+
+        scored = similarity.neighbours(
+            self.recipe.pk, items[self.recipe.pk],
+            similarity.inverted_index(items), sizes
+        )
+
+        self.assertEqual(
+            scored, [(3 / 4, self.close.pk), (1 / 4, self.far.pk)]
+        )
+
+    def test_rebuild_command(self):
+        """Test that the command stores the neighbours of every recipe"""
+        call_command('build_similar_recipes', stdout=StringIO())
+
+        self.assertEqual(
+            self.neighbours(self.recipe),
+            [(self.close.pk, 3 / 4), (self.far.pk, 1 / 4)]
+        )
+        self.assertEqual(
+            self.neighbours(self.unrelated), [(self.close.pk, 1 / 4)]
+        )
+
+    def test_link_changes_refresh_neighbours(self):
+        """Test that changed links update both sides incrementally"""
+        similarity.rebuild(self.user)
+
+        self.unrelated.tags.set(self.tags[:2])
+        self.unrelated.ingredients.add(self.rice)
+        self.assertTrue(
+            Job.objects.filter(name='core.refresh_similar_recipes').exists()
+        )
+        run_jobs()
+
+        # unrelated now has the same items as close
+        self.assertEqual(
+            self.neighbours(self.unrelated)[0], (self.close.pk, 1.0)
+        )
+        self.assertIn((self.unrelated.pk, 1.0), self.neighbours(self.close))
+
+        self.unrelated.tags.clear()
+        self.unrelated.ingredients.clear()
+        run_jobs()
+
+        self.assertEqual(self.neighbours(self.unrelated), [])
+        self.assertFalse(
+            SimilarRecipe.objects.filter(similar=self.unrelated).exists()
+        )
+
+    @patch('core.similarity.TOP_K', 1)
+    def test_full_lists_keep_best(self):
+        """Test that a full list only takes a better recipe in"""
+        similarity.rebuild(self.user)
+        self.assertEqual(self.neighbours(self.far), [(self.recipe.pk, 1 / 4)])
+
+        self.unrelated.tags.set(self.tags[1:])
+        run_jobs()
+
+        self.assertEqual(
+            self.neighbours(self.far), [(self.unrelated.pk, 2 / 3)]
+        )
+
+    @patch('django.db.transaction.on_commit', run_on_commit)
+    def test_copies_queue_a_rebuild(self):
+        """Test that copying recipes queues a rebuild of the user's lists"""
+        copied = copying.copy_recipes(
+            Recipe.objects.filter(pk=self.recipe.pk)
+        )
+
+        job = Job.objects.get(name='core.rebuild_similar_recipes')
+        self.assertEqual(json.loads(job.arguments), {'user_id': self.user.pk})
+        run_jobs()
+        self.assertEqual(
+            self.neighbours(self.recipe)[0], (copied[self.recipe.pk][0], 1.0)
+        )
@@ -0,0 +1,84 @@
+import os
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, override_settings
+
+from core import startup
+
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     json.scanner
+import time:       300 |        420 |   json.decoder
+import time:       200 |        620 | json
+import time:      1000 |       1000 | rest_framework.fields
+"""
+
+
+class StartupTests(SimpleTestCase):
+
+    def test_parse_importtime(self):
+        """Test that import times are read with their nesting"""
+        imports = startup.parse_importtime(IMPORTTIME)
+
+        self.assertEqual(
+            [(entry.module, entry.depth) for entry in imports],
+            [('json.scanner', 2), ('json.decoder', 1), ('json', 0),
+             ('rest_framework.fields', 0)]
+        )
+        self.assertEqual(imports[2].self, 0.0002)
+        self.assertEqual(imports[2].cumulative, 0.00062)
+        packages = startup.by_package(imports)
+        self.assertEqual(set(packages), {'json', 'rest_framework'})
+        self.assertAlmostEqual(packages['json'], 0.00062)
+
+    def test_cold_start_imports(self):
+        """Test that a new process starts the app without heavy imports"""
+        result = startup.measure()
+
+        self.assertEqual(set(result.phases), set(startup.PHASES))
+        self.assertIn('core', result.ready)
+        # only uploads need Pillow, and bulk provisioning a process pool
+        self.assertNotIn('PIL', result.modules)
+        self.assertNotIn('concurrent.futures', result.modules)
+        self.assertIn('core.admin', result.modules)
+
+    # wall-clock time varies too much on shared runners to always check it
+    @skipUnless(os.environ.get('CHECK_STARTUP_BUDGET'), 'timing not enabled')
+    def test_cold_start_within_budget(self):
+        """Test that a new process starts the app within STARTUP_BUDGET"""
+        result = startup.measure()
+
+        self.assertLessEqual(result.total, settings.STARTUP_BUDGET)
+
+    def test_admin_disabled(self):
+        """Test that the admin is left out with ADMIN_ENABLED=0"""
+        result = startup.measure({'ADMIN_ENABLED': '0'})
+
+        self.assertNotIn('admin', result.ready)
+        self.assertNotIn('core.admin', result.modules)
+
+    @override_settings(STARTUP_BUDGET=0.1)
+    def test_profile_startup_command(self):
+        """Test the report and that --check enforces the budget"""
+        result = startup.Startup(
+            {'settings': 0.01, 'apps': 0.1, 'middleware': 0.01, 'urls': 0.05},
+            {'core': 0.002},
+            startup.parse_importtime(IMPORTTIME),
+            {'json', 'rest_framework.fields'}
+        )
+        out = StringIO()
+        with patch('core.startup.measure', return_value=result):
+            call_command('profile_startup', stdout=out)
+            with self.assertRaises(CommandError):
+                call_command('profile_startup', '--check', stdout=StringIO())
+
+        report = out.getvalue()
+        self.assertIn('Cold start: 170.0 ms (budget 100 ms)', report)
+        self.assertIn('rest_framework.fields', report)
+        self.assertNotIn('json.decoder', report)
@@ -0,0 +1,134 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import throttling
+from core.signals import throttled
+from core.tests import factories
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@override_settings(
+    THROTTLE_RATES={'recipes': (3, 1), 'recipe-upload': (2, 0.5)},
+    THROTTLE_ROWS_PER_TOKEN=2,
+    THROTTLE_BYTES_PER_TOKEN=1024,
+    THROTTLE_STORE='core.throttling.LocalBucketStore',
+)
+class TokenBucketThrottleTests(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch.object(
+            throttling.LocalBucketStore, 'clock', self.clock
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        throttling.get_store().clear()
+        self.addCleanup(throttling.get_store().clear)
+
+        self.user = factories.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_burst_then_refill(self):
+        """Test that a burst is allowed and the bucket refills over time"""
+        for _ in range(3):
+            res = self.client.get(RECIPES_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '1')
+
+        self.clock.now += 1
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_scopes_and_clients_are_separate(self):
+        """Test that each user has a bucket per scope"""
+        for _ in range(3):
+            self.client.get(RECIPES_URL)
+
+        # no rate for the tags scope
+        res = self.client.get(TAGS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(factories.make_user())
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_rows_returned_are_charged(self):
+        """Test that large responses take more tokens"""
+        factories.make_recipes(self.user, 4)
+
+        # one token for the request, two for the four rows
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '1')
+
+    def test_upload_bytes_are_charged(self):
+        """Test that uploads pay for their size in their own scope"""
+        recipe = factories.make_recipe(self.user)
+        url = reverse('recipe:recipe-upload-image', args=[recipe.id])
+        upload = SimpleUploadedFile('image.jpg', b'x' * 2048)
+
+        res = self.client.post(url, {'image': upload}, format='multipart')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(url, {}, format='multipart')
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # the recipe bucket is untouched
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_throttled_signal(self):
+        """Test that refused requests are signalled and counted"""
+        received = []
+
+        def receiver(sender, scope, wait, **kwargs):
+            received.append((scope, wait))
+        throttled.connect(receiver)
+        self.addCleanup(throttled.disconnect, receiver)
+        before = throttling.throttled_counts['recipes']
+
+        for _ in range(4):
+            self.client.get(RECIPES_URL)
+
+        self.assertEqual(received, [('recipes', 1.0)])
+        self.assertEqual(throttling.throttled_counts['recipes'], before + 1)
+
+    @override_settings(
+        THROTTLE_STORE='core.throttling.CacheBucketStore',
+        THROTTLE_CACHE='default',
+    )
+    def test_cache_store(self):
+        """Test that buckets can be shared through a cache"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        with patch.object(throttling.CacheBucketStore, 'clock', self.clock):
+            for _ in range(3):
+                self.client.get(TAGS_URL)
+                self.client.get(RECIPES_URL)
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
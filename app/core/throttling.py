@@ -0,0 +1,190 @@
+"""
+Token bucket rate limiting of the API, weighted by request cost.
+
+Every client (user, or address when anonymous) has a bucket per scope in
+THROTTLE_RATES, holding up to ``burst`` tokens and refilled with ``rate``
+tokens per second. A request needs a token to start and pays its cost
+from the bucket, part of it up front (uploaded bytes) and part once the
+response is known (rows returned), so a bucket can go into debt that later
+requests wait out.
+
+Buckets are kept as GCRA "theoretical arrival times", one number per
+bucket that is read and written without locking. Concurrent requests of a
+client may both pass where only one would, which is harmless, in exchange
+for no lock on the request path. THROTTLE_STORE picks the store: the
+per-process LocalBucketStore or CacheBucketStore, which shares buckets
+between processes through a cache.
+"""
+import hashlib
+import logging
+import math
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+from rest_framework.throttling import BaseThrottle
+
+from core.signals import throttled
+
+
+logger = logging.getLogger(__name__)
+
+# requests refused per scope since the process started
+throttled_counts = Counter()
+
+
+class LocalBucketStore:
+    """Buckets of this process, in a dict"""
+    clock = staticmethod(time.monotonic)
+    # buckets kept before full ones are dropped
+    max_entries = 100000
+
+    def __init__(self):
+        self._buckets = {}
+
+    def get(self, key):
+        return self._buckets.get(key)
+
+    def set(self, key, tat, timeout):
+        if len(self._buckets) >= self.max_entries:
+            self.prune()
+        self._buckets[key] = tat
+
+    def prune(self):
+        """Drop the buckets that are full again"""
+        now = self.clock()
+        for key, tat in list(self._buckets.items()):
+            if tat <= now:
+                self._buckets.pop(key, None)
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class CacheBucketStore:
+    """Buckets shared by all processes using THROTTLE_CACHE"""
+    clock = staticmethod(time.time)
+
+    @property
+    def cache(self):
+        return caches[settings.THROTTLE_CACHE]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, tat, timeout):
+        self.cache.set(key, tat, timeout)
+
+
+_stores = {}
+
+
+def get_store():
+    path = settings.THROTTLE_STORE
+    if path not in _stores:
+        _stores[path] = import_string(path)()
+    return _stores[path]
+
+
+def get_scope(view):
+    """Return the scope of the view's current action"""
+    action = getattr(view, 'action', None)
+    scopes = getattr(view, 'throttle_scopes', {})
+    return scopes.get(action, getattr(view, 'throttle_scope', None))
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle by the token bucket of the view's scope, see the module
+    docstring. Views set throttle_scope, and throttle_scopes to give some
+    actions a bucket of their own
+    """
+
+    def __init__(self):
+        self.store = get_store()
+        self.wait_seconds = None
+
+    def get_key(self, request, scope):
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        digest = hashlib.sha1(ident.encode()).hexdigest()
+        return f'throttle:{scope}:{digest}'
+
+    def allow_request(self, request, view):
+        scope = get_scope(view)
+        if scope not in settings.THROTTLE_RATES:
+            return True
+        burst, rate = settings.THROTTLE_RATES[scope]
+        key = self.get_key(request, scope)
+        now = self.store.clock()
+        tat = max(self.store.get(key) or now, now)
+        # the bucket holds burst - (tat - now) * rate tokens
+        if (tat - now) * rate > burst - 1:
+            self.wait_seconds = tat - now - (burst - 1) / rate
+            throttled_counts[scope] += 1
+            logger.info('Throttled %s in scope %s', key, scope)
+            throttled.send(
+                sender=type(view), request=request, scope=scope,
+                wait=self.wait_seconds
+            )
+            return False
+
+        charge(self.store, key, rate, 1 + request_cost(request))
+        # charged again by ThrottledViewMixin once the response is known
+        view.throttle_buckets = getattr(view, 'throttle_buckets', []) + [
+            (self.store, key, rate)
+        ]
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+def charge(store, key, rate, cost):
+    """Take cost tokens from a bucket, which may go into debt"""
+    now = store.clock()
+    tat = max(store.get(key) or now, now) + cost / rate
+    # past tat the bucket is full, as if it had never been used
+    store.set(key, tat, math.ceil(tat - now))
+
+
+def request_cost(request):
+    """Tokens a request costs up front on top of the first"""
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        length = 0
+    return length // settings.THROTTLE_BYTES_PER_TOKEN
+
+
+def response_cost(response):
+    """Tokens a response costs, from the rows it returns"""
+    data = getattr(response, 'data', None)
+    if isinstance(data, dict):
+        data = data.get('results')
+    if not isinstance(data, list):
+        return 0
+    return len(data) // settings.THROTTLE_ROWS_PER_TOKEN
+
+
+class ThrottledViewMixin:
+    """
+    Throttle a view with TokenBucketThrottle and charge its buckets for
+    the rows of its responses
+    """
+    throttle_classes = (TokenBucketThrottle,)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        cost = response_cost(response)
+        if cost:
+            for store, key, rate in getattr(self, 'throttle_buckets', ()):
+                charge(store, key, rate, cost)
+        return response
@@ -0,0 +1,58 @@
+from django.utils.translation import ugettext_lazy as _
+
+from rest_framework import mixins, status, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from core import jobs
+from core.authentication import ExpiringTokenAuthentication
+from core.models import Job
+from core.serializers import JobSerializer
+from core.throttling import ThrottledViewMixin
+
+
+class JobViewSet(ThrottledViewMixin,
+                 viewsets.GenericViewSet,
+                 mixins.ListModelMixin,
+                 mixins.RetrieveModelMixin,
+                 mixins.CreateModelMixin):
+    """
+    Queue background tasks for the current user and follow their status.
+    Requests with an Idempotency-Key header queue at most one job per key
+    """
+    serializer_class = JobSerializer
+    queryset = Job.objects.all()
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = "jobs"
+    # most recent jobs listed
+    list_limit = 100
+    # longest Idempotency-Key accepted, it's stored after the user's id
+    max_idempotency_key_length = 200
+
+    def get_queryset(self):
+        queryset = self.queryset.filter(user=self.request.user).order_by("-id")
+        if self.action == "list":
+            return queryset[:self.list_limit]
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        key = request.META.get("HTTP_IDEMPOTENCY_KEY")
+        if key and len(key) > self.max_idempotency_key_length:
+            raise ValidationError({"idempotency_key": [
+                _("Idempotency-Key can be at most %d characters long")
+                % self.max_idempotency_key_length
+            ]})
+        job, created = jobs.enqueue(
+            serializer.validated_data["name"],
+            user=request.user,
+            idempotency_key=f"{request.user.pk}:{key}" if key else None,
+            user_id=request.user.pk
+        )
+        return Response(
+            self.get_serializer(job).data,
+            status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK
+        )
@@ -0,0 +1,48 @@
+"""
+gunicorn settings for production, picked up automatically when running
+``gunicorn app.wsgi`` from this directory. Every sizing value can be
+overridden through the environment.
+"""
+import os
+
+from app import serving
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+_cpus = serving.cpu_count()
+workers = int(os.environ.get('GUNICORN_WORKERS', 0)) or serving.worker_count(
+    _cpus, serving.memory_limit_mb()
+)
+# threads let a worker keep serving while another request waits on the db
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 0)) or serving.thread_count(
+    _cpus, workers, int(os.environ.get('DB_MAX_CONNECTIONS', 80))
+)
+
+# load Django once in the master, workers then share its memory pages
+preload_app = True
+
+# recycle workers now and then to cap memory growth, jitter avoids all of
+# them restarting at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+# requests running longer than this get their worker killed and restarted;
+# DB_STATEMENT_TIMEOUT_MS cancels slow queries before that happens. The
+# settings are only loaded after this file, so the default applies to the
+# server alone
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+os.environ.setdefault('DB_STATEMENT_TIMEOUT_MS', str((timeout - 5) * 1000))
+graceful_timeout = timeout
+keepalive = 5
+
+# heartbeat files on disk can stall workers on slow volumes
+worker_tmp_dir = '/dev/shm'
+accesslog = '-'
+
+
+def post_fork(server, worker):
+    """Don't share database connections opened by the master"""
+    from django.db import connections
+    connections.close_all()
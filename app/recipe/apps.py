@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class RecipeConfig(AppConfig):
     name = 'recipe'
+
+    def ready(self):
+        # connect the receivers invalidating cached details and facets
+        from recipe import cache, facets  # noqa: F401
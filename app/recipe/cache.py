@@ -0,0 +1,185 @@
+"""
+Cache of serialized recipe details, checked against the recipe's version
+and its owner's recipe_attrs_version.
+
+Entries live in a bounded in-process LRU and, when RECIPE_CACHE_BACKEND
+names one of CACHES, in that shared cache as well. A detail embeds its tags
+and ingredients with their recipe counts, so renaming or deleting one of
+them, or changing any link, bumps the owner's recipe_attrs_version in the
+same transaction. Both versions are read together with a single query
+before a cached detail is served, so no process serves a detail older than
+the committed data. Dropping entries of changed recipes, which happens once
+the transaction commits, only frees memory early.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from core.models import Recipe, Tag, Ingredient
+from core.signals import post_bulk_create, pre_bulk_delete
+
+
+# models embedded in recipe details, and the through models of their links
+DEPENDENCIES = {
+    Tag: Recipe.tags.through,
+    Ingredient: Recipe.ingredients.through,
+}
+
+
+class LRUCache:
+    """Thread-safe mapping holding at most max_entries unexpired values"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout, max_entries):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+local = LRUCache()
+
+
+def _shared():
+    alias = settings.RECIPE_CACHE_BACKEND
+    return caches[alias] if alias else None
+
+
+def _key(recipe_id):
+    return f"recipe-detail:{recipe_id}"
+
+
+def lookup(recipe_id, version):
+    """
+    Return the cached detail of the recipe at version, a (recipe version,
+    owner's recipe_attrs_version) pair, None if missing
+    """
+    entry = local.get(recipe_id)
+    shared = _shared()
+    if entry is None and shared is not None:
+        entry = shared.get(_key(recipe_id))
+        if entry is not None:
+            local.set(recipe_id, entry, settings.RECIPE_CACHE_LOCAL_TIMEOUT,
+                      settings.RECIPE_CACHE_SIZE)
+    if entry is None or entry[0] != version:
+        return None
+    return entry[1]
+
+
+def store(recipe_id, version, data):
+    """Cache the serialized detail of the recipe at version"""
+    entry = (version, data)
+    local.set(recipe_id, entry, settings.RECIPE_CACHE_LOCAL_TIMEOUT,
+              settings.RECIPE_CACHE_SIZE)
+    shared = _shared()
+    if shared is not None:
+        shared.set(_key(recipe_id), entry, settings.RECIPE_CACHE_TIMEOUT)
+
+
+def _drop(recipe_ids):
+    local.delete_many(recipe_ids)
+    shared = _shared()
+    if shared is not None:
+        shared.delete_many([_key(pk) for pk in recipe_ids])
+
+
+def invalidate(recipe_ids):
+    """
+    Drop the cached details of the given recipes once the transaction
+    commits, so concurrent requests can't cache them again from the data
+    it is replacing
+    """
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: _drop(recipe_ids))
+
+
+def dependencies_changed(user_ids):
+    """Outdate the cached details of every recipe of the given users"""
+    get_user_model().objects.filter(pk__in=user_ids).update(
+        recipe_attrs_version=F("recipe_attrs_version") + 1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate([instance.pk])
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    # the recipe counts of its tags and ingredients drop
+    dependencies_changed([instance.user_id])
+
+
+@receiver(pre_bulk_delete, sender=Recipe)
+def recipes_bulk_deleted(sender, queryset, origin, **kwargs):
+    # tags and ingredients of deleted users go away with their recipes
+    if issubclass(origin, get_user_model()):
+        return
+    dependencies_changed(queryset.values("user_id"))
+
+
+@receiver(post_bulk_create, sender=Recipe)
+def recipes_bulk_created(sender, queryset, **kwargs):
+    # copies raise the recipe counts of their tags and ingredients
+    dependencies_changed(queryset.values("user_id"))
+
+
+def dependency_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        dependencies_changed([instance.user_id])
+
+
+def links_changed(sender, instance, action, **kwargs):
+    """
+    A link added or removed changes the recipe, and the recipe count shown
+    by every recipe embedding the same tag or ingredient
+    """
+    if action in ("post_add", "post_remove", "post_clear"):
+        dependencies_changed([instance.user_id])
+
+
+for model, through in DEPENDENCIES.items():
+    post_save.connect(dependency_changed, sender=model)
+    pre_delete.connect(dependency_changed, sender=model)
+    m2m_changed.connect(links_changed, sender=through)
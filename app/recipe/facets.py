@@ -0,0 +1,161 @@
+"""
+Facets of the recipe list: price and time histograms, and how many of the
+filtered recipes carry each tag and ingredient.
+
+Facets are cached in the default cache per user and filter. Every key
+includes a per-user generation, which any write to the user's recipes,
+their links, tags or ingredients replaces once its transaction commits, so
+entries of older generations are never read again and simply expire. The
+default cache must be shared by all processes for that to hold across them.
+"""
+import hashlib
+import json
+import uuid
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save
+)
+
+from core.models import Recipe, Tag, Ingredient
+from core.signals import post_bulk_create, pre_bulk_delete
+
+
+# seconds facets stay cached
+TIMEOUT = 10 * 60
+
+# facet name, through model of the links counted and its field on it
+LINKS = (
+    ("tags", Recipe.tags.through, "tag"),
+    ("ingredients", Recipe.ingredients.through, "ingredient"),
+)
+
+
+def histograms(queryset, buckets):
+    """
+    Return the number of recipes in each bucket of {field: lower bounds},
+    counted with a single aggregate query. The last bucket of a field has
+    no upper bound
+    """
+    ranges = {}
+    counts = {}
+    for field, bounds in buckets.items():
+        for number, low in enumerate(bounds):
+            high = bounds[number + 1] if number + 1 < len(bounds) else None
+            condition = Q(**{f"{field}__gte": low})
+            if high is not None:
+                condition &= Q(**{f"{field}__lt": high})
+            key = f"{field}_{number}"
+            ranges.setdefault(field, []).append((key, low, high))
+            counts[key] = Count("id", filter=condition)
+    totals = queryset.order_by().aggregate(**counts)
+    return {
+        field: [
+            {"min": low, "max": high, "count": totals[key]}
+            for key, low, high in field_ranges
+        ]
+        for field, field_ranges in ranges.items()
+    }
+
+
+def link_counts(queryset):
+    """
+    Return {facet: [{"id", "name", "count"}]} for the tags and ingredients
+    of the recipes in queryset, most used first, with one grouped query
+    over each through table
+    """
+    facets = {}
+    for facet, through, field in LINKS:
+        rows = through.objects.filter(
+            recipe__in=queryset.order_by().values("id")
+        ).values(
+            f"{field}_id", f"{field}__name"
+        ).annotate(count=Count("*")).order_by("-count", f"{field}__name")
+        facets[facet] = [
+            {"id": row[f"{field}_id"], "name": row[f"{field}__name"],
+             "count": row["count"]}
+            for row in rows
+        ]
+    return facets
+
+
+def _generation_key(user_id):
+    return f"recipe-facets-generation:{user_id}"
+
+
+def _key(user_id, filters):
+    generation_key = _generation_key(user_id)
+    generation = cache.get(generation_key)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        cache.add(generation_key, generation, None)
+        generation = cache.get(generation_key, generation)
+    digest = hashlib.md5(
+        json.dumps(filters, sort_keys=True).encode()
+    ).hexdigest()
+    return f"recipe-facets:{user_id}:{generation}:{digest}"
+
+
+def get(user_id, filters, compute):
+    """
+    Return the cached facets of the user's recipes matching filters, a
+    JSON serializable description of them, or cache compute()
+    """
+    key = _key(user_id, filters)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute()
+        cache.set(key, facets, TIMEOUT)
+    return facets
+
+
+def _new_generations(user_ids):
+    for user_id in user_ids:
+        cache.set(_generation_key(user_id), uuid.uuid4().hex, None)
+
+
+def invalidate(user_ids):
+    """
+    Start a new generation of the users' facets when the transaction
+    commits. Facets computed meanwhile still see the old data, so they must
+    go to the old generation
+    """
+    transaction.on_commit(partial(_new_generations, set(user_ids)))
+
+
+def owner_changed(sender, instance, **kwargs):
+    invalidate([instance.user_id])
+
+
+def recipes_bulk_deleted(sender, queryset, origin, **kwargs):
+    if issubclass(origin, get_user_model()):
+        # deleted users' facets are never read again
+        return
+    invalidate(queryset.values_list("user_id", flat=True).distinct())
+
+
+def recipes_bulk_created(sender, queryset, **kwargs):
+    invalidate(queryset.values_list("user_id", flat=True).distinct())
+
+
+def links_changed(sender, instance, action, **kwargs):
+    # instance is the recipe, or the tag or ingredient on reverse changes,
+    # both belong to the user
+    if action.startswith("post_"):
+        invalidate([instance.user_id])
+
+
+post_save.connect(owner_changed, sender=Recipe)
+post_delete.connect(owner_changed, sender=Recipe)
+pre_bulk_delete.connect(recipes_bulk_deleted, sender=Recipe)
+post_bulk_create.connect(recipes_bulk_created, sender=Recipe)
+for model in (Tag, Ingredient):
+    # facets carry the names
+    post_save.connect(owner_changed, sender=model)
+    post_delete.connect(owner_changed, sender=model)
+for _, through, _ in LINKS:
+    m2m_changed.connect(links_changed, sender=through)
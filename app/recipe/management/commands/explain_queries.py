@@ -0,0 +1,91 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from rest_framework.test import APIRequestFactory
+
+from recipe import views
+
+
+# list queries of the API, as the viewset and the query parameters sent
+QUERIES = [
+    (views.RecipeViewSet, {}),
+    (views.RecipeViewSet, {"fields": "id,title"}),
+    (views.RecipeViewSet, {"ordering": "price", "price_max": 10}),
+    (views.RecipeViewSet, {"ordering": "-time_minutes", "time_min": 30}),
+] + [
+    (viewset, {"ordering": ordering})
+    for viewset in (views.TagViewSet, views.IngredientViewSet)
+    for ordering in views.BaseRecipeAttrViewSet.orderings
+]
+
+# "Seq Scan on core_tag" on PostgreSQL, "SCAN TABLE core_tag" on SQLite
+SEQ_SCAN = re.compile(r'\bSeq Scan on (\w+)|\bSCAN (?:TABLE )?(\w+)')
+
+
+def find_seq_scans(plan):
+    """Return the names of the tables read sequentially by a query plan"""
+    return [
+        postgres_table or sqlite_table
+        for postgres_table, sqlite_table in SEQ_SCAN.findall(plan)
+    ]
+
+
+class Command(BaseCommand):
+    """Django command to check that API list queries use indexes"""
+    help = (
+        'Run EXPLAIN on the list query of each viewset for a user and flag '
+        'sequential scans. Run it against realistically seeded data, the '
+        'PostgreSQL planner prefers scanning small tables'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email',
+            help='User whose data is queried, defaults to the one with '
+                 'the most recipes'
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['email'])
+        factory = APIRequestFactory()
+        flagged = 0
+        for viewset, params in QUERIES:
+            view = viewset(
+                action_map={"get": "list"}, kwargs={}, format_kwarg=None
+            )
+            view.request = view.initialize_request(factory.get("/", params))
+            view.request.user = user
+            plan = view.get_queryset().explain()
+
+            label = viewset.__name__ + "".join(
+                f" {name}={value}" for name, value in params.items()
+            )
+            tables = find_seq_scans(plan)
+            if tables:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(
+                    f'{label}: sequential scan on {", ".join(tables)}'
+                ))
+            else:
+                self.stdout.write(f'{label}: ok')
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+
+        if flagged:
+            raise CommandError(f'{flagged} queries scan tables sequentially')
+        self.stdout.write(self.style.SUCCESS('All queries use indexes'))
+
+    def get_user(self, email):
+        users = get_user_model().objects.all()
+        if email:
+            user = users.filter(email=email).first()
+        else:
+            user = users.annotate(
+                recipes=Count("recipe")
+            ).order_by("-recipes").first()
+        if user is None:
+            raise CommandError('No user to run the queries for')
+        return user
@@ -1,31 +1,72 @@
-from rest_framework import serializers
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed
+from django.utils.translation import ugettext_lazy as _
+
+from rest_framework import exceptions, serializers, status
 
 from core.models import Tag, Ingredient, Recipe
 
 
+class EditConflict(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _("The recipe was changed by another request.")
+    default_code = "conflict"
+
+
 class TagSerializer(serializers.ModelSerializer):
     """Serializer for tag objects"""
 
     class Meta:
         model = Tag
-        fields = ("id", "name")
-        read_only_fields = ("id", )
+        fields = ("id", "name", "recipe_count")
+        read_only_fields = ("id", "recipe_count")
 
 
 class IngredientSerializer(serializers.ModelSerializer):
     """Serializer for ingredient objects"""
     class Meta:
         model = Ingredient
-        fields = ("id", "name")
-        read_only_fields = ("id", )
+        fields = ("id", "name", "recipe_count")
+        read_only_fields = ("id", "recipe_count")
 
 
 
 class RecipeSerializerBase(serializers.ModelSerializer):
+    """
+    Accepts fields= to only output some fields, and expand= to choose which
+    relations are nested rather than given as primary keys
+    """
+    expandable = {
+        "ingredients": IngredientSerializer,
+        "tags": TagSerializer,
+    }
+
     class Meta:
         model = Recipe
-        fields = ("id", "title", "time_minutes", "price", "link", "ingredients", "tags")
-        read_only_fields = ("id", )
+        fields = ("id", "title", "time_minutes", "price", "link", "ingredients", "tags",
+                  "version")
+        read_only_fields = ("id", "version")
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+        if expand is not None:
+            for name, nested_class in self.expandable.items():
+                if name not in self.fields:
+                    continue
+                nested = isinstance(
+                    self.fields[name], serializers.ListSerializer
+                )
+                if name in expand and not nested:
+                    self.fields[name] = nested_class(many=True, read_only=True)
+                elif name not in expand and nested:
+                    self.fields[name] = serializers.PrimaryKeyRelatedField(
+                        many=True, read_only=True
+                    )
 
 
 class RecipeSerializer(RecipeSerializerBase):
@@ -39,6 +80,83 @@ class RecipeSerializer(RecipeSerializerBase):
         many=True,
         queryset=Tag.objects.all()
     )
+    # the version the client edited, the update is refused if it's stale
+    version = serializers.IntegerField(required=False, min_value=1)
+
+    def create(self, validated_data):
+        validated_data.pop("version", None)
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        """
+        Save only the changed columns and links, in one transaction.
+        Raise EditConflict if the recipe was edited since the version
+        given by the client, or since it was loaded otherwise
+        """
+        expected = validated_data.pop("version", instance.version)
+        links = {
+            name: validated_data.pop(name)
+            for name in ("tags", "ingredients") if name in validated_data
+        }
+        with transaction.atomic():
+            current = Recipe.objects.select_for_update().filter(
+                pk=instance.pk
+            ).values_list("version", flat=True).first()
+            if current != expected:
+                raise EditConflict()
+
+            changed = [
+                name for name, value in validated_data.items()
+                if getattr(instance, name) != value
+            ]
+            for name in changed:
+                setattr(instance, name, validated_data[name])
+            linked = [
+                name for name, objs in links.items()
+                if self._update_links(instance, name, objs)
+            ]
+            if changed or linked:
+                instance.version = current + 1
+                instance.save(update_fields=changed + ["version"])
+        return instance
+
+    def _update_links(self, instance, name, objs):
+        """
+        Bring the many-to-many links of field name to exactly objs with
+        one DELETE and one INSERT, return whether anything changed.
+        m2m_changed is sent like for the related manager's own methods
+        """
+        field = Recipe._meta.get_field(name)
+        through = field.remote_field.through
+        source_column = field.m2m_column_name()
+        target = field.m2m_reverse_field_name()
+        target_column = field.m2m_reverse_name()
+        links = through.objects.filter(**{source_column: instance.pk})
+
+        current = set(links.values_list(target_column, flat=True))
+        wanted = {obj.pk for obj in objs}
+        removed = current - wanted
+        added = wanted - current
+
+        signal = dict(
+            sender=through,
+            instance=instance,
+            reverse=False,
+            model=field.related_model,
+            using=links.db,
+        )
+        if removed:
+            m2m_changed.send(action="pre_remove", pk_set=removed, **signal)
+            links.filter(**{f"{target}__in": removed}).delete()
+            m2m_changed.send(action="post_remove", pk_set=removed, **signal)
+        if added:
+            m2m_changed.send(action="pre_add", pk_set=added, **signal)
+            through.objects.bulk_create([
+                through(**{source_column: instance.pk, target_column: pk})
+                for pk in added
+            ])
+            m2m_changed.send(action="post_add", pk_set=added, **signal)
+        return bool(removed or added)
 
 
 class RecipeDetailSerializer(RecipeSerializerBase):
@@ -47,10 +165,32 @@ class RecipeDetailSerializer(RecipeSerializerBase):
     tags = TagSerializer(many=True, read_only=True)
 
 
+class ShoppingListSerializer(serializers.Serializer):
+    """Serializer for the recipes a shopping list is made of"""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False
+    )
+
+
+class RecipeCopySerializer(serializers.Serializer):
+    """Serializer for the recipes to copy and the copies made of each"""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False
+    )
+    copies = serializers.IntegerField(min_value=1, default=1)
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to recipes"""
 
     class Meta:
         model = Recipe
         fields = ("id", "image")
-        read_only_fields = ("id", )
\ No newline at end of file
+        read_only_fields = ("id", )
+
+    def update(self, instance, validated_data):
+        # a new version outdates the cached details of every process
+        instance.version = F("version") + 1
+        instance = super().update(instance, validated_data)
+        instance.refresh_from_db(fields=["version"])
+        return instance
@@ -0,0 +1,52 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.tests import factories
+from recipe.management.commands.explain_queries import find_seq_scans
+
+
+class ExplainQueriesTests(TestCase):
+
+    def test_list_queries_use_indexes(self):
+        """Test that no list query reads a whole table"""
+        user, other = factories.make_users(2)
+        for owner in (user, other):
+            factories.make_recipes(owner, 50)
+            factories.make_tags(owner, [f'Tag {i}' for i in range(20)])
+            factories.make_ingredients(
+                owner, [f'Ingredient {i}' for i in range(20)]
+            )
+        out = StringIO()
+
+        call_command('explain_queries', stdout=out)
+
+        self.assertIn('All queries use indexes', out.getvalue())
+
+    def test_no_user(self):
+        """Test that the command fails without data to query"""
+        with self.assertRaises(CommandError):
+            call_command('explain_queries', stdout=StringIO())
+
+    def test_find_seq_scans(self):
+        """Test that sequential scans are found in plans of both vendors"""
+        self.assertEqual(
+            find_seq_scans(
+                'Sort\n  ->  Seq Scan on core_tag\n'
+                '        Filter: (user_id = 1)'
+            ),
+            ['core_tag']
+        )
+        self.assertEqual(
+            find_seq_scans('2 0 0 SCAN TABLE core_recipe'),
+            ['core_recipe']
+        )
+        self.assertEqual(
+            find_seq_scans(
+                '3 0 0 SEARCH TABLE core_tag USING INDEX '
+                'core_tag_user_id_4ceac3_idx (user_id=?)'
+            ),
+            []
+        )
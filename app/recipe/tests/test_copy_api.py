@@ -0,0 +1,99 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ChangeLogEntry, Recipe
+from core.tests import factories
+
+
+COPY_URL = reverse("recipe:recipe-copy")
+
+
+class RecipeCopyApiTests(TestCase):
+
+    def setUp(self):
+        self.user = factories.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan, self.quick = factories.make_tags(
+            self.user, ["Vegan", "Quick"]
+        )
+        self.rice, self.beans = factories.make_ingredients(
+            self.user, ["Rice", "Beans"]
+        )
+        self.first, self.second = factories.make_recipes(self.user, 2)
+        self.first.tags.set([self.vegan, self.quick])
+        self.first.ingredients.set([self.rice, self.beans])
+        self.second.ingredients.set([self.rice])
+        Recipe.objects.filter(pk=self.first.pk).update(
+            image="uploads/recipe/first.jpg", link="https://example.com"
+        )
+
+    def post(self, payload):
+        return self.client.post(COPY_URL, payload, format="json")
+
+    def test_copy_recipes(self):
+        """Test copying recipes with their links and image"""
+        res = self.post({
+            "recipes": [self.second.id, self.first.id], "copies": 2
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [item["copy_of"] for item in res.data],
+            [self.second.id, self.second.id, self.first.id, self.first.id]
+        )
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 6)
+        for item in res.data[2:]:
+            copy = Recipe.objects.get(pk=item["id"])
+            self.assertEqual(copy.title, self.first.title)
+            self.assertEqual(copy.link, "https://example.com")
+            self.assertEqual(copy.version, 1)
+            # the file is shared, not duplicated
+            self.assertEqual(copy.image.name, "uploads/recipe/first.jpg")
+            self.assertEqual(
+                sorted(item["tags"]), sorted([self.vegan.id, self.quick.id])
+            )
+            self.assertEqual(
+                set(copy.ingredients.values_list("id", flat=True)),
+                {self.rice.id, self.beans.id}
+            )
+        self.assertEqual(res.data[0]["ingredients"], [self.rice.id])
+        self.assertEqual(res.data[0]["tags"], [])
+
+    def test_copies_update_counts_and_change_log(self):
+        """Test that copies count as tag uses and show up in syncs"""
+        res = self.post({"recipes": [self.first.id], "copies": 3})
+
+        self.rice.refresh_from_db()
+        self.vegan.refresh_from_db()
+        self.assertEqual(self.rice.recipe_count, 5)
+        self.assertEqual(self.vegan.recipe_count, 4)
+        created = ChangeLogEntry.objects.filter(
+            model="recipe", action=ChangeLogEntry.CREATED
+        ).values_list("object_id", flat=True)
+        self.assertEqual(
+            sorted(created), sorted(item["id"] for item in res.data)
+        )
+
+    def test_copy_unknown_recipes(self):
+        """Test that copying other users' recipes is refused"""
+        other = factories.make_recipe(factories.make_user())
+
+        res = self.post({"recipes": [self.first.id, other.id]})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(other.id), str(res.data["recipes"]))
+        self.assertEqual(Recipe.objects.count(), 3)
+
+    def test_copy_size_is_capped(self):
+        """Test that empty and oversized copies are rejected"""
+        res = self.post({"recipes": []})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.post({"recipes": [self.first.id], "copies": 501})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("copies", res.data)
+        self.assertEqual(Recipe.objects.count(), 2)
@@ -0,0 +1,85 @@
+from django.core.cache import cache as default_cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import similarity
+from core.tests import factories
+from core.tests.budget import QueryBudgetMixin
+from recipe import cache
+
+
+class RecipeQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test that the recipe endpoints stay within their query budgets"""
+
+    def setUp(self):
+        cache.local.clear()
+        default_cache.clear()
+        self.addCleanup(default_cache.clear)
+        self.user = factories.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tags = tags = factories.make_tags(
+            self.user, ["Vegan", "Quick", "Hot"]
+        )
+        ingredients = factories.make_ingredients(
+            self.user, ["Rice", "Beans", "Salt"]
+        )
+        # enough recipes with links that per-recipe queries would show
+        self.recipes = factories.make_recipes(self.user, 5)
+        for number, recipe in enumerate(self.recipes):
+            recipe.tags.set(tags[:number % 3 + 1])
+            recipe.ingredients.set(ingredients[number % 3:])
+        similarity.rebuild(self.user)
+
+    def get(self, name, url, params=None):
+        with self.assertQueryBudget(name):
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res
+
+    def test_recipe_list(self):
+        url = reverse("recipe:recipe-list")
+        self.get("recipe-list", url)
+        self.get("recipe-list-fields", url, {"fields": "id,title"})
+        self.get("recipe-list-expanded", url, {"expand": "tags,ingredients"})
+        self.get("recipe-list-faceted", url, {
+            "facets": "1", "price_max": "10", "ordering": "price",
+            "tags": ",".join(str(tag.id) for tag in self.tags[:2]),
+        })
+
+    def test_recipe_detail(self):
+        url = reverse("recipe:recipe-detail", args=[self.recipes[0].id])
+        self.get("recipe-detail", url)
+        self.get("recipe-detail-cached", url)
+
+    def test_similar_recipes(self):
+        url = reverse("recipe:recipe-similar", args=[self.recipes[0].id])
+        self.get("recipe-similar", url)
+
+    def test_shopping_list(self):
+        with self.assertQueryBudget("recipe-shopping-list"):
+            res = self.client.post(
+                reverse("recipe:recipe-shopping-list"),
+                {"recipes": [recipe.id for recipe in self.recipes]},
+                format="json"
+            )
+            b"".join(res.streaming_content)
+
+    def test_copy(self):
+        with self.assertQueryBudget("recipe-copy"):
+            res = self.client.post(
+                reverse("recipe:recipe-copy"),
+                {"recipes": [recipe.id for recipe in self.recipes[:2]]},
+                format="json"
+            )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_tag_and_ingredient_lists(self):
+        self.get("tag-list", reverse("recipe:tag-list"))
+        self.get("ingredient-list", reverse("recipe:ingredient-list"))
+
+    def test_sync(self):
+        self.get("sync", reverse("recipe:sync"), {"since": 0})
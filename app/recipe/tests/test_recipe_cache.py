@@ -0,0 +1,142 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe import cache
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+def versions(recipe):
+    """Return the versions a cached detail of recipe is checked against"""
+    return Recipe.objects.filter(pk=recipe.pk).values_list(
+        "version", "user__recipe_attrs_version"
+    ).get()
+
+
+def sample_recipe(user, title="Pie"):
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=5
+    )
+
+
+class RecipeDetailCacheTests(TestCase):
+    """Test caching of serialized recipe details"""
+
+    def setUp(self):
+        cache.local.clear()
+        self.user = get_user_model().objects.create_user(
+            "test@londonappdev.com", "testpass"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(self.user)
+        self.tag = Tag.objects.create(user=self.user, name="Vegan")
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name="Salt")
+        )
+
+    def test_cached_detail_reads_version_only(self):
+        """Test that a cached detail takes a single query to serve"""
+        first = self.client.get(detail_url(self.recipe.id))
+
+        with self.assertNumQueries(1):
+            res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.data, first.data)
+
+    def test_edit_refreshes_detail(self):
+        """Test that editing the recipe invalidates its detail"""
+        self.client.get(detail_url(self.recipe.id))
+
+        self.client.patch(detail_url(self.recipe.id), {"title": "Tart"})
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.data["title"], "Tart")
+
+    def test_tag_rename_refreshes_detail(self):
+        """Test that renaming a tag invalidates recipes showing it"""
+        self.client.get(detail_url(self.recipe.id))
+
+        self.tag.name = "Vegetarian"
+        self.tag.save()
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.data["tags"][0]["name"], "Vegetarian")
+
+    def test_new_link_refreshes_counts(self):
+        """Test that linking a tag elsewhere updates its shown count"""
+        self.client.get(detail_url(self.recipe.id))
+
+        sample_recipe(self.user, title="Cake").tags.add(self.tag)
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.data["tags"][0]["recipe_count"], 2)
+
+    @override_settings(RECIPE_CACHE_SIZE=1)
+    def test_least_recently_used_evicted(self):
+        """Test that the oldest detail is dropped when the cache is full"""
+        other = sample_recipe(self.user, title="Cake")
+
+        self.client.get(detail_url(self.recipe.id))
+        self.client.get(detail_url(other.id))
+
+        self.assertEqual(len(cache.local), 1)
+        self.assertIsNone(cache.lookup(self.recipe.id, versions(self.recipe)))
+        self.assertIsNotNone(cache.lookup(other.id, versions(other)))
+
+    def test_invalid_id(self):
+        """Test that a malformed recipe id is not found"""
+        res = self.client.get(detail_url("abc"))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_dropped_after_commit(self):
+        """Test that a saved recipe's detail is only dropped on commit"""
+        self.client.get(detail_url(self.recipe.id))
+        cached = versions(self.recipe)
+
+        with patch("recipe.cache.transaction.on_commit") as on_commit:
+            self.recipe.save()
+            self.assertIsNotNone(cache.lookup(self.recipe.id, cached))
+
+        for call in on_commit.call_args_list:
+            call[0][0]()
+        self.assertIsNone(cache.lookup(self.recipe.id, cached))
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            },
+            "recipes": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "recipes",
+            },
+        },
+        RECIPE_CACHE_BACKEND="recipes",
+    )
+    def test_shared_backend(self):
+        """Test that details are shared through the configured backend"""
+        self.client.get(detail_url(self.recipe.id))
+        cache.local.clear()
+
+        with self.assertNumQueries(1):
+            self.client.get(detail_url(self.recipe.id))
+
+        self.tag.name = "Vegetarian"
+        self.tag.save()
+        cache.local.clear()
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.data["tags"][0]["name"], "Vegetarian")
@@ -1,18 +1,22 @@
 from email.mime import multipart
 import tempfile
-import os
+from unittest.mock import patch
 
 from PIL import Image
 
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.cache import cache as default_cache
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
 from core.models import Recipe, Tag, Ingredient
-from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe import cache
+from recipe.serializers import (
+    RecipeSerializer, RecipeDetailSerializer, TagSerializer
+)
 
 
 default_payload = {
@@ -66,6 +70,7 @@ class PublicUserApiTests(TestCase):
 class PrivateUserApiTests(TestCase):
 
     def setUp(self):
+        cache.local.clear()
         self.user = get_user_model().objects.create_user(
             email="monteros@gmail.com",
             password="TestPass"
@@ -194,6 +199,278 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(len(tags), 0)
 
 
+class RecipeEditTests(TestCase):
+    """Test that edits only write what changed and detect conflicts"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="monteros@gmail.com",
+            password="TestPass"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(self.user)
+        self.tag1 = sample_tag(self.user, name="Vegan")
+        self.tag2 = sample_tag(self.user, name="Dessert")
+        self.recipe.tags.add(self.tag1)
+
+    def test_update_bumps_version(self):
+        """Test that every edit increments the version"""
+        res = self.client.patch(detail_url(self.recipe.id), {"title": "Pie"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["version"], 2)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.version, 2)
+
+    def test_unchanged_update_keeps_version(self):
+        """Test that submitting the current values writes nothing"""
+        res = self.client.patch(
+            detail_url(self.recipe.id),
+            {"title": self.recipe.title, "tags": [self.tag1.id]}
+        )
+
+        self.assertEqual(res.data["version"], 1)
+
+    def test_stale_version_conflict(self):
+        """Test that an edit based on an old version is refused"""
+        self.client.patch(detail_url(self.recipe.id), {"title": "Pie"})
+
+        res = self.client.patch(
+            detail_url(self.recipe.id),
+            {"title": "Cake", "tags": [self.tag2.id], "version": 1}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, "Pie")
+        self.assertEqual(list(self.recipe.tags.all()), [self.tag1])
+
+    def test_tag_diff_keeps_counts(self):
+        """Test that swapping links keeps the recipe counters right"""
+        res = self.client.patch(
+            detail_url(self.recipe.id),
+            {"tags": [self.tag2.id], "version": 1},
+            format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(self.recipe.tags.all()), [self.tag2])
+        self.tag1.refresh_from_db()
+        self.tag2.refresh_from_db()
+        self.assertEqual(self.tag1.recipe_count, 0)
+        self.assertEqual(self.tag2.recipe_count, 1)
+
+
+class RecipeFieldSelectionTests(TestCase):
+    """Test ?fields= and ?expand= on the recipe endpoints"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="monteros@gmail.com",
+            password="TestPass"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(self.user)
+        self.tag = sample_tag(self.user)
+        self.ingredient = sample_ingredient(self.user)
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+        self.tag.refresh_from_db()
+
+    def test_list_selected_fields(self):
+        """Test that only the requested fields are returned"""
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL, {"fields": "id,title"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data, [{"id": self.recipe.id, "title": self.recipe.title}]
+        )
+
+    def test_list_expand_tags(self):
+        """Test that expanded relations are nested, others stay ids"""
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPES_URL, {"expand": "tags"})
+
+        recipe = res.data[0]
+        self.assertEqual(
+            recipe["tags"], TagSerializer([self.tag], many=True).data
+        )
+        self.assertEqual(recipe["ingredients"], [self.ingredient.id])
+
+    def test_detail_collapse_relations(self):
+        """Test that the detail endpoint can return ids instead"""
+        res = self.client.get(
+            detail_url(self.recipe.id),
+            {"fields": "id,tags,ingredients", "expand": "ingredients"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(res.data), {"id", "tags", "ingredients"})
+        self.assertEqual(res.data["tags"], [self.tag.id])
+        self.assertEqual(res.data["ingredients"][0]["name"],
+                         self.ingredient.name)
+
+    def test_unknown_fields_rejected(self):
+        """Test that unknown field or relation names are rejected"""
+        for params in ({"fields": "id,user"}, {"expand": "title"}):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeRangeFilterTests(TestCase):
+    """Test the price and time filters, orderings and facets"""
+
+    def setUp(self):
+        # cached facets outlive the users rolled back after each test
+        default_cache.clear()
+        self.addCleanup(default_cache.clear)
+        self.user = get_user_model().objects.create_user(
+            email="monteros@gmail.com",
+            password="TestPass"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.cheap = sample_recipe(
+            self.user, title="Toast", price=2, time_minutes=5
+        )
+        self.quick = sample_recipe(
+            self.user, title="Salad", price=8, time_minutes=10
+        )
+        self.slow = sample_recipe(
+            self.user, title="Stew", price=15, time_minutes=180
+        )
+        self.tag = sample_tag(self.user)
+        self.quick.tags.add(self.tag)
+        self.slow.tags.add(self.tag)
+
+    def titles(self, params):
+        res = self.client.get(RECIPES_URL, dict(params, fields="title"))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe["title"] for recipe in res.data]
+
+    def test_range_filters(self):
+        """Test filtering by price and time ranges and tags"""
+        self.assertEqual(
+            self.titles({"price_min": "5", "price_max": "15"}),
+            ["Stew", "Salad"]
+        )
+        self.assertEqual(self.titles({"time_max": 10}), ["Toast", "Salad"])
+        self.assertEqual(
+            self.titles({"tags": self.tag.id, "price_max": "9.50"}),
+            ["Salad"]
+        )
+
+    def test_orderings(self):
+        """Test ordering by price and time"""
+        self.assertEqual(
+            self.titles({"ordering": "price"}), ["Toast", "Salad", "Stew"]
+        )
+        self.assertEqual(
+            self.titles({"ordering": "-time_minutes"}),
+            ["Stew", "Salad", "Toast"]
+        )
+
+    def test_invalid_parameters(self):
+        """Test that invalid bounds and orderings are rejected"""
+        for params in ({"price_min": "cheap"}, {"time_max": -1},
+                       {"price_max": "nan"}, {"tags": "a,b"},
+                       {"ordering": "link"}):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_facets(self):
+        """Test that facets count the filtered recipes per facet query"""
+        with self.assertNumQueries(4):
+            res = self.client.get(
+                RECIPES_URL,
+                {"facets": "1", "fields": "title", "tags": self.tag.id}
+            )
+
+        self.assertEqual(
+            res.data["results"], [{"title": "Stew"}, {"title": "Salad"}]
+        )
+        price = {bucket["min"]: bucket["count"]
+                 for bucket in res.data["facets"]["price"]}
+        self.assertEqual(price, {0: 0, 5: 1, 10: 1, 20: 0, 50: 0})
+        time_minutes = res.data["facets"]["time_minutes"]
+        self.assertEqual(
+            time_minutes[-1], {"min": 120, "max": None, "count": 1}
+        )
+        self.assertEqual(time_minutes[0]["count"], 1)
+        self.assertEqual(res.data["facets"]["tags"], [
+            {"id": self.tag.id, "name": self.tag.name, "count": 2}
+        ])
+        self.assertEqual(res.data["facets"]["ingredients"], [])
+
+    def test_tag_and_ingredient_facets(self):
+        """Test counting the tags and ingredients of filtered recipes"""
+        other_tag = sample_tag(self.user, name="cheap")
+        self.cheap.tags.add(other_tag)
+        ingredient = sample_ingredient(self.user)
+        self.cheap.ingredients.add(ingredient)
+        self.quick.ingredients.add(ingredient)
+
+        res = self.client.get(
+            RECIPES_URL, {"facets": "1", "price_max": "10"}
+        )
+
+        self.assertEqual(res.data["facets"]["tags"], [
+            {"id": other_tag.id, "name": "cheap", "count": 1},
+            {"id": self.tag.id, "name": self.tag.name, "count": 1},
+        ])
+        self.assertEqual(res.data["facets"]["ingredients"], [
+            {"id": ingredient.id, "name": ingredient.name, "count": 2},
+        ])
+
+    @patch("recipe.facets.transaction.on_commit", lambda func: func())
+    def test_facets_cached_until_recipes_change(self):
+        """Test that facets are cached per filter until a write"""
+        params = {"facets": "1", "fields": "id", "time_max": "10"}
+        self.client.get(RECIPES_URL, params)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.data["facets"]["tags"][0]["count"], 1)
+
+        # another filter has its own entry
+        with self.assertNumQueries(4):
+            self.client.get(RECIPES_URL, dict(params, time_max="5"))
+
+        self.cheap.tags.add(self.tag)
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.data["facets"]["tags"][0]["count"], 2)
+
+        self.tag.name = "salty"
+        self.tag.save()
+        res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.data["facets"]["tags"][0]["name"], "salty")
+
+        self.client.patch(detail_url(self.slow.id), {"time_minutes": 10})
+        res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.data["facets"]["tags"][0]["count"], 3)
+
+    def test_facets_kept_until_commit(self):
+        """Test that a write only outdates facets once it commits"""
+        params = {"facets": "1", "fields": "id"}
+        self.client.get(RECIPES_URL, params)
+
+        with patch("recipe.facets.transaction.on_commit") as on_commit:
+            self.cheap.tags.add(self.tag)
+            with self.assertNumQueries(1):
+                self.client.get(RECIPES_URL, params)
+
+        for call in on_commit.call_args_list:
+            call[0][0]()
+        with self.assertNumQueries(4):
+            self.client.get(RECIPES_URL, params)
+
+
 class RecipeImageUploadTests(TestCase):
 
     def setUp(self):
@@ -223,7 +500,9 @@ class RecipeImageUploadTests(TestCase):
         self.recipe.refresh_from_db()
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn('image', res.data)
-        self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertTrue(
+            self.recipe.image.storage.exists(self.recipe.image.name)
+        )
     
     def test_upload_image_bad_request(self):
         """Test uploading an invalid image"""
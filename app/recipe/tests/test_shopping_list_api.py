@@ -0,0 +1,69 @@
+import json
+
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.tests import factories
+
+
+SHOPPING_LIST_URL = reverse("recipe:recipe-shopping-list")
+
+
+class ShoppingListApiTests(TestCase):
+
+    def setUp(self):
+        self.user = factories.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.rice, self.beans, self.salt = factories.make_ingredients(
+            self.user, ["Rice", "Beans", "Salt"]
+        )
+        self.first, self.second, self.third = factories.make_recipes(
+            self.user, 3
+        )
+        self.first.ingredients.set([self.rice, self.salt])
+        self.second.ingredients.set([self.beans, self.salt])
+        self.third.ingredients.set([self.rice])
+
+    def post(self, recipe_ids):
+        return self.client.post(
+            SHOPPING_LIST_URL, {"recipes": recipe_ids}, format="json"
+        )
+
+    def test_shopping_list(self):
+        """Test merging the ingredients of recipes in one query"""
+        with self.assertNumQueries(1):
+            res = self.post([self.first.id, self.second.id, self.first.id])
+            data = json.loads(b"".join(res.streaming_content))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(data["ingredients"], [
+            {"id": self.beans.id, "name": "Beans", "count": 1,
+             "recipes": [self.second.id]},
+            {"id": self.rice.id, "name": "Rice", "count": 1,
+             "recipes": [self.first.id]},
+            {"id": self.salt.id, "name": "Salt", "count": 2,
+             "recipes": sorted([self.first.id, self.second.id])},
+        ])
+
+    def test_shopping_list_of_other_users_recipes(self):
+        """Test that other users' recipes are left out"""
+        other = factories.make_recipe(factories.make_user())
+        other.ingredients.set(factories.make_ingredients(other.user, ["Oil"]))
+
+        res = self.post([other.id])
+
+        data = json.loads(b"".join(res.streaming_content))
+        self.assertEqual(data, {"ingredients": []})
+
+    def test_shopping_list_size_is_capped(self):
+        """Test that empty and oversized selections are rejected"""
+        res = self.post([])
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.post(list(range(1, 502)))
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("recipes", res.data)
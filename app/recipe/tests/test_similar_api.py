@@ -0,0 +1,56 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import similarity
+from core.tests import factories
+
+
+def similar_url(recipe_id):
+    return reverse("recipe:recipe-similar", args=[recipe_id])
+
+
+class SimilarRecipesApiTests(TestCase):
+
+    def setUp(self):
+        self.user = factories.make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        tags = factories.make_tags(self.user, ["Vegan", "Quick", "Hot"])
+        self.recipe, self.close, self.far = factories.make_recipes(
+            self.user, 3
+        )
+        self.recipe.tags.set(tags[:2])
+        self.close.tags.set(tags[:2])
+        self.far.tags.set(tags[1:])
+        similarity.rebuild(self.user)
+
+    def test_similar_recipes(self):
+        """Test that similar recipes come most similar first"""
+        with self.assertNumQueries(5):
+            res = self.client.get(similar_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(r["id"], r["score"]) for r in res.data],
+            [(self.close.id, 1.0), (self.far.id, 1 / 3)]
+        )
+        self.assertEqual(res.data[0]["title"], self.close.title)
+
+    def test_similar_limit(self):
+        """Test limiting and validating the number of recipes"""
+        res = self.client.get(similar_url(self.recipe.id), {"limit": 1})
+        self.assertEqual([r["id"] for r in res.data], [self.close.id])
+
+        res = self.client.get(similar_url(self.recipe.id), {"limit": 0})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_similar_of_other_users_recipe(self):
+        """Test that other users' recipes can't be looked up"""
+        other = factories.make_recipe(factories.make_user())
+
+        res = self.client.get(similar_url(other.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,151 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import deletion
+from core.models import ChangeLogEntry, Recipe, Tag, Ingredient
+
+
+SYNC_URL = reverse("recipe:sync")
+
+
+def sample_recipe(user, title="Costillas con tomate"):
+    """Create and return a sample recipe"""
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=40, price=4.00
+    )
+
+
+class PublicSyncApiTests(TestCase):
+
+    def test_login_required(self):
+        """Test that authentication is required to sync"""
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateSyncApiTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="monteros@gmail.com",
+            password="TestPass"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, since):
+        res = self.client.get(SYNC_URL, {"since": since})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_initial_sync_returns_everything(self):
+        """Test that syncing from 0 returns all of the user's objects"""
+        recipe = sample_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        other_user = get_user_model().objects.create_user(
+            email="other@gmail.com", password="TestPass"
+        )
+        sample_recipe(other_user)
+
+        data = self.sync(0)
+
+        self.assertEqual([r["id"] for r in data["recipes"]], [recipe.id])
+        self.assertEqual([t["id"] for t in data["tags"]], [tag.id])
+        self.assertFalse(data["more"])
+        self.assertGreater(data["seq"], 0)
+
+    def test_sync_returns_only_changes(self):
+        """Test that only objects changed since seq are returned"""
+        recipe = sample_recipe(self.user)
+        Tag.objects.create(user=self.user, name="Vegan")
+        seq = self.sync(0)["seq"]
+
+        recipe.title = "Chicken tikka"
+        recipe.save()
+        new_ingredient = Ingredient.objects.create(user=self.user, name="Rice")
+
+        data = self.sync(seq)
+
+        self.assertEqual([r["title"] for r in data["recipes"]],
+                         ["Chicken tikka"])
+        self.assertEqual(data["tags"], [])
+        self.assertEqual([i["id"] for i in data["ingredients"]],
+                         [new_ingredient.id])
+        self.assertEqual(self.sync(data["seq"])["recipes"], [])
+
+    def test_sync_reports_link_changes(self):
+        """Test that adding a tag to a recipe marks the recipe changed"""
+        recipe = sample_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        seq = self.sync(0)["seq"]
+
+        tag.recipes.add(recipe)
+
+        data = self.sync(seq)
+        self.assertEqual(data["recipes"][0]["tags"], [tag.id])
+
+    def test_sync_reports_deletions(self):
+        """Test that deleted objects come back as tombstones"""
+        recipe = sample_recipe(self.user)
+        bulk_recipe = sample_recipe(self.user, title="Roasted fish")
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        seq = self.sync(0)["seq"]
+        tag_id, recipe_id = tag.id, recipe.id
+
+        tag.delete()
+        recipe.delete()
+        deletion.delete_recipes(Recipe.objects.filter(pk=bulk_recipe.pk))
+
+        data = self.sync(seq)
+        self.assertEqual(data["recipes"], [])
+        self.assertEqual(data["deleted"]["tags"], [tag_id])
+        self.assertEqual(
+            sorted(data["deleted"]["recipes"]),
+            sorted([recipe_id, bulk_recipe.id])
+        )
+
+    def test_sync_pages_through_changes(self):
+        """Test that a long change log is returned over several calls"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        seq = self.sync(0)["seq"]
+        for i in range(3):
+            sample_recipe(self.user, title=f"Recipe {i}")
+
+        with patch("recipe.views.SyncView.page_size", 2):
+            first = self.sync(seq)
+            second = self.sync(first["seq"])
+
+        self.assertTrue(first["more"])
+        self.assertFalse(second["more"])
+        self.assertEqual(len(first["recipes"]) + len(second["recipes"]), 3)
+
+    def test_changes_numbered_per_user(self):
+        """Test that each user's changes are numbered without gaps"""
+        other_user = get_user_model().objects.create_user(
+            email="other@gmail.com", password="TestPass"
+        )
+        sample_recipe(self.user)
+        sample_recipe(other_user)
+        Tag.objects.create(user=self.user, name="Vegan")
+        deletion.delete_recipes(Recipe.objects.all())
+
+        for user, expected in ((self.user, [1, 2, 3]), (other_user, [1, 2])):
+            entries = ChangeLogEntry.objects.filter(user=user).order_by("seq")
+            self.assertEqual(
+                list(entries.values_list("seq", flat=True)), expected
+            )
+        self.assertEqual(self.sync(0)["seq"], 3)
+
+    def test_invalid_since(self):
+        """Test that a malformed sequence number is rejected"""
+        for since in ("abc", -1):
+            res = self.client.get(SYNC_URL, {"since": since})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
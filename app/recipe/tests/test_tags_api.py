@@ -6,7 +6,7 @@ from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Tag
+from core.models import Tag, Recipe
 
 # why do we need this one?
 # to compare that data from API response matches Serialized data
@@ -87,3 +87,23 @@ class PrivateTagsApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_order_tags_by_recipe_count(self):
+        """Test sorting tags by the number of recipes using them"""
+        popular = Tag.objects.create(user=self.user, name="Vegan")
+        unused = Tag.objects.create(user=self.user, name="Dessert")
+        recipe = Recipe.objects.create(
+            user=self.user, title="Salad", time_minutes=5, price=2.00
+        )
+        recipe.tags.add(popular)
+
+        res = self.client.get(TAGS_URL, {"ordering": "-recipe_count"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([t["id"] for t in res.data], [popular.id, unused.id])
+        self.assertEqual(res.data[0]["recipe_count"], 1)
+
+    def test_invalid_ordering(self):
+        """Test that unknown orderings are rejected"""
+        res = self.client.get(TAGS_URL, {"ordering": "user"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,25 +1,56 @@
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import groupby
+from operator import itemgetter
+
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.utils.translation import ugettext_lazy as _
+
 # to create custom actions
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 # to get the right view
 from rest_framework import viewsets, mixins, status
-# to authenticate the request
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
 
+from core import changelog, copying, similarity
+# to authenticate the request
+from core.authentication import ExpiringTokenAuthentication
 from core.models import Tag, Ingredient, Recipe
-from recipe import serializers
+from core.throttling import ThrottledViewMixin
+from recipe import cache, facets, serializers
 
 # mixins allow us to specify exactly what the endpoint will be able to do
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+class BaseRecipeAttrViewSet(ThrottledViewMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    throttle_scope = "recipe-attrs"
+    # values of ?ordering=, served by the (user, name, id) and
+    # (user, recipe_count, name) indexes
+    orderings = {
+        "-name": ("-name", "-id"),
+        "name": ("name", "id"),
+        "recipe_count": ("recipe_count", "name"),
+        "-recipe_count": ("-recipe_count", "-name"),
+    }
 
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
-        return self.queryset.filter(user=self.request.user).order_by("-name")
+        ordering = self.request.query_params.get("ordering", "-name")
+        if ordering not in self.orderings:
+            raise ValidationError({
+                "ordering": _("Choose one of: %s") % ", ".join(self.orderings)
+            })
+        return self.queryset.filter(
+            user=self.request.user
+        ).order_by(*self.orderings[ordering])
     
     def perform_create(self, serializer):
         """Create a new object"""
@@ -39,22 +70,214 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = serializers.IngredientSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ThrottledViewMixin, viewsets.ModelViewSet):
     """Manage recipes in the database"""
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication, )
+    authentication_classes = (ExpiringTokenAuthentication, )
     permission_classes = (IsAuthenticated, )
+    throttle_scope = "recipes"
+    throttle_scopes = {"upload_image": "recipe-upload"}
+    # relations nested in responses when ?expand= isn't given
+    default_expand = {"retrieve": ("ingredients", "tags")}
+    # recipes a shopping list can be made of
+    max_shopping_list_recipes = 500
+    # recipes a single copy request can create
+    max_copied_recipes = 500
+    # values of ?ordering=, served by the (user, title, id), (user, price,
+    # -title, -id) and (user, time_minutes, -title, -id) indexes
+    orderings = {
+        "-title": ("-title", "-id"),
+        "title": ("title", "id"),
+        "price": ("price", "-title", "-id"),
+        "-price": ("-price", "title", "id"),
+        "time_minutes": ("time_minutes", "-title", "-id"),
+        "-time_minutes": ("-time_minutes", "title", "id"),
+    }
+    # list parameters bounding a field, with the lookup and value type
+    ranges = {
+        "price_min": ("price__gte", Decimal),
+        "price_max": ("price__lte", Decimal),
+        "time_min": ("time_minutes__gte", int),
+        "time_max": ("time_minutes__lte", int),
+    }
+    # lower bounds of the buckets counted with ?facets=, the last bucket
+    # has no upper bound
+    facet_buckets = {
+        "price": (0, 5, 10, 20, 50),
+        "time_minutes": (0, 15, 30, 60, 120),
+    }
 
     def get_queryset(self):
-        return self.queryset.filter(user=self.request.user).order_by("-title")
-    
+        ordering = self.request.query_params.get("ordering", "-title")
+        if ordering not in self.orderings:
+            raise ValidationError({
+                "ordering": _("Choose one of: %s") % ", ".join(self.orderings)
+            })
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.action == "list":
+            queryset = self.filter_recipes(queryset)
+        queryset = queryset.order_by(*self.orderings[ordering])
+        if self.action not in ("list", "retrieve"):
+            return queryset
+
+        # only read the columns and relations the response will contain
+        fields, expand = self.get_field_selection()
+        if fields is None:
+            fields = serializers.RecipeSerializerBase.Meta.fields
+        if expand is None:
+            expand = self.default_expand.get(self.action, ())
+        relations = [
+            name for name in serializers.RecipeSerializerBase.expandable
+            if name in fields
+        ]
+        columns = [name for name in fields if name not in relations]
+        if self.action == "list" and not relations:
+            return queryset.values(*columns)
+
+        queryset = queryset.only(*columns)
+        for name in relations:
+            related = Recipe._meta.get_field(name).related_model.objects
+            if name not in expand:
+                related = related.only("id")
+            queryset = queryset.prefetch_related(
+                Prefetch(name, queryset=related.all())
+            )
+        return queryset
+
+    def filter_recipes(self, queryset):
+        """
+        Filter by the ranges in ?price_min=, ?price_max=, ?time_min= and
+        ?time_max=, and to recipes with any of the tag ids in ?tags=
+        """
+        params = self.request.query_params
+        filters = {}
+        for param, (lookup, parse) in self.ranges.items():
+            if param not in params:
+                continue
+            try:
+                value = parse(params[param])
+                if value < 0 or not Decimal(value).is_finite():
+                    raise ValueError
+            except (ValueError, InvalidOperation):
+                raise ValidationError(
+                    {param: _("A non-negative number is required")}
+                )
+            filters[lookup] = value
+        queryset = queryset.filter(**filters)
+
+        if "tags" in params:
+            try:
+                tag_ids = [int(pk) for pk in params["tags"].split(",") if pk]
+            except ValueError:
+                raise ValidationError(
+                    {"tags": _("A comma separated list of ids is required")}
+                )
+            queryset = queryset.filter(pk__in=Recipe.tags.through.objects
+                                       .filter(tag_id__in=tag_ids)
+                                       .values("recipe_id"))
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """
+        List the recipes, wrapped as {"results": ..., "facets": ...} with
+        ?facets=, where the facets count all recipes matching the filters
+        """
+        response = super().list(request, *args, **kwargs)
+        if "facets" in request.query_params:
+            response.data = {
+                "results": response.data,
+                "facets": self.get_facets(),
+            }
+        return response
+
+    def get_facets(self):
+        """
+        Return the price and time histograms and the tag and ingredient
+        counts of the filtered recipes, cached until the user's recipes
+        change
+        """
+        queryset = self.filter_recipes(
+            self.queryset.filter(user=self.request.user)
+        )
+        filters = {
+            param: self.request.query_params[param]
+            for param in (*self.ranges, "tags")
+            if param in self.request.query_params
+        }
+
+        def compute():
+            return dict(
+                facets.histograms(queryset, self.facet_buckets),
+                **facets.link_counts(queryset)
+            )
+        return facets.get(self.request.user.pk, filters, compute)
+
+    def get_field_selection(self):
+        """
+        Return the field names requested with ?fields= and the relations
+        to nest requested with ?expand=, each None when not given
+        """
+        if hasattr(self, "_field_selection"):
+            return self._field_selection
+
+        selection = []
+        for param, allowed in (
+            ("fields", serializers.RecipeSerializerBase.Meta.fields),
+            ("expand", serializers.RecipeSerializerBase.expandable),
+        ):
+            if param not in self.request.query_params:
+                selection.append(None)
+                continue
+            names = [
+                name for name in
+                self.request.query_params[param].split(",") if name
+            ]
+            unknown = set(names) - set(allowed)
+            if unknown:
+                raise ValidationError({
+                    param: _("Unknown fields: %s") % ", ".join(sorted(unknown))
+                })
+            selection.append(names)
+
+        self._field_selection = tuple(selection)
+        return self._field_selection
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return the recipe detail, from the cache when it's up to date"""
+        if self.get_field_selection() != (None, None):
+            return super().retrieve(request, *args, **kwargs)
+
+        # only the versions are read to check the cached detail
+        version, attrs_version = get_object_or_404(
+            self.queryset.filter(user=request.user).values_list(
+                "version", "user__recipe_attrs_version"
+            ),
+            pk=kwargs["pk"]
+        )
+        data = cache.lookup(int(kwargs["pk"]), (version, attrs_version))
+        if data is None:
+            recipe = self.get_object()
+            data = self.get_serializer(recipe).data
+            # attrs_version was read first, so the detail can't be older
+            cache.store(recipe.pk, (recipe.version, attrs_version), data)
+        return Response(data)
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ("list", "retrieve"):
+            kwargs["fields"], kwargs["expand"] = self.get_field_selection()
+        return super().get_serializer(*args, **kwargs)
+
     def get_serializer_class(self):
         """Return different serializer class depending on url"""
         if self.action == 'retrieve':
             return serializers.RecipeDetailSerializer
         elif self.action == "upload_image":
             return serializers.RecipeImageSerializer
+        elif self.action == "shopping_list":
+            return serializers.ShoppingListSerializer
+        elif self.action == "copy":
+            return serializers.RecipeCopySerializer
         return self.serializer_class
     
     def perform_create(self, serializer):
@@ -62,6 +285,120 @@ class RecipeViewSet(viewsets.ModelViewSet):
         # assigning authenticated user
         serializer.save(user=self.request.user)
     
+    @action(methods=["GET"], detail=True)
+    def similar(self, request, pk=None):
+        """
+        Return the recipes sharing the most tags and ingredients with this
+        one, most similar first, each with its similarity score
+        """
+        recipe = self.get_object()
+        try:
+            limit = int(request.query_params.get("limit", 10))
+            if not 0 < limit <= similarity.TOP_K:
+                raise ValueError
+        except ValueError:
+            raise ValidationError({
+                "limit": _("A number from 1 to %d is required")
+                % similarity.TOP_K
+            })
+
+        scores = dict(
+            recipe.neighbours.order_by("-score")
+            .values_list("similar_id", "score")[:limit]
+        )
+        recipes = Recipe.objects.filter(pk__in=scores).prefetch_related(
+            "tags", "ingredients"
+        )
+        data = []
+        for similar in sorted(recipes, key=lambda r: -scores[r.pk]):
+            data.append(dict(
+                serializers.RecipeSerializer(similar).data,
+                score=scores[similar.pk]
+            ))
+        return Response(data)
+
+    @action(methods=["POST"], detail=False, url_path="shopping-list")
+    def shopping_list(self, request):
+        """
+        Return the ingredients of the given recipes, each with the number
+        and ids of the recipes using it. The links are read in a single
+        query ordered by ingredient and grouped while the response streams
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = set(serializer.validated_data["recipes"])
+        if len(recipe_ids) > self.max_shopping_list_recipes:
+            raise ValidationError({"recipes": [
+                _("At most %d recipes can be combined")
+                % self.max_shopping_list_recipes
+            ]})
+
+        links = Recipe.ingredients.through.objects.filter(
+            recipe__user=request.user, recipe_id__in=recipe_ids
+        ).order_by(
+            "ingredient__name", "ingredient_id", "recipe_id"
+        ).values_list("ingredient_id", "ingredient__name", "recipe_id")
+        return StreamingHttpResponse(
+            self._shopping_list_chunks(links.iterator()),
+            content_type="application/json"
+        )
+
+    @action(methods=["POST"], detail=False)
+    def copy(self, request):
+        """
+        Copy the given recipes, each the given number of times, with their
+        tags, ingredients and image, in one transaction. Return the copies
+        in the order of the recipes, each with the id it is a copy of
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(serializer.validated_data["recipes"]))
+        copies = serializer.validated_data["copies"]
+        if len(recipe_ids) * copies > self.max_copied_recipes:
+            raise ValidationError({"copies": [
+                _("At most %d recipes can be created at once")
+                % self.max_copied_recipes
+            ]})
+
+        recipes = self.queryset.filter(user=request.user, pk__in=recipe_ids)
+        unknown = set(recipe_ids) - set(recipes.values_list("id", flat=True))
+        if unknown:
+            raise ValidationError({"recipes": [
+                _("Unknown recipes: %s")
+                % ", ".join(str(pk) for pk in sorted(unknown))
+            ]})
+
+        copied = copying.copy_recipes(recipes, copies)
+        created = Recipe.objects.in_bulk(
+            [pk for pks in copied.values() for pk in pks]
+        )
+        # links are read once for all copies
+        prefetch_related_objects(
+            list(created.values()), "tags", "ingredients"
+        )
+        data = [
+            dict(
+                serializers.RecipeSerializer(created[pk]).data,
+                copy_of=recipe_id
+            )
+            for recipe_id in recipe_ids for pk in copied.get(recipe_id, ())
+        ]
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @staticmethod
+    def _shopping_list_chunks(links):
+        yield '{"ingredients": ['
+        rows = groupby(links, key=itemgetter(0, 1))
+        for number, ((ingredient_id, name), group) in enumerate(rows):
+            recipes = [recipe_id for _, _, recipe_id in group]
+            yield (", " if number else "") + json.dumps({
+                "id": ingredient_id,
+                "name": name,
+                "count": len(recipes),
+                "recipes": recipes,
+            })
+        yield "]}"
+
     # detail=True, use detail url (with id); pk None means using default id?
     @action(methods=["POST"], detail=True, url_path="upload-image")
     def upload_image(self, request, pk=None):
@@ -85,6 +422,42 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
 
+class SyncView(ThrottledViewMixin, APIView):
+    """
+    Return the recipes, tags and ingredients changed since the change
+    sequence number in ?since=, and the ids of those deleted
+    """
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = "recipes"
+    # log entries read per response, clients call again while "more" is set
+    page_size = 1000
 
-    
+    def get(self, request):
+        try:
+            since = int(request.query_params.get("since", 0))
+            if since < 0:
+                raise ValueError
+        except ValueError:
+            raise ValidationError(
+                {"since": _("A non-negative sequence number is required")}
+            )
 
+        seq, more, changed, deleted = changelog.changes_since(
+            request.user, since, self.page_size
+        )
+        recipes = changed["recipe"].prefetch_related("tags", "ingredients")
+        return Response({
+            "seq": seq,
+            "more": more,
+            "recipes": serializers.RecipeSerializer(recipes, many=True).data,
+            "tags": serializers.TagSerializer(changed["tag"], many=True).data,
+            "ingredients": serializers.IngredientSerializer(
+                changed["ingredient"], many=True
+            ).data,
+            "deleted": {
+                "recipes": deleted["recipe"],
+                "tags": deleted["tag"],
+                "ingredients": deleted["ingredient"],
+            },
+        })
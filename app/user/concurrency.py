@@ -0,0 +1,56 @@
+import hashlib
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import ugettext_lazy as _
+
+from rest_framework import exceptions
+
+
+class ConcurrencyLimiter:
+    """
+    Limit how many requests sharing an identifier (client address, email...)
+    can be in flight at once. Counters live in the default cache, so the
+    limit only holds across workers when that cache is shared between them
+    (MEMCACHED_LOCATION). With a per-process cache, each worker applies the
+    limit on its own
+    """
+    # counters expire on their own if a worker dies while holding a slot
+    timeout = 60
+
+    def __init__(self, scope, setting):
+        self.scope = scope
+        self.setting = setting
+
+    @property
+    def limit(self):
+        return getattr(settings, self.setting)
+
+    def get_cache_key(self, ident):
+        digest = hashlib.sha1(str(ident).encode()).hexdigest()
+        return f'concurrency:{self.scope}:{digest}'
+
+    @contextmanager
+    def slot(self, ident):
+        """Hold a slot for ident, raising Throttled when none is free"""
+        key = self.get_cache_key(ident)
+        cache.add(key, 0, self.timeout)
+        try:
+            in_flight = cache.incr(key)
+        except ValueError:
+            # the counter expired between add and incr
+            cache.add(key, 1, self.timeout)
+            in_flight = 1
+
+        try:
+            if in_flight > self.limit:
+                raise exceptions.Throttled(
+                    detail=_('Too many concurrent requests, retry shortly')
+                )
+            yield
+        finally:
+            try:
+                cache.decr(key)
+            except ValueError:
+                pass
@@ -0,0 +1,96 @@
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from rest_framework.test import APIRequestFactory
+
+from core import deletion
+from core.benchmarks import format_report
+from user.views import CreateTokenView
+
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+
+class Command(BaseCommand):
+    """Django command to measure token endpoint latency under load"""
+    help = 'Benchmark POST /api/user/token/ with concurrent clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--hasher',
+            help='Dotted path of the hasher to use, defaults to the '
+                 'preferred one in PASSWORD_HASHERS'
+        )
+
+    def handle(self, *args, **options):
+        hashers = settings.PASSWORD_HASHERS
+        if options['hasher']:
+            hashers = [options['hasher']]
+
+        with override_settings(PASSWORD_HASHERS=hashers):
+            # one user per client, so the per-email limit isn't what we measure
+            prefix = uuid.uuid4().hex[:8]
+            users = [
+                get_user_model().objects.create_user(
+                    f'benchmark-{prefix}-{i}@example.com', BENCHMARK_PASSWORD
+                )
+                for i in range(options['concurrency'])
+            ]
+            try:
+                latencies, statuses, elapsed = self.run_requests(
+                    [user.email for user in users],
+                    options['requests'],
+                    options['concurrency']
+                )
+            finally:
+                deletion.delete_users(
+                    get_user_model().objects.filter(
+                        pk__in=[user.pk for user in users]
+                    )
+                )
+
+        self.stdout.write(f'hasher: {hashers[0]}')
+        for line in format_report(
+            latencies, statuses, elapsed, options['concurrency']
+        ):
+            self.stdout.write(line)
+
+    def run_requests(self, emails, total, concurrency):
+        """Send total token requests from concurrency threads"""
+        # the rate limits would reject most requests of a single client
+        view = CreateTokenView.as_view(throttle_classes=())
+        factory = APIRequestFactory()
+
+        def login(i):
+            request = factory.post(
+                '/api/user/token/',
+                {'email': emails[i % len(emails)],
+                 'password': BENCHMARK_PASSWORD},
+                format='json'
+            )
+            start = time.perf_counter()
+            try:
+                response = view(request)
+            finally:
+                # behave like a request cycle with CONN_MAX_AGE = 0
+                connection.close()
+            return time.perf_counter() - start, response.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(login, range(total)))
+        elapsed = time.perf_counter() - start
+
+        latencies = [latency for latency, _ in results]
+        statuses = Counter(status for _, status in results)
+        return latencies, statuses, elapsed
@@ -0,0 +1,93 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from user.serializers import ProvisioningSerializer
+
+
+class Command(BaseCommand):
+    """Django command to create users in bulk from a CSV file"""
+    help = (
+        'Create users from a CSV file with an email column and optional '
+        'name and password columns. Users without a password can only log '
+        'in with a token, which --issue-tokens prints as CSV'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='CSV file, - for standard input')
+        parser.add_argument(
+            '--issue-tokens', action='store_true',
+            help='Issue an API token for every user and print them'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Users validated and inserted together'
+        )
+        parser.add_argument(
+            '--workers', type=int,
+            help='Password hashing processes, defaults to the CPU count'
+        )
+
+    def handle(self, *args, **options):
+        if options['file'] == '-':
+            rows = list(csv.DictReader(sys.stdin))
+        else:
+            with open(options['file'], newline='') as f:
+                rows = list(csv.DictReader(f))
+
+        entries = [
+            {name: value for name, value in row.items()
+             if name in ('email', 'name', 'password') and value}
+            for row in rows
+        ]
+        batches = [
+            entries[start:start + options['batch_size']]
+            for start in range(0, len(entries), options['batch_size'])
+        ]
+        # validate everything first so that a bad row creates nobody
+        serializers = []
+        for number, batch in enumerate(batches):
+            serializer = ProvisioningSerializer(data={
+                'users': batch,
+                'issue_tokens': options['issue_tokens'],
+            })
+            if not serializer.is_valid():
+                raise CommandError(self.format_errors(
+                    serializer.errors, number * options['batch_size']
+                ))
+            serializers.append(serializer)
+        emails = [
+            user['email'] for serializer in serializers
+            for user in serializer.validated_data['users']
+        ]
+        if len(set(emails)) < len(emails):
+            raise CommandError('Some emails appear more than once')
+
+        if options['issue_tokens']:
+            writer = csv.writer(self.stdout)
+            writer.writerow(['email', 'token'])
+        created = 0
+        for serializer in serializers:
+            users = serializer.save(workers=options['workers'])
+            created += len(users)
+            if options['issue_tokens']:
+                writer.writerows(
+                    [user.email, user.token_key] for user in users
+                )
+
+        self.stderr.write(self.style.SUCCESS(f'Created {created} users'))
+
+    def format_errors(self, errors, offset):
+        lines = []
+        for field, field_errors in errors.items():
+            if field != 'users' or not isinstance(field_errors, list):
+                lines.append(f'{field}: {field_errors}')
+                continue
+            for index, row_errors in enumerate(field_errors):
+                for name, messages in row_errors.items():
+                    lines.append(
+                        f'row {offset + index + 1} {name}: '
+                        f'{" ".join(str(m) for m in messages)}'
+                    )
+        return '\n'.join(lines)
@@ -0,0 +1,85 @@
+"""
+Creation of many users at once, for onboarding whole organisations.
+
+Creating users one by one spends nearly all its time hashing passwords
+serially and the rest on a uniqueness query and an INSERT per user. Here
+emails are checked in one query, passwords are hashed on a process pool
+sized to the CPUs available, and users (and optionally their tokens) are
+inserted with bulk_create in a single transaction. The API only takes
+small batches and hashes them in the request's thread, since a process
+pool can't be forked safely from a threaded server.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from app import serving
+from core.models import AuthToken
+
+
+# users inserted per INSERT statement
+BATCH_SIZE = 500
+
+
+def existing_emails(emails):
+    """Return which of emails already belong to a user, in one query"""
+    return set(
+        get_user_model().objects.filter(email__in=emails)
+        .values_list('email', flat=True)
+    )
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    Return the hashes of passwords in order, None giving an unusable
+    password. Hashing runs in worker processes, one per CPU by default,
+    and in the calling thread with workers=1
+    """
+    workers = workers or serving.cpu_count()
+    if workers > 1 and len(passwords) > 1:
+        # only bulk provisioning needs these, keep them out of startup
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # daemon processes, like pool workers, can't start processes
+        if not multiprocessing.current_process().daemon:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunksize = max(1, len(passwords) // (workers * 4))
+                return list(
+                    pool.map(make_password, passwords, chunksize=chunksize)
+                )
+    return [make_password(password) for password in passwords]
+
+
+def provision(entries, issue_tokens=False, workers=None):
+    """
+    Create a user for each entry, a dict with email and optionally name
+    and password, whose emails must be normalized and unused. Return the
+    created users in order, with a token_key attribute holding a new API
+    token key when issue_tokens is set
+    """
+    user_model = get_user_model()
+    hashes = hash_passwords(
+        [entry.get('password') for entry in entries], workers
+    )
+    users = [
+        user_model(
+            email=entry['email'],
+            name=entry.get('name', ''),
+            password=password_hash
+        )
+        for entry, password_hash in zip(entries, hashes)
+    ]
+    with transaction.atomic():
+        user_model.objects.bulk_create(users, batch_size=BATCH_SIZE)
+        # not every database returns the primary keys of inserted rows
+        by_email = user_model.objects.in_bulk(
+            [user.email for user in users], field_name='email'
+        )
+        users = [by_email[user.email] for user in users]
+        if issue_tokens:
+            for user, (token, key) in zip(
+                users, AuthToken.objects.issue_many(users)
+            ):
+                user.token_key = key
+    return users
@@ -3,6 +3,8 @@ from django.utils.translation import ugettext_lazy as _
 
 from rest_framework import serializers
 
+from user import provisioning
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the User object"""
@@ -51,3 +53,51 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class ProvisionedUserSerializer(serializers.Serializer):
+    """One user of a provisioning batch"""
+    id = serializers.IntegerField(read_only=True)
+    email = serializers.EmailField(max_length=255)
+    name = serializers.CharField(max_length=255, required=False)
+    password = serializers.CharField(
+        write_only=True,
+        min_length=5,
+        required=False,
+        trim_whitespace=False
+    )
+    token = serializers.CharField(source='token_key', read_only=True)
+
+    def validate_email(self, value):
+        return get_user_model().objects.normalize_email(value)
+
+
+class ProvisioningSerializer(serializers.Serializer):
+    """A batch of users to create at once"""
+    users = ProvisionedUserSerializer(many=True, allow_empty=False)
+    issue_tokens = serializers.BooleanField(default=False)
+
+    def validate_users(self, users):
+        """Check every email for uniqueness with a single query"""
+        emails = [user['email'] for user in users]
+        taken = provisioning.existing_emails(emails)
+        seen = set()
+        errors = []
+        for email in emails:
+            error = {}
+            if email in taken:
+                error['email'] = [_('A user with this email already exists')]
+            elif email in seen:
+                error['email'] = [_('This email appears more than once')]
+            seen.add(email)
+            errors.append(error)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return users
+
+    def create(self, validated_data):
+        return provisioning.provision(
+            validated_data['users'],
+            validated_data['issue_tokens'],
+            validated_data.get('workers')
+        )
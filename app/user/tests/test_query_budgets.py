@@ -0,0 +1,43 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import AuthToken
+from core.tests import factories
+from core.tests.budget import QueryBudgetMixin, query_budget
+
+
+ME_URL = reverse("user:me")
+
+
+class UserQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test that the user endpoints stay within their query budgets"""
+
+    def setUp(self):
+        # cached profiles outlive the users rolled back after each test
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = factories.make_user()
+        self.client = APIClient()
+
+    @query_budget("user-token")
+    def test_create_token(self):
+        res = self.client.post(reverse("user:token"), {
+            "email": self.user.email,
+            "password": factories.DEFAULT_PASSWORD,
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_profile(self):
+        _, key = AuthToken.objects.issue(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {key}")
+        with self.assertQueryBudget("user-me"):
+            self.client.get(ME_URL)
+        with self.assertQueryBudget("user-me-cached"):
+            self.client.get(ME_URL)
+        with self.assertQueryBudget("user-me-update"):
+            res = self.client.patch(ME_URL, {"name": "New name"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -1,14 +1,31 @@
-from django.test import TestCase
+import csv
+import importlib
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.models import AuthToken
+from user.views import CreateTokenView
+
 
 CREATE_USER_URL = reverse("user:create")
 TOKEN_URL = reverse("user:token")
 ME_URL = reverse("user:me")
+ROTATE_TOKEN_URL = reverse("user:token-rotate")
+PROVISION_URL = reverse("user:provision")
 
 std_payload = {
   "email": "test@monteros.es",
@@ -90,6 +107,40 @@ class PublicUserApiTests(TestCase):
         self.assertNotIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    @override_settings(PASSWORD_HASHERS=[
+        'core.hashers.TunedArgon2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    ])
+    def test_create_token_rehashes_legacy_password(self):
+        """Test that a PBKDF2 password is upgraded to Argon2 on login"""
+        user = create_user(**std_payload)
+        user.password = make_password(
+            std_payload['password'], hasher='pbkdf2_sha256'
+        )
+        user.save()
+
+        res = self.client.post(TOKEN_URL, std_payload)
+
+        user.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(user.password.startswith('argon2$'))
+        self.assertTrue(user.check_password(std_payload['password']))
+
+    @override_settings(TOKEN_CONCURRENCY_PER_EMAIL=1)
+    def test_create_token_concurrency_limited(self):
+        """Test that logins over the in-flight limit are rejected"""
+        create_user(**std_payload)
+        limiter = CreateTokenView.email_limiter
+        self.addCleanup(cache.clear)
+
+        with limiter.slot(std_payload['email']):
+            res = self.client.post(TOKEN_URL, std_payload)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertNotIn('token', res.data)
+
+        res = self.client.post(TOKEN_URL, std_payload)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
     def test_retrieve_user_unauthorised(self):
         """Test that authentication is required for users"""
         res = self.client.get(ME_URL)
@@ -133,3 +184,282 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, new_payload['name'])
         self.assertTrue(self.user.check_password(new_payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class TokenLifecycleTests(TestCase):
+    """Test issuing, using and rotating expiring tokens"""
+
+    def setUp(self):
+        self.user = create_user(**std_payload)
+        self.client = APIClient()
+
+    def test_token_stored_hashed(self):
+        """Test that only the hash of an issued token is stored"""
+        res = self.client.post(TOKEN_URL, std_payload)
+
+        key = res.data['token']
+        token = AuthToken.objects.get(user=self.user)
+        self.assertEqual(token.key_hash, AuthToken.hash_key(key))
+        self.assertNotEqual(token.key_hash, key)
+        self.assertGreater(token.expires, timezone.now())
+
+    def test_multiple_tokens_per_user(self):
+        """Test that each login issues a separate working token"""
+        keys = [
+            self.client.post(TOKEN_URL, std_payload).data['token']
+            for _ in range(2)
+        ]
+
+        self.assertNotEqual(keys[0], keys[1])
+        for key in keys:
+            self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+            res = self.client.get(ME_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_expired_token_rejected(self):
+        """Test that an expired token no longer authenticates"""
+        token, key = AuthToken.objects.issue(self.user)
+        AuthToken.objects.filter(pk=token.pk).update(expires=timezone.now())
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_rotate_token(self):
+        """Test that rotating replaces the token used for the request"""
+        old_token, old_key = AuthToken.objects.issue(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {old_key}')
+
+        res = self.client.post(ROTATE_TOKEN_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(AuthToken.objects.filter(pk=old_token.pk).exists())
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {res.data["token"]}'
+        )
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_200_OK)
+
+    def test_rotate_token_requires_token(self):
+        """Test that rotation fails for requests without a token"""
+        res = self.client.post(ROTATE_TOKEN_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_legacy_tokens_imported(self):
+        """Test that the migration keeps old plain tokens working"""
+        legacy = Token.objects.create(user=self.user)
+        migration = importlib.import_module(
+            'core.migrations.0017_import_authtoken_keys'
+        )
+
+        migration.import_tokens(apps, None)
+
+        self.assertFalse(Token.objects.exists())
+        token = AuthToken.objects.get(user=self.user)
+        self.assertEqual(token.key_hash, AuthToken.hash_key(legacy.key))
+        self.assertGreater(token.expires, timezone.now())
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {legacy.key}')
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_200_OK)
+
+
+class ProvisioningTests(TestCase):
+    """Test creating users in bulk"""
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            'admin@londonappdev.com', 'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_provision_requires_admin(self):
+        """Test that regular users can't provision users"""
+        self.client.force_authenticate(create_user(
+            email='test@londonappdev.com', password='testpass'
+        ))
+
+        res = self.client.post(
+            PROVISION_URL,
+            {'users': [{'email': 'new@londonappdev.com'}]},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_provision_users_with_tokens(self):
+        """Test that users are created with working passwords and tokens"""
+        payload = {
+            'users': [
+                {'email': 'one@LONDONAPPDEV.com', 'password': 'pass123',
+                 'name': 'One'},
+                {'email': 'two@londonappdev.com'},
+            ],
+            'issue_tokens': True,
+        }
+
+        res = self.client.post(PROVISION_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        one = get_user_model().objects.get(email='one@londonappdev.com')
+        self.assertTrue(one.check_password('pass123'))
+        self.assertEqual(one.name, 'One')
+        two = get_user_model().objects.get(email='two@londonappdev.com')
+        self.assertFalse(two.has_usable_password())
+        self.assertEqual(
+            [user['id'] for user in res.data], [one.id, two.id]
+        )
+        self.assertNotIn('password', res.data[0])
+
+        self.client.force_authenticate(None)
+        me = self.client.get(
+            ME_URL, HTTP_AUTHORIZATION=f'Token {res.data[1]["token"]}'
+        )
+        self.assertEqual(me.data['email'], two.email)
+
+    def test_provision_rejects_taken_and_repeated_emails(self):
+        """Test that one bad email fails the whole batch"""
+        payload = {'users': [
+            {'email': 'new@londonappdev.com'},
+            {'email': self.admin.email},
+            {'email': 'new@londonappdev.com'},
+        ]}
+
+        res = self.client.post(PROVISION_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = res.data['users']
+        self.assertEqual(errors[0], {})
+        self.assertIn('email', errors[1])
+        self.assertIn('email', errors[2])
+        self.assertEqual(get_user_model().objects.count(), 1)
+
+    def test_provision_batch_size_capped(self):
+        """Test that batches over the API's limit are refused"""
+        payload = {'users': [
+            {'email': f'user{i}@londonappdev.com'} for i in range(101)
+        ]}
+
+        res = self.client.post(PROVISION_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(get_user_model().objects.count(), 1)
+
+    def test_provision_email_taken_meanwhile(self):
+        """Test that an email taken after validation is a 400"""
+        payload = {'users': [{'email': self.admin.email}]}
+
+        with patch('user.provisioning.existing_emails', return_value=set()):
+            res = self.client.post(PROVISION_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('users', res.data)
+
+    def test_provision_users_command(self):
+        """Test that the command creates users from CSV"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as f:
+            f.write('email,name,password\n')
+            f.write('one@londonappdev.com,One,pass123\n')
+            f.write('two@londonappdev.com,,\n')
+            f.flush()
+            out = StringIO()
+
+            call_command(
+                'provision_users', f.name, '--issue-tokens', '--workers', '2',
+                stdout=out, stderr=StringIO()
+            )
+
+        rows = list(csv.reader(StringIO(out.getvalue())))
+        self.assertEqual(rows[0], ['email', 'token'])
+        self.assertEqual(
+            [row[0] for row in rows[1:]],
+            ['one@londonappdev.com', 'two@londonappdev.com']
+        )
+        one = get_user_model().objects.get(email='one@londonappdev.com')
+        self.assertTrue(one.check_password('pass123'))
+        self.assertTrue(
+            AuthToken.objects.filter(
+                key_hash=AuthToken.hash_key(rows[2][1])
+            ).exists()
+        )
+
+
+class ProfileCacheTests(TestCase):
+    """Test the cached profile and its ETag"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(**std_payload)
+        _, key = AuthToken.objects.issue(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+
+    def test_profile_only_costs_authentication(self):
+        """Test that a cached profile is served from the token query"""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_not_modified(self):
+        """Test that a current ETag gets an empty 304"""
+        etag = self.client.get(ME_URL)['ETag']
+
+        res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertFalse(res.content)
+
+    def test_update_changes_etag(self):
+        """Test that editing the profile gives it a new version"""
+        etag = self.client.get(ME_URL)['ETag']
+
+        patched = self.client.patch(ME_URL, {'name': 'New name'})
+        res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertNotEqual(patched['ETag'], etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['ETag'], patched['ETag'])
+        self.assertEqual(res.data['name'], 'New name')
+
+    def test_password_change_changes_etag(self):
+        """Test that a password change outside the API bumps the version"""
+        etag = self.client.get(ME_URL)['ETag']
+
+        self.user.set_password('another-password')
+        self.user.save(update_fields=['password'])
+        res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_concurrent_saves_bump_version_twice(self):
+        """Test that saving a stale copy of the user still bumps it"""
+        version = self.user.profile_version
+        stale = get_user_model().objects.get(pk=self.user.pk)
+
+        self.user.name = 'First'
+        self.user.save()
+        stale.name = 'Second'
+        stale.save()
+
+        self.assertEqual(stale.profile_version, version + 2)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.profile_version, version + 2)
+
+    def test_last_login_keeps_etag(self):
+        """Test that saving unrelated fields keeps cached profiles"""
+        etag = self.client.get(ME_URL)['ETag']
+
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
@@ -1,26 +1,153 @@
-from rest_framework import generics, authentication, permissions
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils.http import parse_etags, quote_etag
+from django.utils.translation import ugettext_lazy as _
+
+from rest_framework import generics, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from core.authentication import ExpiringTokenAuthentication
+from core.models import AuthToken
+from core.throttling import ThrottledViewMixin
+from user.concurrency import ConcurrencyLimiter
+from user.serializers import (
+    UserSerializer, AuthTokenSerializer, ProvisionedUserSerializer,
+    ProvisioningSerializer
+)
+
 
-from user.serializers import UserSerializer, AuthTokenSerializer
+def token_response(token, key, status_code=status.HTTP_200_OK):
+    """Return a response handing a new token key to the client"""
+    return Response(
+        {'token': key, 'expires': token.expires}, status=status_code
+    )
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(ThrottledViewMixin, generics.CreateAPIView):
     """Create a new user in the system"""
     serializer_class = UserSerializer
+    throttle_scope = 'user-create'
 
 
-class CreateTokenView(ObtainAuthToken):
+class CreateTokenView(ThrottledViewMixin, ObtainAuthToken):
     """Create a new auth token for user"""
     serializer_class = AuthTokenSerializer
+    throttle_scope = 'user-token'
     # needed to view this API endpoint in the browser
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    # password hashing is expensive, so cap logins in flight per client
+    ip_limiter = ConcurrencyLimiter('token-ip', 'TOKEN_CONCURRENCY_PER_IP')
+    email_limiter = ConcurrencyLimiter(
+        'token-email', 'TOKEN_CONCURRENCY_PER_EMAIL'
+    )
+
+    def post(self, request, *args, **kwargs):
+        email = str(request.data.get('email', '')).strip().lower()
+        with self.ip_limiter.slot(request.META.get('REMOTE_ADDR')), \
+                self.email_limiter.slot(email):
+            serializer = self.serializer_class(
+                data=request.data,
+                context={'request': request}
+            )
+            serializer.is_valid(raise_exception=True)
+
+        user = serializer.validated_data['user']
+        return token_response(*AuthToken.objects.issue(user))
+
+
+class RotateTokenView(ThrottledViewMixin, APIView):
+    """Replace the token used to authenticate with a new one"""
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+    throttle_scope = 'user-token'
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+
+    def post(self, request, *args, **kwargs):
+        if not isinstance(request.auth, AuthToken):
+            raise ValidationError(_('Authenticate with a token to rotate it'))
+
+        with transaction.atomic():
+            request.auth.delete()
+            token, key = AuthToken.objects.issue(request.user)
+
+        return token_response(token, key, status_code=status.HTTP_201_CREATED)
+
+
+class ProvisionUsersView(ThrottledViewMixin, APIView):
+    """Create a batch of users, optionally with an API token each"""
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (permissions.IsAdminUser,)
+    throttle_scope = 'user'
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    # users accepted per request, hashed in the request's thread so that
+    # a batch stays well within the worker timeout. Larger imports use the
+    # provision_users command, which hashes on a process pool
+    max_users = 100
+
+    def post(self, request, *args, **kwargs):
+        serializer = ProvisioningSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if len(serializer.validated_data['users']) > self.max_users:
+            raise ValidationError({'users': [
+                _('At most %d users can be created at once') % self.max_users
+            ]})
+
+        try:
+            users = serializer.save(workers=1)
+        except IntegrityError:
+            # an email was taken after the batch was validated
+            raise ValidationError({'users': [
+                _('A user with one of these emails was created meanwhile')
+            ]})
+        return Response(
+            ProvisionedUserSerializer(users, many=True).data,
+            status=status.HTTP_201_CREATED
+        )
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(ThrottledViewMixin, generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
+    throttle_scope = 'user'
+    # seconds a serialized profile stays in the cache
+    profile_cache_timeout = 60 * 60
+
+    @staticmethod
+    def profile_etag(user):
+        return quote_etag(f'{user.pk}.{user.profile_version}')
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Return the profile, or 304 when the client has the current
+        version. Only the user loaded by authentication is read, the
+        profile itself comes from a cache keyed by its version
+        """
+        user = self.get_object()
+        etag = self.profile_etag(user)
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            key = f'user-profile:{user.pk}:{user.profile_version}'
+            data = cache.get(key)
+            if data is None:
+                data = self.get_serializer(user).data
+                cache.set(key, data, self.profile_cache_timeout)
+            response = Response(data)
+        response['ETag'] = etag
+        # clients may keep the profile but must revalidate it every time
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        response['ETag'] = self.profile_etag(self.get_object())
+        return response
 
     def get_object(self):
         """